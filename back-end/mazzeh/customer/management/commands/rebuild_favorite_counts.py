@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from customer.services import rebuild_favorite_counts
+from restaurant.models import RestaurantProfile
+
+
+class Command(BaseCommand):
+    help = "Recompute the stored favorite_count of every restaurant."
+
+    def handle(self, *args, **options):
+        rebuild_favorite_counts()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt favorite counts for {RestaurantProfile.objects.count()} restaurants."
+        ))
@@ -0,0 +1,52 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from customer.models import Cart
+from order.services import line_total
+
+
+class Command(BaseCommand):
+    help = "Find carts whose stored total_price drifted from their items and fix them."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        checked = fixed = 0
+        last_pk = 0
+        while True:
+            carts = list(
+                Cart.objects.filter(pk__gt=last_pk).order_by('pk')
+                .only('id', 'total_price', 'version')
+                .prefetch_related('cart_items')[:chunk_size]
+            )
+            if not carts:
+                break
+            last_pk = carts[-1].pk
+            checked += len(carts)
+
+            drifted = []
+            for cart in carts:
+                expected = sum(
+                    (line_total(ci.count, ci.price, ci.discount) for ci in cart.cart_items.all()),
+                    Decimal('0'),
+                )
+                if cart.total_price != expected:
+                    drifted.append((cart, expected))
+            fixed += len(drifted)
+
+            if drifted and not options['dry_run']:
+                with transaction.atomic():
+                    for cart, expected in drifted:
+                        # Guarded by version so a concurrent cart edit is never overwritten.
+                        Cart.objects.filter(pk=cart.pk, version=cart.version).update(
+                            total_price=expected, version=F('version') + 1,
+                        )
+
+        verb = "Found" if options['dry_run'] else "Fixed"
+        self.stdout.write(self.style.SUCCESS(f"Checked {checked} carts. {verb} {fixed} with drifted totals."))
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Greatest
 from django.db.models.signals import pre_delete
 from django.dispatch import receiver
 from user.models import User
@@ -30,10 +31,20 @@ class Favorite(models.Model):
         unique_together = ('user', 'restaurant')
 
 
+@receiver(pre_delete, sender=User)
+def user_pre_delete_favorites(sender, instance, **kwargs):
+    # The favorites go with the user through the cascade, which skips customer.services.update_favorites.
+    # Clamped, as a count that drifted to 0 must not go negative; rebuild_favorite_counts repairs drift.
+    RestaurantProfile.objects.filter(favorited_by__user=instance).update(
+        favorite_count=Greatest(models.F('favorite_count') - 1, 0),
+    )
+
+
 class Cart(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="carts")
     restaurant = models.ForeignKey('restaurant.RestaurantProfile', on_delete=models.CASCADE)
     total_price = models.DecimalField(max_digits=10, decimal_places=2, default=0.0)
+    version = models.PositiveIntegerField(default=0)
     
     class Meta:
         unique_together = ('user', 'restaurant')
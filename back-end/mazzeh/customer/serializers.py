@@ -0,0 +1,48 @@
+from rest_framework import serializers
+from restaurant.models import RestaurantProfile
+from restaurant.serializers import ThumbnailField
+from .models import Cart, CartItem
+
+
+class CartSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Cart
+        fields = ['id', 'restaurant', 'total_price', 'version']
+
+
+class CartItemSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CartItem
+        fields = ['id', 'item', 'count', 'price', 'discount']
+
+
+class CartItemAddSerializer(serializers.Serializer):
+    item_id = serializers.IntegerField()
+    count = serializers.IntegerField(min_value=1, default=1)
+    version = serializers.IntegerField(required=False)
+
+
+class CartItemUpdateSerializer(serializers.Serializer):
+    count = serializers.IntegerField(min_value=1)
+    version = serializers.IntegerField(required=False)
+
+
+class CartVersionSerializer(serializers.Serializer):
+    version = serializers.IntegerField(required=False)
+
+
+class FavoriteRestaurantSerializer(serializers.ModelSerializer):
+    open_now = serializers.BooleanField(read_only=True)
+    thumbnail = ThumbnailField(source='photo_variants')
+
+    class Meta:
+        model = RestaurantProfile
+        fields = [
+            'id', 'name', 'business_type', 'city_name', 'state', 'score', 'review_count', 'favorite_count',
+            'open_now', 'thumbnail',
+        ]
+
+
+class FavoritesUpdateSerializer(serializers.Serializer):
+    add = serializers.ListField(child=serializers.IntegerField(), max_length=100, default=list)
+    remove = serializers.ListField(child=serializers.IntegerField(), max_length=100, default=list)
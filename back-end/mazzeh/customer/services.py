@@ -0,0 +1,148 @@
+from django.db import transaction
+from django.db.models import Count, Exists, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from order.services import line_total
+from restaurant.models import Item, OpeningInterval, RestaurantProfile
+from restaurant.schedule import current_minute
+from user.models import User
+from .models import Cart, CartItem, Favorite
+
+
+class CartError(Exception):
+    pass
+
+
+class CartConflict(CartError):
+    pass
+
+
+def _lock_cart(user, cart_id, version):
+    cart = Cart.objects.select_for_update().filter(pk=cart_id, user_id=user.pk).first()
+    if cart is None:
+        raise CartError("Cart not found.")
+    if version is not None and cart.version != version:
+        raise CartConflict("Cart was modified, refresh and retry.")
+    return cart
+
+
+def _apply_delta(cart, delta):
+    """Shift the stored total with an F() update, guarded by the version the cart was read at."""
+    updated = Cart.objects.filter(pk=cart.pk, version=cart.version).update(
+        total_price=F('total_price') + delta,
+        version=F('version') + 1,
+    )
+    if not updated:
+        raise CartConflict("Cart was modified, refresh and retry.")
+    cart.total_price += delta
+    cart.version += 1
+    return cart
+
+
+def _line_delta(cart_item, count):
+    # Whole lines are rounded, as checkout and reconcile_cart_totals do, never the change alone.
+    price, discount = cart_item.price, cart_item.discount
+    return line_total(count, price, discount) - line_total(cart_item.count, price, discount)
+
+
+def add_cart_item(user, item_id, count, version=None):
+    with transaction.atomic():
+        item = Item.objects.filter(pk=item_id, state='available').only('restaurant_id', 'price', 'discount').first()
+        if item is None:
+            raise CartError("Item not found or unavailable.")
+        # Serializes the user's adds, so two of them cannot both create the cart.
+        list(User.objects.select_for_update().filter(pk=user.pk).values_list('pk', flat=True))
+        cart, created = Cart.objects.get_or_create(user_id=user.pk, restaurant_id=item.restaurant_id)
+        cart = _lock_cart(user, cart.pk, None if created else version)
+
+        cart_item = CartItem.objects.filter(cart=cart, item=item).first()
+        if cart_item is None:
+            cart_item = CartItem.objects.create(
+                cart=cart, item=item, count=count, price=item.price, discount=item.discount,
+            )
+            delta = line_total(count, cart_item.price, cart_item.discount)
+        else:
+            CartItem.objects.filter(pk=cart_item.pk).update(count=F('count') + count)
+            delta = _line_delta(cart_item, cart_item.count + count)
+            cart_item.count += count
+
+        return _apply_delta(cart, delta), cart_item
+
+
+def update_cart_item(user, cart_item_id, count, version=None):
+    with transaction.atomic():
+        cart_item = CartItem.objects.filter(pk=cart_item_id, cart__user_id=user.pk).first()
+        if cart_item is None:
+            raise CartError("Cart item not found.")
+        cart = _lock_cart(user, cart_item.cart_id, version)
+        cart_item.refresh_from_db(fields=['count'])
+
+        delta = _line_delta(cart_item, count)
+        CartItem.objects.filter(pk=cart_item.pk).update(count=count)
+        cart_item.count = count
+        return _apply_delta(cart, delta), cart_item
+
+
+def remove_cart_item(user, cart_item_id, version=None):
+    with transaction.atomic():
+        cart_item = CartItem.objects.filter(pk=cart_item_id, cart__user_id=user.pk).first()
+        if cart_item is None:
+            raise CartError("Cart item not found.")
+        cart = _lock_cart(user, cart_item.cart_id, version)
+        cart_item.refresh_from_db(fields=['count'])
+
+        CartItem.objects.filter(pk=cart_item.pk).delete()
+        return _apply_delta(cart, -line_total(cart_item.count, cart_item.price, cart_item.discount))
+
+
+def favorite_restaurants(user_id, minute=None):
+    """The user's favorite restaurants, latest first, each annotated with open_now, in one query."""
+    minute = current_minute() if minute is None else minute
+    open_now = OpeningInterval.objects.filter(
+        restaurant=OuterRef('pk'), city_name=OuterRef('city_name'),
+        start_minute__lte=minute, end_minute__gt=minute,
+    )
+    return (
+        RestaurantProfile.objects.filter(favorited_by__user_id=user_id)
+        .annotate(favorite_id=F('favorited_by__id'), open_now=Exists(open_now))
+        .only('name', 'business_type', 'city_name', 'state', 'score', 'review_count', 'favorite_count', 'photo_variants')
+        .order_by('-favorite_id')
+    )
+
+
+def update_favorites(user, add=(), remove=()):
+    """Add and remove favorites in one transaction, moving each restaurant's favorite_count with it.
+
+    Unknown or unapproved restaurants are not added, and restaurants that are not favorites are not
+    removed. Returns the ids actually added and removed.
+    """
+    add, remove = set(add) - set(remove), set(remove)
+    with transaction.atomic():
+        # Serializes one user's concurrent updates, so each favorite is counted exactly once.
+        list(User.objects.select_for_update().filter(pk=user.pk).values_list('pk', flat=True))
+        existing = set(
+            Favorite.objects.filter(user_id=user.pk, restaurant_id__in=add | remove).values_list('restaurant_id', flat=True)
+        )
+        added = set()
+        if add - existing:
+            added = set(
+                RestaurantProfile.objects.filter(pk__in=add - existing, state='approved').values_list('pk', flat=True)
+            )
+        removed = remove & existing
+
+        if added:
+            Favorite.objects.bulk_create(Favorite(user_id=user.pk, restaurant_id=pk) for pk in added)
+            RestaurantProfile.objects.filter(pk__in=added).update(favorite_count=F('favorite_count') + 1)
+        if removed:
+            Favorite.objects.filter(user_id=user.pk, restaurant_id__in=removed).delete()
+            RestaurantProfile.objects.filter(pk__in=removed).update(favorite_count=F('favorite_count') - 1)
+    return sorted(added), sorted(removed)
+
+
+def rebuild_favorite_counts():
+    """Recompute every restaurant's favorite_count from the favorites table."""
+    favorites = (
+        Favorite.objects.filter(restaurant=OuterRef('pk')).order_by().values('restaurant')
+        .annotate(total=Count('pk')).values('total')
+    )
+    RestaurantProfile.objects.update(favorite_count=Coalesce(Subquery(favorites), 0))
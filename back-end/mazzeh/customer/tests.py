@@ -1,3 +1,138 @@
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from order.services import line_total
+from restaurant.models import Item, RestaurantProfile
+from user.models import User
+from .models import Cart
+from .services import CartConflict, _apply_delta, rebuild_favorite_counts
+
+
+class FavoritesTests(TestCase):
+    def setUp(self):
+        self.customer = User.objects.create_user("09120000001", "pass")
+        self.restaurants = [
+            RestaurantProfile.objects.create(
+                manager=User.objects.create_user(f"0913000000{i}", "pass", role="restaurant_manager"),
+                name=f"Restaurant {i}", city_name="Tehran", state="approved",
+                open_hour="00:00", close_hour="00:00",
+            )
+            for i in range(5)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def update(self, **data):
+        return self.client.post('/api/customer/favorites', data, format='json')
+
+    def favorite_counts(self):
+        return list(RestaurantProfile.objects.order_by('pk').values_list('favorite_count', flat=True))
+
+    def test_bulk_update_counts_each_favorite_once(self):
+        ids = [restaurant.pk for restaurant in self.restaurants]
+        response = self.update(add=ids[:3])
+        self.assertEqual(response.data, {"added": ids[:3], "removed": []})
+
+        response = self.update(add=ids[2:4] + [0], remove=ids[:2])
+        self.assertEqual(response.data, {"added": [ids[3]], "removed": ids[:2]})
+        self.assertEqual(self.favorite_counts(), [0, 0, 1, 1, 0])
+
+        RestaurantProfile.objects.update(favorite_count=9)
+        rebuild_favorite_counts()
+        self.assertEqual(self.favorite_counts(), [0, 0, 1, 1, 0])
+
+        self.customer.delete()
+        self.assertEqual(self.favorite_counts(), [0, 0, 0, 0, 0])
+
+    def test_deleting_a_user_never_makes_counts_negative(self):
+        self.update(add=[restaurant.pk for restaurant in self.restaurants[:2]])
+        RestaurantProfile.objects.filter(pk=self.restaurants[0].pk).update(favorite_count=0)
+        self.customer.delete()
+        self.assertEqual(self.favorite_counts(), [0, 0, 0, 0, 0])
+
+    def test_feed_is_one_query_whatever_its_size(self):
+        self.update(add=[restaurant.pk for restaurant in self.restaurants])
+        RestaurantProfile.objects.filter(pk=self.restaurants[0].pk).update(score=4.5, review_count=2)
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/customer/favorites')
+
+        self.assertEqual([row['id'] for row in response.data], [r.pk for r in reversed(self.restaurants)])
+        oldest = response.data[-1]
+        self.assertEqual((oldest['score'], oldest['review_count'], oldest['favorite_count']), ('4.50', 2, 1))
+        self.assertTrue(oldest['open_now'])
+        self.assertIsNone(oldest['thumbnail'])
+
+
+class CartTests(TestCase):
+    def setUp(self):
+        self.customer = User.objects.create_user("09120000001", "pass")
+        restaurant = RestaurantProfile.objects.create(
+            manager=User.objects.create_user("09130000000", "pass", role="restaurant_manager"),
+            name="Mazzeh", city_name="Tehran", state="approved",
+        )
+        self.item = Item.objects.create(restaurant=restaurant, name="Kabab", price=100, discount=10)
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def add(self, **data):
+        return self.client.post('/api/customer/cart/items', {'item_id': self.item.pk, **data}, format='json')
+
+    def test_stale_version_is_rejected(self):
+        added = self.add(count=2).data
+        self.assertEqual((added['total_price'], added['version']), ('180.00', 1))
+        url = f"/api/customer/cart/items/{added['item']['id']}"
+
+        response = self.client.patch(url, {'count': 3, 'version': 0}, format='json')
+        self.assertEqual(response.status_code, 409)
+        response = self.client.delete(url, {'version': 0}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.add(version=0).status_code, 409)
+        cart = Cart.objects.get()
+        self.assertEqual((cart.total_price, cart.version), (Decimal('180.00'), 1))
+
+        response = self.client.patch(url, {'count': 3, 'version': 1}, format='json')
+        self.assertEqual((response.data['total_price'], response.data['version']), ('270.00', 2))
+        response = self.client.delete(url, {'version': 2}, format='json')
+        self.assertEqual((response.data['total_price'], response.data['version']), ('0.00', 3))
+
+    def test_total_matches_the_rounded_lines(self):
+        Item.objects.filter(pk=self.item.pk).update(price=Decimal('12.25'))
+        for _ in range(3):
+            cart = self.add().data
+        self.assertEqual(Decimal(cart['total_price']), line_total(3, Decimal('12.25'), 10))
+        response = self.client.patch(f"/api/customer/cart/items/{cart['item']['id']}", {'count': 2}, format='json')
+        self.assertEqual(Decimal(response.data['total_price']), line_total(2, Decimal('12.25'), 10))
+
+    def test_delta_is_not_applied_to_a_cart_changed_since_it_was_read(self):
+        self.add()
+        stale = Cart.objects.get()
+        _apply_delta(Cart.objects.get(), Decimal('90.00'))
+
+        with self.assertRaises(CartConflict):
+            _apply_delta(stale, Decimal('90.00'))
+        cart = Cart.objects.get()
+        self.assertEqual((cart.total_price, cart.version), (Decimal('180.00'), 2))
+
+    def test_reconcile_cart_totals_fixes_drifted_carts(self):
+        self.add(count=2)
+        Cart.objects.update(total_price=Decimal('55.00'))
+
+        out = StringIO()
+        call_command('reconcile_cart_totals', '--dry-run', stdout=out)
+        self.assertIn("Checked 1 carts. Found 1 with drifted totals.", out.getvalue())
+        self.assertEqual(Cart.objects.get().total_price, Decimal('55.00'))
+
+        out = StringIO()
+        call_command('reconcile_cart_totals', '--chunk-size', '1', stdout=out)
+        self.assertIn("Fixed 1 with drifted totals.", out.getvalue())
+        cart = Cart.objects.get()
+        self.assertEqual((cart.total_price, cart.version), (Decimal('180.00'), 2))
 
-# Create your tests here.
+        out = StringIO()
+        call_command('reconcile_cart_totals', stdout=out)
+        self.assertIn("Fixed 0 with drifted totals.", out.getvalue())
@@ -0,0 +1,9 @@
+from django.urls import path
+from .views import CartDetailView, CartItemDetailView, CartItemListView, FavoritesView
+
+urlpatterns = [
+    path('cart/<int:cart_id>', CartDetailView.as_view(), name='cart_detail'),
+    path('cart/items', CartItemListView.as_view(), name='cart_item_list'),
+    path('cart/items/<int:cart_item_id>', CartItemDetailView.as_view(), name='cart_item_detail'),
+    path('favorites', FavoritesView.as_view(), name='favorites'),
+]
@@ -1,3 +1,140 @@
-from django.shortcuts import render
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from drf_yasg.utils import swagger_auto_schema
+from drf_yasg import openapi
+from .models import Cart
+from .serializers import (
+    CartItemAddSerializer, CartItemSerializer, CartItemUpdateSerializer, CartSerializer, CartVersionSerializer,
+    FavoriteRestaurantSerializer, FavoritesUpdateSerializer,
+)
+from .services import (
+    CartConflict, CartError, add_cart_item, favorite_restaurants, remove_cart_item, update_cart_item, update_favorites,
+)
 
-# Create your views here.
+CART_RESPONSES = {
+    400: openapi.Response("Invalid input", examples={"application/json": {"error": "Item not found or unavailable."}}),
+    409: openapi.Response("Stale cart version", examples={"application/json": {"error": "Cart was modified, refresh and retry."}}),
+}
+
+
+def cart_error_response(exc):
+    code = status.HTTP_409_CONFLICT if isinstance(exc, CartConflict) else status.HTTP_400_BAD_REQUEST
+    return Response({"error": str(exc)}, status=code)
+
+
+def cart_response(cart, cart_item=None, code=status.HTTP_200_OK):
+    data = CartSerializer(cart).data
+    if cart_item is not None:
+        data['item'] = CartItemSerializer(cart_item).data
+    return Response(data, status=code)
+
+
+class CartDetailView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary="Cart summary",
+        operation_description="Returns the stored total and version of one of the user's carts.",
+        responses={200: CartSerializer, 404: openapi.Response("Cart not found")},
+    )
+
+    def get(self, request, cart_id):
+        cart = Cart.objects.filter(pk=cart_id, user_id=request.user.id).first()
+        if cart is None:
+            return Response({"error": "Cart not found."}, status=status.HTTP_404_NOT_FOUND)
+        return cart_response(cart)
+
+
+class CartItemListView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary="Add item to cart",
+        operation_description=(
+            "Adds an item to the user's cart for the item's restaurant, creating the cart if needed. "
+            "Pass the last seen cart version to reject the change if the cart was modified meanwhile."
+        ),
+        request_body=CartItemAddSerializer,
+        responses={201: CartSerializer, **CART_RESPONSES},
+    )
+
+    def post(self, request):
+        serializer = CartItemAddSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            cart, cart_item = add_cart_item(request.user, **serializer.validated_data)
+        except CartError as exc:
+            return cart_error_response(exc)
+        return cart_response(cart, cart_item, status.HTTP_201_CREATED)
+
+
+class CartItemDetailView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary="Change cart item count",
+        request_body=CartItemUpdateSerializer,
+        responses={200: CartSerializer, **CART_RESPONSES},
+    )
+
+    def patch(self, request, cart_item_id):
+        serializer = CartItemUpdateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            cart, cart_item = update_cart_item(request.user, cart_item_id, **serializer.validated_data)
+        except CartError as exc:
+            return cart_error_response(exc)
+        return cart_response(cart, cart_item)
+
+    @swagger_auto_schema(
+        operation_summary="Remove item from cart",
+        request_body=CartVersionSerializer,
+        responses={200: CartSerializer, **CART_RESPONSES},
+    )
+
+    def delete(self, request, cart_item_id):
+        serializer = CartVersionSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            cart = remove_cart_item(request.user, cart_item_id, **serializer.validated_data)
+        except CartError as exc:
+            return cart_error_response(exc)
+        return cart_response(cart)
+
+
+class FavoritesView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary="Favorite restaurants",
+        operation_description="The user's favorite restaurants, latest first, with score, open-now flag and thumbnail.",
+        responses={200: FavoriteRestaurantSerializer(many=True)},
+    )
+
+    def get(self, request):
+        return Response(FavoriteRestaurantSerializer(favorite_restaurants(request.user.id), many=True).data)
+
+    @swagger_auto_schema(
+        operation_summary="Add and remove favorites",
+        operation_description=(
+            "Adds and removes favorite restaurants in one transaction. Unknown or unapproved restaurants "
+            "are not added; the response lists the restaurants whose favorite state actually changed."
+        ),
+        request_body=FavoritesUpdateSerializer,
+        responses={
+            200: openapi.Response("Changed favorites", examples={"application/json": {"added": [3, 7], "removed": [2]}}),
+            400: openapi.Response("Invalid input"),
+        },
+    )
+
+    def post(self, request):
+        serializer = FavoritesUpdateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        added, removed = update_favorites(request.user, **serializer.validated_data)
+        return Response({"added": added, "removed": removed})
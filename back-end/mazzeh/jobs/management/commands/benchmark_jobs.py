@@ -0,0 +1,56 @@
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+
+from jobs.models import Job
+from jobs.queue import enqueue, work
+from jobs.tasks import noop
+
+
+def drain(batch_size):
+    return work(batch_size=batch_size, burst=True)
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure how fast jobs are enqueued and drained by one or more worker processes. "
+        "The jobs are committed, so other workers must not be running against the same database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jobs', type=int, default=2000)
+        parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+        parser.add_argument('--batch-size', type=int, default=20)
+
+    def handle(self, *args, **options):
+        count, batch_size = options['jobs'], options['batch_size']
+        results = []
+        try:
+            for workers in options['workers']:
+                start = time.perf_counter()
+                with transaction.atomic():
+                    for index in range(count):
+                        enqueue(noop.name, key=f"benchmark-{workers}-{index}", index=index)
+                enqueue_seconds = time.perf_counter() - start
+
+                # Forked workers must not share the parent's connection.
+                connections.close_all()
+                start = time.perf_counter()
+                with ProcessPoolExecutor(workers, initializer=django.setup) as pool:
+                    counts = list(pool.map(drain, [batch_size] * workers))
+                drain_seconds = time.perf_counter() - start
+
+                results.append({
+                    'workers': workers,
+                    'jobs': count,
+                    'done': sum(c['done'] for c in counts),
+                    'enqueue_per_second': round(count / enqueue_seconds),
+                    'drain_per_second': round(count / drain_seconds),
+                })
+        finally:
+            Job.objects.filter(task=noop.name).delete()
+        self.stdout.write(json.dumps(results, indent=2))
@@ -0,0 +1,32 @@
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from jobs.queue import work, worker_name
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs. Start one per core or more; workers never claim the same job."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.JOB_BATCH_SIZE)
+        parser.add_argument('--poll-interval', type=float, default=settings.JOB_POLL_INTERVAL,
+                            help="Seconds to wait when no job is due.")
+        parser.add_argument('--burst', action='store_true', help="Exit once no job is due.")
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        # The job in progress finishes; the rest of the claimed batch goes back to the queue.
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        worker = worker_name()
+        self.stdout.write(f"Worker {worker} waiting for jobs")
+        counts = work(
+            worker, options['batch_size'], options['poll_interval'], options['burst'],
+            should_stop=lambda: self.stopping,
+        )
+        self.stdout.write(self.style.SUCCESS(f"Worker {worker}: {counts['done']} done, {counts['failed']} failed attempts."))
+
+    def stop(self, signum, frame):
+        self.stopping = True
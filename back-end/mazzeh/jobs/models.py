@@ -0,0 +1,35 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    STATE_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    task = models.CharField(max_length=255)
+    kwargs = models.JSONField(default=dict, blank=True)
+    # Enqueueing again with a key that is already stored is a no-op, whatever that job's state.
+    idempotency_key = models.CharField(max_length=255, unique=True, null=True, blank=True)
+    state = models.CharField(max_length=10, choices=STATE_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    # A running job whose lease expired belongs to a worker that died; another worker takes it over.
+    locked_until = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=255, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['state', 'run_at']),
+            models.Index(fields=['state', 'locked_until']),
+        ]
+
+    def __str__(self):
+        return f"Job {self.pk}: {self.task} ({self.state})"
@@ -0,0 +1,155 @@
+"""
+Background jobs stored in the main database, so no broker has to be deployed.
+
+A job enqueued inside a transaction is committed, or rolled back, together with the rows that made
+it necessary; workers (manage.py run_jobs) only ever see committed jobs. Each job runs in its own
+transaction with its completion, so a job that fails part way leaves nothing behind and is retried
+with exponential backoff. Tasks should still be idempotent: a worker that dies after committing
+but before its lease is noticed could not have been told apart from one that died before.
+"""
+import logging
+import os
+import random
+import socket
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_tasks = {}
+
+
+class Task:
+    def __init__(self, func, name, max_attempts):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+
+    def __call__(self, **kwargs):
+        return self.func(**kwargs)
+
+    def enqueue(self, key=None, delay=None, **kwargs):
+        enqueue(self.name, key=key, delay=delay, max_attempts=self.max_attempts, **kwargs)
+
+
+def task(func=None, *, name=None, max_attempts=5):
+    """Register func as a task. Give it a stable name: queued jobs refer to tasks by name."""
+    def register(func):
+        task_name = name or f"{func.__module__}.{func.__name__}"
+        if task_name in _tasks and _tasks[task_name].func is not func:
+            raise ValueError(f"Task {task_name} is already registered.")
+        _tasks[task_name] = Task(func, task_name, max_attempts)
+        return _tasks[task_name]
+    return register if func is None else register(func)
+
+
+def enqueue(task_name, key=None, delay=None, max_attempts=5, **kwargs):
+    """Queue task_name(**kwargs); kwargs must be JSON serializable.
+
+    A key makes the call idempotent: while a job with that key is stored, enqueueing it again does nothing.
+    """
+    job = Job(
+        task=task_name, kwargs=kwargs, idempotency_key=key, max_attempts=max_attempts,
+        run_at=timezone.now() + (delay or timedelta()),
+    )
+    # A duplicate key is skipped by the insert itself, instead of an IntegrityError breaking the caller's transaction.
+    Job.objects.bulk_create([job], ignore_conflicts=key is not None)
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim_jobs(worker, limit):
+    """Lease up to limit due jobs to worker, including running jobs whose lease expired."""
+    now = timezone.now()
+    due = Q(state='queued', run_at__lte=now) | Q(state='running', locked_until__lt=now)
+    with transaction.atomic():
+        # SKIP LOCKED lets PostgreSQL workers claim disjoint batches; SQLite write transactions are serialized anyway.
+        jobs = list(Job.objects.select_for_update(skip_locked=True).filter(due).order_by('run_at')[:limit])
+        if not jobs:
+            return []
+        locked_until = now + settings.JOB_LEASE
+        Job.objects.filter(pk__in=[job.pk for job in jobs]).update(
+            state='running', locked_by=worker, locked_until=locked_until, attempts=F('attempts') + 1,
+        )
+    for job in jobs:
+        job.state, job.locked_by, job.locked_until = 'running', worker, locked_until
+        job.attempts += 1
+    return jobs
+
+
+def release_jobs(jobs):
+    """Give claimed jobs back without counting the attempt, e.g. when a worker is asked to stop."""
+    Job.objects.filter(pk__in=[job.pk for job in jobs], state='running', locked_by=jobs[0].locked_by).update(
+        state='queued', locked_by='', locked_until=None, attempts=F('attempts') - 1,
+    )
+
+
+def retry_delay(attempts):
+    delay = min(settings.JOB_RETRY_DELAY * 2 ** (attempts - 1), settings.JOB_RETRY_MAX_DELAY)
+    # Jitter keeps jobs that failed together, e.g. during an outage, from all retrying at the same moment.
+    return timedelta(seconds=delay * random.uniform(0.5, 1))
+
+
+def run_job(job):
+    """Run a claimed job; returns whether it succeeded."""
+    registered = _tasks.get(job.task)
+    mine = Job.objects.filter(pk=job.pk, state='running', locked_by=job.locked_by)
+    try:
+        if registered is None:
+            raise LookupError(f"Unknown task {job.task}.")
+        with transaction.atomic():
+            registered.func(**job.kwargs)
+            mine.update(state='done', locked_until=None, finished_at=timezone.now(), last_error='')
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning("Job %s (%s) failed on attempt %s of %s", job.pk, job.task, job.attempts, job.max_attempts, exc_info=True)
+        if job.attempts >= job.max_attempts:
+            mine.update(state='failed', locked_until=None, finished_at=timezone.now(), last_error=error)
+        else:
+            mine.update(state='queued', locked_until=None, run_at=timezone.now() + retry_delay(job.attempts), last_error=error)
+        return False
+    return True
+
+
+def purge_jobs(older_than=None):
+    """Delete finished jobs, which also frees their idempotency keys; failed jobs are kept for inspection."""
+    cutoff = timezone.now() - (older_than or settings.JOB_RETENTION)
+    return Job.objects.filter(state='done', finished_at__lt=cutoff).delete()[0]
+
+
+def work(worker=None, batch_size=None, poll_interval=None, burst=False, should_stop=lambda: False):
+    """Claim and run jobs until should_stop() or, with burst, until none are due. Returns counts."""
+    worker = worker or worker_name()
+    batch_size = batch_size or settings.JOB_BATCH_SIZE
+    poll_interval = settings.JOB_POLL_INTERVAL if poll_interval is None else poll_interval
+    counts = {'done': 0, 'failed': 0}
+    next_purge = time.monotonic()
+    while not should_stop():
+        if not transaction.get_connection().in_atomic_block:
+            # Long-lived processes drop connections past CONN_MAX_AGE or in error, as a request would.
+            close_old_connections()
+        jobs = claim_jobs(worker, batch_size)
+        if not jobs:
+            if burst:
+                break
+            if time.monotonic() >= next_purge:
+                purge_jobs()
+                next_purge = time.monotonic() + 3600
+            time.sleep(poll_interval)
+            continue
+        for index, job in enumerate(jobs):
+            if should_stop():
+                release_jobs(jobs[index:])
+                break
+            counts['done' if run_job(job) else 'failed'] += 1
+    return counts
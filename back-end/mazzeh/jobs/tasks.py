@@ -0,0 +1,6 @@
+from .queue import task
+
+
+@task(name='jobs.noop')
+def noop(**kwargs):
+    """Does nothing; used to measure the queue's own overhead."""
@@ -0,0 +1,84 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from .models import Job
+from .queue import claim_jobs, enqueue, task, work
+
+calls = []
+
+
+@task(name='jobs.tests.record')
+def record(value):
+    calls.append(value)
+
+
+@task(name='jobs.tests.flaky', max_attempts=2)
+def flaky(value):
+    Job.objects.create(task='jobs.tests.side_effect')
+    raise RuntimeError(value)
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_jobs_run_once_and_keys_are_idempotent(self):
+        record.enqueue(key='order-1', value=1)
+        record.enqueue(key='order-1', value=1)
+        record.enqueue(value=2)
+
+        self.assertEqual(work(burst=True), {'done': 2, 'failed': 0})
+        self.assertEqual(sorted(calls), [1, 2])
+        record.enqueue(key='order-1', value=1)
+        self.assertEqual(work(burst=True), {'done': 0, 'failed': 0})
+        self.assertEqual(Job.objects.filter(state='done').count(), 2)
+
+    def test_failed_attempts_roll_back_and_retry_with_backoff(self):
+        flaky.enqueue(value='boom')
+
+        with self.assertLogs('jobs.queue', 'WARNING'):
+            self.assertEqual(work(burst=True), {'done': 0, 'failed': 1})
+        job = Job.objects.get(task='jobs.tests.flaky')
+        self.assertEqual((job.state, job.attempts), ('queued', 1))
+        self.assertIn('RuntimeError: boom', job.last_error)
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertFalse(Job.objects.filter(task='jobs.tests.side_effect').exists())
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        with self.assertLogs('jobs.queue', 'WARNING'):
+            work(burst=True)
+        job.refresh_from_db()
+        self.assertEqual((job.state, job.attempts), ('failed', 2))
+
+    def test_expired_leases_are_taken_over(self):
+        record.enqueue(value=1)
+        self.assertEqual(len(claim_jobs('dead-worker', 10)), 1)
+        self.assertEqual(claim_jobs('other-worker', 10), [])
+
+        Job.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(work('other-worker', burst=True), {'done': 1, 'failed': 0})
+        self.assertEqual(Job.objects.get().attempts, 2)
+
+    def test_draining_costs_a_fixed_number_of_queries_per_job(self):
+        # Per batch the claim's select and update, per job the completion update, and a final empty claim.
+        # Inside the test transaction every atomic block also adds a savepoint and its release.
+        for size in (10, 40):
+            for value in range(size):
+                enqueue('jobs.tests.record', value=value)
+            with self.assertNumQueries(size // 10 * 4 + 3 + size * 3):
+                self.assertEqual(work(batch_size=10, burst=True)['done'], size)
+
+
+class JobEnqueueTransactionTests(TransactionTestCase):
+    def test_jobs_are_dropped_with_a_rolled_back_transaction(self):
+        try:
+            with transaction.atomic():
+                record.enqueue(value=1)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+
+        self.assertFalse(Job.objects.exists())
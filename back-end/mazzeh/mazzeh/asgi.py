@@ -2,6 +2,8 @@
 ASGI config for mazzeh project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Served through it, e.g. with ``uvicorn mazzeh.asgi:application``, the async views
+(see mazzeh/asynchronous.py) hold no thread while they wait.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
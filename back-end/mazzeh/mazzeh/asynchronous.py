@@ -0,0 +1,27 @@
+"""
+Helpers for the async read views: plain Django views with async handlers, next to the DRF views.
+
+Served through mazzeh.asgi, such a view holds no thread while it waits. Its queries, cache calls
+and serializers run on a worker thread through sync_to_async, and the event loop serves other
+connections in between, however slowly their clients send or read. Django runs the sync parts of
+one request on a single thread, one after the other, so asyncio.gather over a request's independent
+queries saves the trips back to the event loop between them and keeps one database connection per
+request. Through mazzeh.wsgi the same views still work, each in an event loop of its own.
+"""
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+
+
+async def alist(queryset):
+    """The rows of a queryset, fetched with the async ORM; an awaitable to pass to asyncio.gather."""
+    return [row async for row in queryset]
+
+
+async def serialize(serializer_class, instance, **kwargs):
+    """serializer_class(instance, **kwargs).data, built on a worker thread rather than the event loop."""
+    return await sync_to_async(lambda: serializer_class(instance, **kwargs).data)()
+
+
+def json_response(data, **kwargs):
+    # Lists are valid JSON responses too.
+    return JsonResponse(data, safe=False, **kwargs)
@@ -0,0 +1,39 @@
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+
+class _Rollback(Exception):
+    pass
+
+
+@contextmanager
+def scratch_data():
+    """Run the block in a transaction that is always rolled back, so benchmarks leave no rows behind."""
+    try:
+        with transaction.atomic():
+            yield
+            raise _Rollback
+    except _Rollback:
+        pass
+
+
+def measure(func, repeat=5):
+    timings = []
+    with CaptureQueriesContext(connection) as queries:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+    return {
+        'median_ms': round(statistics.median(timings), 3),
+        'queries': len(queries) // repeat,
+    }
+
+
+def percentile(sorted_values, fraction):
+    """The value below which the given fraction of the sorted values fall (nearest rank)."""
+    return round(sorted_values[min(int(len(sorted_values) * fraction), len(sorted_values) - 1)], 3)
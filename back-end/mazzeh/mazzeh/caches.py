@@ -0,0 +1,36 @@
+"""
+CACHES built from MAZZEH_CACHE_* environment variables.
+
+MAZZEH_CACHE_BACKEND=locmem (default) keeps entries in each process's memory,
+so invalidations made by one process are not seen by the others until the
+entries time out. For several processes use MAZZEH_CACHE_BACKEND=file with a
+shared directory in MAZZEH_CACHE_LOCATION, or MAZZEH_CACHE_BACKEND=redis with
+the URL of any Redis-compatible server (needs the redis package).
+"""
+import os
+
+BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+}
+
+
+def cache_settings(base_dir, environ=os.environ):
+    backend = environ.get('MAZZEH_CACHE_BACKEND', 'locmem')
+    if backend not in BACKENDS:
+        raise ValueError(f"MAZZEH_CACHE_BACKEND must be one of {', '.join(BACKENDS)}, not {backend!r}.")
+    default_locations = {
+        'locmem': 'mazzeh',
+        'file': str(base_dir / 'cache'),
+        'redis': 'redis://127.0.0.1:6379/0',
+    }
+    cache = {
+        'BACKEND': BACKENDS[backend],
+        'LOCATION': environ.get('MAZZEH_CACHE_LOCATION', default_locations[backend]),
+        'KEY_PREFIX': environ.get('MAZZEH_CACHE_KEY_PREFIX', 'mazzeh'),
+    }
+    if backend != 'redis':
+        # Django's default of 300 entries would evict popular menus under ordinary traffic.
+        cache['OPTIONS'] = {'MAX_ENTRIES': int(environ.get('MAZZEH_CACHE_MAX_ENTRIES', 10000))}
+    return {'default': cache}
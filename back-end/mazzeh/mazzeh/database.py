@@ -0,0 +1,79 @@
+"""
+DATABASES built from MAZZEH_DB_* environment variables.
+
+MAZZEH_DB_ENGINE=sqlite (default) uses a single file tuned for one node: WAL so
+readers never block the writer, synchronous=NORMAL, and writers that wait for
+the lock instead of failing. MAZZEH_DB_ENGINE=postgresql reads
+MAZZEH_DB_NAME/USER/PASSWORD/HOST/PORT. Connections are kept open for
+MAZZEH_DB_CONN_MAX_AGE seconds, or pooled when MAZZEH_DB_POOL_MAX_SIZE is set.
+Every host:port in MAZZEH_DB_REPLICAS becomes a read replica alias used by
+mazzeh.routers.PrimaryReplicaRouter.
+
+The test suite runs on either engine, e.g.
+MAZZEH_DB_ENGINE=postgresql MAZZEH_DB_HOST=... python manage.py test
+"""
+import os
+
+SQLITE_INIT_COMMAND = 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL; PRAGMA cache_size=-20000'
+
+
+def sqlite_database(name, busy_timeout=20):
+    return {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': name,
+        'OPTIONS': {
+            # Seconds to wait for the write lock, SQLite's busy_timeout.
+            'timeout': busy_timeout,
+            # Take the write lock at BEGIN; upgrading a read lock later fails immediately when contended.
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': SQLITE_INIT_COMMAND,
+        },
+    }
+
+
+def postgresql_database(environ, host, port):
+    database = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': environ.get('MAZZEH_DB_NAME', 'mazzeh'),
+        'USER': environ.get('MAZZEH_DB_USER', 'mazzeh'),
+        'PASSWORD': environ.get('MAZZEH_DB_PASSWORD', ''),
+        'HOST': host,
+        'PORT': port,
+        'OPTIONS': {},
+    }
+    pool_size = int(environ.get('MAZZEH_DB_POOL_MAX_SIZE', 0))
+    if pool_size:
+        # Django refuses to combine its pool with persistent connections.
+        database['CONN_MAX_AGE'] = 0
+        database['OPTIONS']['pool'] = {
+            'min_size': int(environ.get('MAZZEH_DB_POOL_MIN_SIZE', 2)),
+            'max_size': pool_size,
+            'timeout': int(environ.get('MAZZEH_DB_POOL_TIMEOUT', 10)),
+        }
+    else:
+        database['CONN_MAX_AGE'] = int(environ.get('MAZZEH_DB_CONN_MAX_AGE', 60))
+        database['CONN_HEALTH_CHECKS'] = True
+    return database
+
+
+def _host_port(address, default_port):
+    host, _, port = address.strip().partition(':')
+    return host, port or default_port
+
+
+def database_settings(base_dir, environ=os.environ):
+    engine = environ.get('MAZZEH_DB_ENGINE', 'sqlite')
+    if engine == 'sqlite':
+        return {'default': sqlite_database(environ.get('MAZZEH_DB_NAME', base_dir / 'db.sqlite3'))}
+    if engine != 'postgresql':
+        raise ValueError(f"MAZZEH_DB_ENGINE must be 'sqlite' or 'postgresql', not {engine!r}.")
+
+    default_port = environ.get('MAZZEH_DB_PORT', '5432')
+    databases = {'default': postgresql_database(environ, environ.get('MAZZEH_DB_HOST', 'localhost'), default_port)}
+    replicas = [address for address in environ.get('MAZZEH_DB_REPLICAS', '').split(',') if address.strip()]
+    for number, address in enumerate(replicas, start=1):
+        replica = postgresql_database(environ, *_host_port(address, default_port))
+        # Tests run against the primary only.
+        replica['TEST'] = {'MIRROR': 'default'}
+        databases[f'replica_{number}'] = replica
+    return databases
@@ -0,0 +1,190 @@
+"""
+Per-view request metrics kept in process memory and rendered in the Prometheus text format.
+
+Each worker process has its own registry, so scrape every worker (or sum them in the query).
+"""
+import hmac
+import threading
+from bisect import bisect_left
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden, HttpResponseNotFound
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+_recorder = ContextVar('query_recorder', default=None)
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self):
+        cumulative = 0
+        for bound, count in zip((*self.buckets, '+Inf'), self.counts):
+            cumulative += count
+            yield bound, cumulative
+
+
+class ViewStats:
+    __slots__ = ('latency', 'queries', 'responses', 'query_seconds', 'duplicate_queries')
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.responses = {}
+        self.query_seconds = 0.0
+        self.duplicate_queries = 0
+
+
+class QueryRecorder:
+    """Counts the queries of one request; duplicates are identical SQL with identical parameters."""
+
+    __slots__ = ('count', 'seconds', 'seen')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.seen = set()
+
+    @property
+    def duplicates(self):
+        return self.count - len(self.seen)
+
+    def add(self, sql, params, seconds):
+        self.count += 1
+        self.seconds += seconds
+        self.seen.add((sql, repr(params)))
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper; does nothing outside a recorded request."""
+    recorder = _recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        recorder.add(sql, params, perf_counter() - start)
+
+
+def install_query_recorder(connection, **kwargs):
+    # Connected to connection_created; reconnects reuse the wrapper object, so add it once.
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def start_recording():
+    """Record the queries run from this context, including sync_to_async threads, until stop_recording()."""
+    recorder = QueryRecorder()
+    return recorder, _recorder.set(recorder)
+
+
+def stop_recording(token):
+    _recorder.reset(token)
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+        self.throttled = {}
+
+    def record(self, view, method, status, seconds, recorder):
+        with self.lock:
+            stats = self.views.get((view, method))
+            if stats is None:
+                stats = self.views[(view, method)] = ViewStats()
+            stats.latency.observe(seconds)
+            stats.responses[status] = stats.responses.get(status, 0) + 1
+            if recorder is not None:
+                stats.queries.observe(recorder.count)
+                stats.query_seconds += recorder.seconds
+                stats.duplicate_queries += recorder.duplicates
+
+    def record_throttled(self, scope, limit):
+        with self.lock:
+            self.throttled[(scope, limit)] = self.throttled.get((scope, limit), 0) + 1
+
+    def clear(self):
+        with self.lock:
+            self.views.clear()
+            self.throttled.clear()
+
+    def render(self):
+        with self.lock:
+            views = sorted(self.views.items())
+            lines = []
+            _histogram(lines, 'mazzeh_http_request_duration_seconds', "Time to produce the response.",
+                       ((key, stats.latency) for key, stats in views))
+            lines += [
+                "# HELP mazzeh_http_responses_total Responses by status code.",
+                "# TYPE mazzeh_http_responses_total counter",
+            ]
+            for (view, method), stats in views:
+                for status, count in sorted(stats.responses.items()):
+                    lines.append(f'mazzeh_http_responses_total{{{_labels(view, method)},status="{status}"}} {count}')
+            _histogram(lines, 'mazzeh_db_queries_per_request', "Database queries run by one request.",
+                       ((key, stats.queries) for key, stats in views if stats.queries.count))
+            _counter(lines, 'mazzeh_db_query_duration_seconds_total', "Time spent in database queries.",
+                     ((key, round(stats.query_seconds, 6)) for key, stats in views if stats.queries.count))
+            _counter(lines, 'mazzeh_db_duplicate_queries_total', "Queries repeating an earlier query of the same request.",
+                     ((key, stats.duplicate_queries) for key, stats in views if stats.queries.count))
+            lines += [
+                "# HELP mazzeh_throttled_requests_total Requests rejected by a rate limit, see mazzeh.throttling.",
+                "# TYPE mazzeh_throttled_requests_total counter",
+            ]
+            for (scope, limit), count in sorted(self.throttled.items()):
+                lines.append(f'mazzeh_throttled_requests_total{{scope="{_escape(scope)}",limit="{limit}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(view, method):
+    return f'view="{_escape(view)}",method="{method}"'
+
+
+def _histogram(lines, name, help_text, histograms):
+    lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+    for (view, method), histogram in histograms:
+        labels = _labels(view, method)
+        for bound, cumulative in histogram.samples():
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{labels}}} {round(histogram.sum, 6)}')
+        lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+
+
+def _counter(lines, name, help_text, values):
+    lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+    for (view, method), value in values:
+        lines.append(f'{name}{{{_labels(view, method)}}} {value}')
+
+
+registry = Registry()
+
+
+def metrics_view(request):
+    if not settings.METRICS_ENABLED:
+        return HttpResponseNotFound()
+    if settings.METRICS_TOKEN:
+        expected = f"Bearer {settings.METRICS_TOKEN}"
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), expected):
+            return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,64 @@
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from .metrics import install_query_recorder, registry, start_recording, stop_recording
+
+METRICS_REQUEST_HEADER = 'X-Mazzeh-Metrics'
+
+
+class InstrumentationMiddleware:
+    """
+    Records latency, query count, query time and duplicate queries per view into
+    mazzeh.metrics.registry. With METRICS_ENABLED off it removes itself from the stack.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        connection_created.connect(install_query_recorder)
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        recorder, token = start_recording()
+        start = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            stop_recording(token)
+        return self.finish(request, response, perf_counter() - start, recorder)
+
+    async def __acall__(self, request):
+        # The context variable follows the request into sync_to_async threads, so their queries count too.
+        recorder, token = start_recording()
+        start = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            stop_recording(token)
+        return self.finish(request, response, perf_counter() - start, recorder)
+
+    def finish(self, request, response, seconds, recorder):
+        match = request.resolver_match
+        view = match.route if match else 'unmatched'
+        registry.record(view, request.method, response.status_code, seconds, recorder)
+        if settings.METRICS_RESPONSE_HEADER and request.headers.get(METRICS_REQUEST_HEADER):
+            response['Server-Timing'] = (
+                f'app;dur={seconds * 1000:.1f}, '
+                f'db;dur={recorder.seconds * 1000:.1f};desc="{recorder.count} queries, {recorder.duplicates} duplicates"'
+            )
+        return response
@@ -10,9 +10,13 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from datetime import timedelta
 from pathlib import Path
 
+from .caches import cache_settings
+from .database import database_settings
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -43,9 +47,12 @@ INSTALLED_APPS = [
     "corsheaders",
     'restaurant',
     'order',
+    'jobs',
 ]
 
 MIDDLEWARE = [
+    # Outermost so it sees the whole request; removes itself unless METRICS_ENABLED.
+    'mazzeh.middleware.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -78,13 +85,16 @@ WSGI_APPLICATION = 'mazzeh.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
+# Configured from MAZZEH_DB_* environment variables, see mazzeh/database.py.
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
-}
+DATABASES = database_settings(BASE_DIR)
+DATABASE_ROUTERS = ['mazzeh.routers.PrimaryReplicaRouter']
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/ref/settings/#caches
+# Configured from MAZZEH_CACHE_* environment variables, see mazzeh/caches.py.
+
+CACHES = cache_settings(BASE_DIR)
 
 
 # Password validation
@@ -105,6 +115,32 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing. New passwords use MAZZEH_PASSWORD_HASHER ('scrypt', 'argon2',
+# which needs argon2-cffi, or 'pbkdf2_sha256'); hashes made by the others or with
+# other parameters are upgraded on the next successful login.
+# `manage.py benchmark_password_hashing` measures signup and login throughput per core.
+PASSWORD_HASHER = os.environ.get('MAZZEH_PASSWORD_HASHER', 'scrypt')
+PASSWORD_HASHER_PARAMS = {
+    'argon2': {'time_cost': 2, 'memory_cost': 19456, 'parallelism': 1},
+    'scrypt': {'work_factor': 2 ** 14, 'block_size': 8, 'parallelism': 1},
+    'pbkdf2_sha256': {'iterations': 600000},
+}
+_PASSWORD_HASHERS = {
+    'argon2': 'user.hashers.Argon2PasswordHasher',
+    'scrypt': 'user.hashers.ScryptPasswordHasher',
+    'pbkdf2_sha256': 'user.hashers.PBKDF2PasswordHasher',
+}
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[PASSWORD_HASHER]] + [
+    hasher for name, hasher in _PASSWORD_HASHERS.items() if name != PASSWORD_HASHER
+]
+# Threads that hash passwords for async logins, away from the event loop.
+PASSWORD_HASHING_WORKERS = os.cpu_count() or 1
+
+AUTHENTICATION_BACKENDS = ['user.backends.ModelBackend']
+
+# Swaps in a fast password hasher for the test suite.
+TEST_RUNNER = 'mazzeh.test_runner.TestRunner'
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
@@ -117,12 +153,40 @@ USE_I18N = True
 
 USE_TZ = True
 
+# Opening hours are wall-clock times of the restaurants' cities, see restaurant.schedule.
+RESTAURANT_TIME_ZONE = os.environ.get('MAZZEH_RESTAURANT_TIME_ZONE', 'Asia/Tehran')
+
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = 'static/'
 
+# Uploaded photos. Resized variants are stored under photo-variants/ with
+# content-hashed names, so they can be served with far-future cache headers.
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+PHOTO_VARIANT_WORKERS = 2
+
+# Distance-based delivery pricing, see restaurant.delivery. Fees are in the currency of delivery_price.
+DELIVERY_QUOTES = {
+    'included_km': 2.0,
+    'fee_per_km': 5.0,
+    'max_km': 15.0,
+    'road_factor': 1.3,
+    'speed_kmh': 25.0,
+    'handoff_minutes': 5,
+    'default_prep_minutes': 20,
+}
+
+# Background jobs, see jobs.queue.
+JOB_BATCH_SIZE = 20
+JOB_POLL_INTERVAL = 1.0
+JOB_LEASE = timedelta(minutes=10)
+JOB_RETRY_DELAY = 10
+JOB_RETRY_MAX_DELAY = 3600
+JOB_RETENTION = timedelta(days=7)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -132,7 +196,8 @@ AUTH_USER_MODEL = 'user.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # Builds request.user from the token claims, see user.authentication.
+        'user.authentication.ClaimsJWTAuthentication',
     ),
 }
 
@@ -142,4 +207,31 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(hours=96),
 }
 
-CORS_ALLOW_ALL_ORIGINS = True
\ No newline at end of file
+CORS_ALLOW_ALL_ORIGINS = True
+
+# Per-view latency and query metrics in the Prometheus text format at /metrics,
+# guarded by a bearer token when METRICS_TOKEN is set. Clients may ask for a
+# Server-Timing header with `X-Mazzeh-Metrics: 1` if METRICS_RESPONSE_HEADER is on.
+METRICS_ENABLED = os.environ.get('MAZZEH_METRICS', '') == '1'
+METRICS_TOKEN = os.environ.get('MAZZEH_METRICS_TOKEN')
+METRICS_RESPONSE_HEADER = DEBUG
+
+# Token-bucket limits of the endpoints that hash passwords or create accounts, see
+# mazzeh.throttling. 'N/period' allows bursts of N requests refilled at N per period;
+# 'endpoint' is shared by all clients and caps the hashing work of the whole worker.
+# Use 'mazzeh.throttling.RedisBucketStore' to share the buckets between processes.
+THROTTLE_STORE = os.environ.get('MAZZEH_THROTTLE_STORE', 'mazzeh.throttling.MemoryBucketStore')
+THROTTLE_REDIS_URL = os.environ.get('MAZZEH_THROTTLE_REDIS_URL', 'redis://127.0.0.1:6379/1')
+# Reverse proxies in front of the app that append the client address to X-Forwarded-For.
+# With 0 the 'ip' limit keys on REMOTE_ADDR and ignores the header, which clients can forge.
+THROTTLE_TRUSTED_PROXIES = int(os.environ.get('MAZZEH_THROTTLE_TRUSTED_PROXIES', 0))
+THROTTLE_RATES = {
+    'login': {'ip': '20/min', 'phone_number': '10/min', 'endpoint': '300/min'},
+    'signup': {'ip': '5/min', 'phone_number': '3/hour', 'endpoint': '120/min'},
+    'set_password': {'ip': '10/min', 'endpoint': '120/min'},
+}
+
+# Order state push channel. Use 'order.events.UnixSocketBroker' together with
+# `manage.py run_order_broker` when running more than one ASGI worker.
+ORDER_EVENTS_BROKER = 'order.events.InProcessBroker'
+ORDER_EVENTS_SOCKET = BASE_DIR / 'order-events.sock'
\ No newline at end of file
@@ -0,0 +1,277 @@
+"""
+Seeded synthetic data at production-like scale, for benchmarks and load tests.
+
+generate() writes customers with saved locations, restaurants with coordinates and opening hours
+spread over a few cities, menus, months of orders with their lines and ready_for_pickup events,
+reviews, favorites and open carts. Everything goes through bulk_create in batches and the
+signals are skipped, so the derived tables (scores, favorite counts, opening intervals, daily stats,
+prep times, recommendations and the search index) are rebuilt by their rebuild commands at the end.
+
+The same seed and scale produce the same rows; only the dates move with the day it runs. Synthetic
+phone numbers start with CUSTOMER_PREFIX and MANAGER_PREFIX and every user's password is PASSWORD.
+"""
+import datetime
+import io
+import random
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.db import transaction
+from django.utils import timezone
+
+from customer.models import Cart, CartItem, CustomerProfile, Favorite
+from order.models import Order, OrderEvent, OrderItem, Review
+from restaurant.models import Item, RestaurantProfile
+from user.models import User
+
+PASSWORD = "mazzeh-synthetic"
+CUSTOMER_PREFIX = "0990"
+MANAGER_PREFIX = "0991"
+
+CITIES = {
+    'Tehran': (35.6892, 51.3890),
+    'Mashhad': (36.2605, 59.6168),
+    'Isfahan': (32.6546, 51.6680),
+    'Shiraz': (29.5918, 52.5837),
+    'Tabriz': (38.0800, 46.2919),
+}
+# Share of customers and restaurants in each city.
+CITY_WEIGHTS = (45, 15, 15, 15, 10)
+CITY_RADIUS_DEGREES = 0.12
+
+DISHES = {
+    'restaurant': [
+        "Kabab Koobideh", "Joojeh Kabab", "Barg Kabab", "Ghormeh Sabzi", "Gheimeh", "Fesenjan", "Zereshk Polo",
+        "Baghali Polo", "Tahchin", "Dizi", "Mirza Ghasemi", "Kashk Bademjan", "Ash Reshteh", "Chelo Morgh",
+        "Shirin Polo", "Kalam Polo", "Kookoo Sabzi", "Salad Shirazi", "Doogh", "Mast-o-Khiar",
+    ],
+    'cafe': ["Espresso", "Cappuccino", "Latte", "Turkish Coffee", "Saffron Tea", "Club Sandwich", "Cheesecake", "Croissant"],
+    'bakery': ["Sangak", "Barbari", "Lavash", "Taftoon", "Nan-e Berenji", "Nan-e Nokhodchi", "Koloocheh", "Shirmal"],
+    'sweets': ["Baklava", "Gaz", "Sohan", "Zoolbia", "Bamieh", "Pashmak", "Shole Zard", "Halva"],
+    'ice_cream': ["Bastani Sonnati", "Faloodeh", "Akbar Mashti", "Saffron Cone", "Pistachio Cup", "Rosewater Sorbet"],
+}
+BUSINESS_WEIGHTS = (60, 15, 10, 10, 5)
+HOURS = [
+    (datetime.time(9), datetime.time(23)),
+    (datetime.time(11), datetime.time(16)),
+    (datetime.time(12), datetime.time(0, 30)),
+    (datetime.time(18), datetime.time(2)),
+    (datetime.time(0), datetime.time(0)),
+]
+# Orders per hour of the day: lunch and dinner peaks.
+HOUR_WEIGHTS = (1, 1, 0, 0, 0, 0, 0, 1, 2, 3, 4, 8, 14, 12, 6, 3, 3, 4, 8, 14, 15, 11, 6, 3)
+ACTIVE_STATES = ('pending', 'preparing', 'ready_for_pickup', 'delivering')
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    """Let bulk_create store the given auto_now_add fields as set, instead of the current time."""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def near(rng, center):
+    return (
+        Decimal(f"{center[0] + rng.uniform(-CITY_RADIUS_DEGREES, CITY_RADIUS_DEGREES):.6f}"),
+        Decimal(f"{center[1] + rng.uniform(-CITY_RADIUS_DEGREES, CITY_RADIUS_DEGREES):.6f}"),
+    )
+
+
+def line_total(item, count):
+    return item.price * count * (100 - item.discount) / 100
+
+
+class Generator:
+    def __init__(self, seed=0, customers=10000, restaurants=500, items_per_restaurant=30, orders_per_customer=10,
+                 days=180, batch_size=5000, log=print):
+        self.rng = random.Random(seed)
+        self.customers = customers
+        self.restaurants = restaurants
+        self.items_per_restaurant = items_per_restaurant
+        self.orders_per_customer = orders_per_customer
+        self.days = days
+        self.batch_size = batch_size
+        self.log = log
+        self.counts = {}
+
+    def stage(self, name, func, *args, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        self.log(f"{name}: {time.perf_counter() - start:.1f}s")
+        return result
+
+    def bulk(self, model, objects):
+        created = model.objects.bulk_create(objects, batch_size=self.batch_size)
+        self.counts[model.__name__] = self.counts.get(model.__name__, 0) + len(created)
+        return created
+
+    def generate(self):
+        if User.objects.filter(phone_number__startswith=CUSTOMER_PREFIX).exists():
+            raise ValueError("Synthetic data is already loaded; start from an empty database (manage.py flush).")
+        self.password = make_password(PASSWORD)
+        self.now = timezone.now()
+        with transaction.atomic():
+            menus = self.stage("restaurants and menus", self.generate_restaurants)
+            customer_cities = self.stage("customers", self.generate_customers)
+            self.stage("orders and reviews", self.generate_orders, customer_cities, menus)
+            self.stage("favorites and carts", self.generate_favorites_and_carts, customer_cities, menus)
+        for command in (
+            'rebuild_opening_intervals', 'rebuild_scores', 'rebuild_favorite_counts', 'rebuild_daily_stats',
+            'refresh_prep_minutes', 'rebuild_recommendations', 'rebuild_search_index',
+        ):
+            self.stage(command, call_command, command, stdout=io.StringIO())
+        return self.counts
+
+    def generate_restaurants(self):
+        rng = self.rng
+        managers = self.bulk(User, (
+            User(phone_number=f"{MANAGER_PREFIX}{i:07d}", password=self.password, role='restaurant_manager',
+                 first_name="Manager", last_name=str(i))
+            for i in range(self.restaurants)
+        ))
+        profiles = []
+        for i, manager in enumerate(managers):
+            city_name = rng.choices(list(CITIES), CITY_WEIGHTS)[0]
+            business_type = rng.choices([choice for choice, _ in RestaurantProfile.BUSINESS_TYPES], BUSINESS_WEIGHTS)[0]
+            open_hour, close_hour = rng.choice(HOURS)
+            latitude, longitude = near(rng, CITIES[city_name])
+            profile = RestaurantProfile(
+                manager=manager, name=f"{rng.choice(DISHES[business_type])} House {i}", business_type=business_type,
+                city_name=city_name, state=rng.choices(['approved', 'pending', 'rejected'], (92, 6, 2))[0],
+                delivery_price=rng.choice([0, 10, 20, 30]), open_hour=open_hour, close_hour=close_hour,
+                latitude=latitude, longitude=longitude, address=f"{city_name}, street {rng.randint(1, 400)}",
+            )
+            profile.update_geohash()
+            profiles.append(profile)
+        profiles = self.bulk(RestaurantProfile, profiles)
+
+        items = []
+        for profile in profiles:
+            dishes = DISHES[profile.business_type]
+            for i in range(max(1, round(rng.gauss(self.items_per_restaurant, self.items_per_restaurant / 4)))):
+                items.append(Item(
+                    restaurant=profile, name=f"{dishes[i % len(dishes)]} {i // len(dishes) + 1}",
+                    price=Decimal(rng.randrange(40, 800, 5)), discount=rng.choices([0, 10, 20], (80, 15, 5))[0],
+                    state=rng.choices(['available', 'unavailable'], (95, 5))[0],
+                ))
+        items = self.bulk(Item, items)
+
+        # Menus of the approved restaurants by city, with a few popular dishes in each.
+        menus = {city_name: [] for city_name in CITIES}
+        by_restaurant = {}
+        for item in items:
+            if item.state == 'available':
+                by_restaurant.setdefault(item.restaurant_id, []).append(item)
+        for profile in profiles:
+            menu = by_restaurant.get(profile.pk)
+            if profile.state == 'approved' and menu:
+                menus[profile.city_name].append((profile, menu, [1 / (rank + 1) for rank in range(len(menu))]))
+        return menus
+
+    def generate_customers(self):
+        rng = self.rng
+        cities = []
+        for start in range(0, self.customers, self.batch_size):
+            users = self.bulk(User, (
+                User(phone_number=f"{CUSTOMER_PREFIX}{i:07d}", password=self.password, first_name="Customer", last_name=str(i))
+                for i in range(start, min(start + self.batch_size, self.customers))
+            ))
+            profiles = []
+            for user in users:
+                city_name = rng.choices(list(CITIES), CITY_WEIGHTS)[0]
+                latitude, longitude = near(rng, CITIES[city_name])
+                profiles.append(CustomerProfile(user=user, latitude=latitude, longitude=longitude, address=city_name))
+                cities.append((user.pk, city_name))
+            self.bulk(CustomerProfile, profiles)
+        return cities
+
+    def order_time(self):
+        day = self.rng.randrange(self.days)
+        hour = self.rng.choices(range(24), HOUR_WEIGHTS)[0]
+        moment = (self.now - datetime.timedelta(days=day)).replace(
+            hour=hour, minute=self.rng.randrange(60), second=self.rng.randrange(60),
+        )
+        return moment - datetime.timedelta(days=1) if moment > self.now else moment
+
+    def generate_orders(self, customer_cities, menus):
+        rng = self.rng
+        date_field, event_field = Order._meta.get_field('order_date'), OrderEvent._meta.get_field('created_at')
+        with explicit_timestamps(date_field, event_field):
+            # Customers per round, so that each round inserts about batch_size orders.
+            chunk = max(1, self.batch_size // self.orders_per_customer)
+            for start in range(0, len(customer_cities), chunk):
+                orders, baskets = [], []
+                for user_id, city_name in customer_cities[start:start + chunk]:
+                    if not menus[city_name]:
+                        continue
+                    # Customers keep going back to a few restaurants.
+                    regulars = rng.sample(menus[city_name], min(3, len(menus[city_name])))
+                    for _ in range(max(0, round(rng.expovariate(1 / self.orders_per_customer)))):
+                        restaurant, menu, weights = rng.choice(regulars) if rng.random() < 0.8 else rng.choice(menus[city_name])
+                        basket = {item.pk: item for item in rng.choices(menu, weights, k=rng.randint(1, 5))}
+                        lines = [(item, rng.choices([1, 2, 3], (75, 20, 5))[0]) for item in basket.values()]
+                        order_date = self.order_time()
+                        recent = self.now - order_date < datetime.timedelta(hours=2)
+                        delivery = rng.random() < 0.6
+                        orders.append(Order(
+                            user_id=user_id, restaurant=restaurant, order_date=order_date,
+                            state=rng.choice(ACTIVE_STATES[:3]) if recent else 'completed',
+                            delivery_method='delivery' if delivery else 'pickup',
+                            payment_method=rng.choice(['in_person', 'online']),
+                            delivery_price=restaurant.delivery_price if delivery else 0,
+                            total_price=sum(line_total(item, count) for item, count in lines)
+                            + (restaurant.delivery_price if delivery else 0),
+                        ))
+                        baskets.append(lines)
+                orders = self.bulk(Order, orders)
+                self.bulk(OrderItem, (
+                    OrderItem(order=order, item=item, count=count, price=item.price, discount=item.discount)
+                    for order, lines in zip(orders, baskets)
+                    for item, count in lines
+                ))
+                completed = [order for order in orders if order.state == 'completed']
+                self.bulk(OrderEvent, (
+                    OrderEvent(
+                        order=order, restaurant_id=order.restaurant_id, from_state='preparing', to_state='ready_for_pickup',
+                        created_at=order.order_date + datetime.timedelta(minutes=rng.randint(8, 45)),
+                    )
+                    for order in completed
+                ))
+                self.bulk(Review, (
+                    Review(user_id=order.user_id, order=order, score=rng.choices([1, 2, 3, 4, 5], (5, 5, 15, 35, 40))[0])
+                    for order in completed if rng.random() < 0.3
+                ))
+
+    def generate_favorites_and_carts(self, customer_cities, menus):
+        rng = self.rng
+        favorites, carts, cart_lines = [], [], []
+        for user_id, city_name in customer_cities:
+            restaurants = menus[city_name]
+            for restaurant, _, _ in rng.sample(restaurants, min(rng.choices([0, 1, 2, 3, 5], (40, 25, 15, 12, 8))[0], len(restaurants))):
+                favorites.append(Favorite(user_id=user_id, restaurant=restaurant))
+            if restaurants and rng.random() < 0.1:
+                restaurant, menu, weights = rng.choice(restaurants)
+                basket = {item.pk: item for item in rng.choices(menu, weights, k=rng.randint(1, 4))}
+                lines = [(item, rng.randint(1, 2)) for item in basket.values()]
+                carts.append(Cart(user_id=user_id, restaurant=restaurant, total_price=sum(line_total(i, c) for i, c in lines)))
+                cart_lines.append(lines)
+        self.bulk(Favorite, favorites)
+        carts = self.bulk(Cart, carts)
+        self.bulk(CartItem, (
+            CartItem(cart=cart, item=item, count=count, price=item.price, discount=item.discount)
+            for cart, lines in zip(carts, cart_lines)
+            for item, count in lines
+        ))
+
+
+def generate(**options):
+    """Load a synthetic dataset; returns the number of rows created per model."""
+    return Generator(**options).generate()
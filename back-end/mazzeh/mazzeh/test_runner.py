@@ -0,0 +1,15 @@
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """Runs the suite with a cheap password hasher; production hashers are far too slow for tests."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.fast_hashing = override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+        self.fast_hashing.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.fast_hashing.disable()
+        super().teardown_test_environment(**kwargs)
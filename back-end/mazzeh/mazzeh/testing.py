@@ -0,0 +1,21 @@
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+
+class QueryBudgetMixin:
+    """TestCase mixin to fail when a block runs more queries than budgeted, or repeats a query."""
+
+    @contextmanager
+    def assertQueryBudget(self, budget, duplicates=0, using=DEFAULT_DB_ALIAS):
+        with CaptureQueriesContext(connections[using]) as captured:
+            yield captured
+        queries = [query['sql'] for query in captured.captured_queries]
+        # Captured SQL has the parameters inlined, so equal strings are the same query run twice.
+        repeated = len(queries) - len(set(queries))
+        listing = '\n'.join(f'{number}. {sql}' for number, sql in enumerate(queries, start=1))
+        if len(queries) > budget:
+            self.fail(f"{len(queries)} queries exceed the budget of {budget}:\n{listing}")
+        if repeated > duplicates:
+            self.fail(f"{repeated} duplicate queries, {duplicates} allowed:\n{listing}")
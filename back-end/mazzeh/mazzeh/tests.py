@@ -0,0 +1,199 @@
+from pathlib import Path
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.db import transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.views import View
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework.views import APIView
+
+from user.models import User
+from .database import database_settings
+from .metrics import QueryRecorder, registry
+from .routers import PrimaryReplicaRouter, ReplicaReadMixin, replica_reads
+from .throttling import MemoryBucketStore, get_store
+
+
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        registry.clear()
+        self.customer = User.objects.create_user("09120000002", "pass")
+
+    @override_settings(METRICS_ENABLED=True, METRICS_RESPONSE_HEADER=True)
+    def test_records_view_metrics(self):
+        client = APIClient()
+        client.force_authenticate(self.customer)
+
+        response = client.get('/api/order/history', HTTP_X_MAZZEH_METRICS='1')
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('1 queries, 0 duplicates', response['Server-Timing'])
+
+        metrics = client.get('/metrics').content.decode()
+        self.assertIn('mazzeh_http_responses_total{view="api/order/history",method="GET",status="200"} 1', metrics)
+        self.assertIn('mazzeh_db_queries_per_request_bucket{view="api/order/history",method="GET",le="1"} 1', metrics)
+
+    @override_settings(METRICS_ENABLED=True, METRICS_TOKEN='secret')
+    def test_metrics_endpoint_requires_token(self):
+        client = APIClient()
+        self.assertEqual(client.get('/metrics').status_code, 403)
+        self.assertEqual(client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+
+    def test_disabled_middleware_records_nothing(self):
+        client = APIClient()
+        client.force_authenticate(self.customer)
+        response = client.get('/api/order/history', HTTP_X_MAZZEH_METRICS='1')
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(client.get('/metrics').status_code, 404)
+        self.assertEqual(registry.views, {})
+
+    def test_recorder_counts_duplicates(self):
+        recorder = QueryRecorder()
+        for params in ([1], [2], [1]):
+            recorder.add('SELECT %s', params, 0.001)
+        self.assertEqual((recorder.count, recorder.duplicates), (3, 1))
+
+
+class ThrottlingTests(TestCase):
+    def setUp(self):
+        registry.clear()
+        get_store().clear()
+        self.addCleanup(get_store().clear)
+        self.client = APIClient()
+
+    def login(self, phone_number, ip='10.0.0.1'):
+        return self.client.post(
+            '/api/auth/token', {'phone_number': phone_number, 'password': 'wrong'}, REMOTE_ADDR=ip,
+        )
+
+    @override_settings(THROTTLE_RATES={'login': {'ip': '2/min', 'phone_number': '2/min', 'endpoint': '5/min'}})
+    def test_limits_apply_per_ip_phone_number_and_endpoint(self):
+        self.assertEqual([self.login(f"0912000000{i}").status_code for i in range(3)], [401, 401, 429])
+        self.assertEqual(self.login("09120000009", ip='10.0.0.2').status_code, 401)
+
+        self.assertEqual(self.login("09120000009", ip='10.0.0.3').status_code, 401)
+        response = self.login("09120000009", ip='10.0.0.4')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+        self.assertEqual(self.login("09120000008", ip='10.0.0.5').status_code, 401)
+        self.assertEqual(self.login("09120000007", ip='10.0.0.6').status_code, 429)
+
+        metrics = registry.render()
+        for limit in ('ip', 'phone_number', 'endpoint'):
+            self.assertIn(f'mazzeh_throttled_requests_total{{scope="login",limit="{limit}"}} 1', metrics)
+
+    @override_settings(THROTTLE_RATES={'login': {'ip': '2/min'}})
+    def test_forged_forwarded_for_does_not_open_new_ip_buckets(self):
+        statuses = [
+            self.client.post(
+                '/api/auth/token', {'phone_number': '09120000001', 'password': 'wrong'},
+                REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR=f'192.0.2.{i}',
+            ).status_code
+            for i in range(3)
+        ]
+        self.assertEqual(statuses, [401, 401, 429])
+
+        with self.settings(THROTTLE_TRUSTED_PROXIES=1):
+            # Behind one proxy, the last entry is the address the proxy saw; the forged first one is ignored.
+            response = self.client.post(
+                '/api/auth/token', {'phone_number': '09120000001', 'password': 'wrong'},
+                REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='192.0.2.9, 198.51.100.7',
+            )
+            self.assertEqual(response.status_code, 401)
+
+    @override_settings(THROTTLE_RATES={'signup': {'ip': '1/min'}})
+    def test_rejected_signups_never_reach_the_database(self):
+        data = {'phone_number': '09120000001', 'first_name': 'A', 'last_name': 'B', 'password': 'secret-pass-1'}
+        self.assertEqual(self.client.post('/api/auth/signup/customer', data).status_code, 201)
+        with self.assertNumQueries(0):
+            response = self.client.post('/api/auth/signup/customer', {**data, 'phone_number': '09120000002'})
+        self.assertEqual(response.status_code, 429)
+
+    def test_memory_buckets_refill_and_stay_bounded(self):
+        store = MemoryBucketStore(max_buckets=4)
+        self.assertEqual([store.take('a', 1.0, 2, now=0) for _ in range(3)], [0, 0, 1.0])
+        self.assertEqual(store.take('a', 1.0, 2, now=1.5), 0)
+        self.assertEqual(store.take('a', 1.0, 2, now=1.5), 0.5)
+
+        for key in 'bcde':
+            store.take(key, 1.0, 2, now=2)
+        self.assertLessEqual(len(store.buckets), 4)
+        self.assertIn('e', store.buckets)
+
+
+class DatabaseSettingsTests(SimpleTestCase):
+    def test_sqlite_is_the_default(self):
+        databases = database_settings(Path('/srv/mazzeh'), {})
+        self.assertEqual(list(databases), ['default'])
+        self.assertEqual(databases['default']['ENGINE'], 'django.db.backends.sqlite3')
+        self.assertEqual(databases['default']['NAME'], Path('/srv/mazzeh/db.sqlite3'))
+        self.assertEqual(database_settings(Path('/srv'), {'MAZZEH_DB_NAME': '/tmp/x.sqlite3'})['default']['NAME'], '/tmp/x.sqlite3')
+
+        with self.assertRaises(ValueError):
+            database_settings(Path('/srv'), {'MAZZEH_DB_ENGINE': 'mysql'})
+
+    def test_postgresql_with_replicas(self):
+        databases = database_settings(Path('/srv'), {
+            'MAZZEH_DB_ENGINE': 'postgresql', 'MAZZEH_DB_HOST': 'primary', 'MAZZEH_DB_PASSWORD': 'secret',
+            'MAZZEH_DB_CONN_MAX_AGE': '30', 'MAZZEH_DB_REPLICAS': 'replica-a, replica-b:6432,',
+        })
+        self.assertEqual(list(databases), ['default', 'replica_1', 'replica_2'])
+        self.assertEqual(
+            [(database['HOST'], database['PORT']) for database in databases.values()],
+            [('primary', '5432'), ('replica-a', '5432'), ('replica-b', '6432')],
+        )
+        for alias, database in databases.items():
+            self.assertEqual((database['NAME'], database['USER'], database['PASSWORD']), ('mazzeh', 'mazzeh', 'secret'))
+            self.assertEqual((database['CONN_MAX_AGE'], database['CONN_HEALTH_CHECKS']), (30, True))
+            self.assertEqual(database.get('TEST'), None if alias == 'default' else {'MIRROR': 'default'})
+
+    def test_pooled_postgresql_connections_are_not_persistent(self):
+        database = database_settings(Path('/srv'), {
+            'MAZZEH_DB_ENGINE': 'postgresql', 'MAZZEH_DB_POOL_MAX_SIZE': '20', 'MAZZEH_DB_POOL_MIN_SIZE': '4',
+        })['default']
+        self.assertEqual(database['CONN_MAX_AGE'], 0)
+        self.assertEqual(database['OPTIONS']['pool'], {'min_size': 4, 'max_size': 20, 'timeout': 10})
+
+
+class RoutedView(ReplicaReadMixin, APIView):
+    authentication_classes = []
+    permission_classes = []
+
+    def get(self, request):
+        return Response(PrimaryReplicaRouter().db_for_read(User))
+
+    post = get
+
+
+class AsyncRoutedView(ReplicaReadMixin, View):
+    async def get(self, request):
+        return HttpResponse(PrimaryReplicaRouter().db_for_read(User))
+
+
+# TestCase would wrap every test in a transaction, and reads inside one always stay on the primary.
+@mock.patch('mazzeh.routers.replica_aliases', return_value=['replica_1'])
+class ReplicaRoutingTests(TransactionTestCase):
+    def test_only_reads_outside_transactions_go_to_replicas(self, replica_aliases):
+        router = PrimaryReplicaRouter()
+        self.assertEqual(router.db_for_read(User), 'default')
+        with replica_reads():
+            self.assertEqual(router.db_for_read(User), 'replica_1')
+            self.assertEqual(router.db_for_write(User), 'default')
+            with transaction.atomic():
+                self.assertEqual(router.db_for_read(User), 'default')
+        self.assertEqual(router.db_for_read(User), 'default')
+        self.assertFalse(router.allow_migrate('replica_1', 'user'))
+
+        replica_aliases.return_value = []
+        with replica_reads():
+            self.assertEqual(router.db_for_read(User), 'default')
+
+    def test_views_read_from_replicas_on_get_only(self, replica_aliases):
+        factory = APIRequestFactory()
+        self.assertEqual(RoutedView.as_view()(factory.get('/')).data, 'replica_1')
+        self.assertEqual(RoutedView.as_view()(factory.post('/')).data, 'default')
+        response = async_to_sync(AsyncRoutedView.as_view())(RequestFactory().get('/'))
+        self.assertEqual(response.content, b'replica_1')
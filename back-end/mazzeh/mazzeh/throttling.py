@@ -0,0 +1,189 @@
+"""
+Token-bucket throttling of the endpoints that hash passwords or create accounts.
+
+A view opts in with throttle_classes = [BucketThrottle] and a throttle_scope naming an entry of
+settings.THROTTLE_RATES. Each entry limits the scope per client IP, per phone number in the request
+body and for all clients together ('endpoint'), with rates written as 'N/period': bursts of up to N
+requests, refilled at N per period. DRF checks throttles before the handler runs, so a rejected
+request never reaches serializer validation, the phone_number uniqueness query or the hasher.
+Views outside DRF call take() themselves.
+Rejections are counted in mazzeh.metrics.registry as mazzeh_throttled_requests_total.
+The client IP is REMOTE_ADDR, or with THROTTLE_TRUSTED_PROXIES = N the address the Nth proxy
+from the end appended to X-Forwarded-For; entries the client put in front are never used.
+
+Buckets live in settings.THROTTLE_STORE: MemoryBucketStore (default) keeps them in each process, so
+every worker enforces the limits on its own; RedisBucketStore shares them between all workers
+through THROTTLE_REDIS_URL (needs the redis package).
+"""
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from rest_framework.throttling import BaseThrottle
+
+from .metrics import registry
+
+PERIODS = {'s': 1, 'sec': 1, 'min': 60, 'hour': 3600, 'day': 86400}
+# Longer values cannot be valid phone numbers; cutting them keeps junk from growing the keys.
+MAX_PHONE_NUMBER_LENGTH = 15
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    """'N/period' -> (tokens refilled per second, bucket capacity)."""
+    count, period = rate.split('/')
+    return int(count) / PERIODS[period], int(count)
+
+
+class MemoryBucketStore:
+    """Buckets of this process. Past max_buckets, full buckets are dropped first, then the oldest."""
+
+    def __init__(self, max_buckets=100000):
+        self.max_buckets = max_buckets
+        self.lock = threading.Lock()
+        # key -> [tokens, last refill time, refill rate, capacity]
+        self.buckets = {}
+
+    def take(self, key, rate, capacity, now=None):
+        """Take a token; returns 0 when allowed, else the seconds until one is available."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                if len(self.buckets) >= self.max_buckets:
+                    self._prune(now)
+                bucket = self.buckets[key] = [capacity, now, rate, capacity]
+            tokens = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            if tokens >= 1:
+                bucket[0] = tokens - 1
+                return 0
+            bucket[0] = tokens
+            return (1 - tokens) / rate
+
+    def _prune(self, now):
+        # A bucket that has refilled behaves exactly like a missing one.
+        self.buckets = {
+            key: bucket for key, bucket in self.buckets.items()
+            if bucket[0] + (now - bucket[1]) * bucket[2] < bucket[3]
+        }
+        if len(self.buckets) >= self.max_buckets:
+            keep = list(self.buckets.items())[len(self.buckets) // 2:]
+            self.buckets = dict(keep)
+
+    def clear(self):
+        with self.lock:
+            self.buckets.clear()
+
+
+class RedisBucketStore:
+    """Buckets shared by every process through Redis; each take is one atomic script call."""
+
+    SCRIPT = """
+    local rate, capacity, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'time')
+    local tokens = tonumber(bucket[1]) or capacity
+    local last = tonumber(bucket[2]) or now
+    tokens = math.min(capacity, tokens + math.max(now - last, 0) * rate)
+    local allowed = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+        allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'time', tostring(now))
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return {allowed, tostring(tokens)}
+    """
+
+    def __init__(self, url=None, prefix='throttle:'):
+        import redis
+
+        self.client = redis.Redis.from_url(url or settings.THROTTLE_REDIS_URL)
+        self.script = self.client.register_script(self.SCRIPT)
+        self.prefix = prefix
+
+    def take(self, key, rate, capacity, now=None):
+        # Wall clock time, as every process has to agree on it.
+        now = time.time() if now is None else now
+        allowed, tokens = self.script(keys=[self.prefix + key], args=[rate, capacity, now])
+        return 0 if allowed else (1 - float(tokens)) / rate
+
+    def clear(self):
+        for key in self.client.scan_iter(f"{self.prefix}*"):
+            self.client.delete(key)
+
+
+@lru_cache(maxsize=None)
+def get_store():
+    return import_string(settings.THROTTLE_STORE)()
+
+
+def request_phone_number(request):
+    return body_phone_number(request.data)
+
+
+def body_phone_number(data):
+    try:
+        phone_number = data.get('phone_number')
+    except AttributeError:
+        # A JSON body that is not an object.
+        return None
+    if not isinstance(phone_number, str) or not phone_number.strip():
+        return None
+    return phone_number.strip()[:MAX_PHONE_NUMBER_LENGTH]
+
+
+def client_ip(request):
+    remote_addr = request.META.get('REMOTE_ADDR')
+    proxies = settings.THROTTLE_TRUSTED_PROXIES
+    if not proxies:
+        return remote_addr
+    addresses = [address.strip() for address in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')]
+    # Each trusted proxy appended the address it was connected from; earlier ones are the client's own claims.
+    return addresses[-proxies] if len(addresses) >= proxies and addresses[-proxies] else remote_addr
+
+
+# Narrow limits first, so a flooding client is turned away before it spends the shared budget.
+LIMITS = ('ip', 'phone_number', 'endpoint')
+
+
+def take(scope, key):
+    """
+    Takes a token from each bucket of the scope; returns 0 when allowed, else the seconds to wait.
+    key(limit) names the bucket of a limit, or None to skip it.
+    """
+    rates = settings.THROTTLE_RATES.get(scope)
+    if not rates:
+        return 0
+    store = get_store()
+    for limit in LIMITS:
+        if limit not in rates:
+            continue
+        name = key(limit)
+        if name is None:
+            continue
+        retry_after = store.take(f"{scope}:{limit}:{name}", *parse_rate(rates[limit]))
+        if retry_after:
+            registry.record_throttled(scope, limit)
+            return retry_after
+    return 0
+
+
+class BucketThrottle(BaseThrottle):
+    """Applies the view's THROTTLE_RATES entry: per IP first, then per phone number, then per endpoint."""
+
+    def allow_request(self, request, view):
+        self.retry_after = take(getattr(view, 'throttle_scope', None), lambda limit: self.key(request, limit))
+        return not self.retry_after
+
+    def key(self, request, limit):
+        if limit == 'ip':
+            return client_ip(request)
+        if limit == 'phone_number':
+            return request_phone_number(request)
+        return ''
+
+    def wait(self):
+        return self.retry_after
@@ -16,8 +16,13 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from .metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/auth/', include('user.urls')), 
+    path('api/restaurant/', include('restaurant.urls')),
+    path('api/order/', include('order.urls')),
+    path('api/customer/', include('customer.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
@@ -0,0 +1,177 @@
+import datetime
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailyItemStats, DailyRestaurantStats, Order, OrderItem, Review
+
+LINE_REVENUE = ExpressionWrapper(
+    F('count') * F('price') * (100 - F('discount')) / 100,
+    output_field=DecimalField(max_digits=14, decimal_places=2),
+)
+
+
+def day_bounds(start, end):
+    tz = timezone.get_current_timezone()
+    return (
+        datetime.datetime.combine(start, datetime.time.min, tzinfo=tz),
+        datetime.datetime.combine(end, datetime.time.min, tzinfo=tz),
+    )
+
+
+def refresh_daily_stats(start, end, restaurant_ids=None):
+    """Recompute the daily rollup rows for the days in [start, end) from completed orders."""
+    lower, upper = day_bounds(start, end)
+    orders = Order.objects.filter(state='completed', order_date__gte=lower, order_date__lt=upper)
+    if restaurant_ids is not None:
+        orders = orders.filter(restaurant_id__in=restaurant_ids)
+
+    restaurant_rows = (
+        orders.annotate(day=TruncDate('order_date')).order_by()
+        .values('restaurant_id', 'day')
+        .annotate(order_count=Count('pk'), revenue=Sum('total_price'))
+    )
+    review_rows = (
+        Review.objects.filter(order__in=orders).annotate(day=TruncDate('order__order_date')).order_by()
+        .values('order__restaurant_id', 'day')
+        .annotate(review_count=Count('pk'), score_sum=Sum('score'))
+    )
+    item_rows = (
+        OrderItem.objects.filter(order__in=orders).annotate(day=TruncDate('order__order_date')).order_by()
+        .values('order__restaurant_id', 'item_id', 'day')
+        .annotate(quantity=Sum('count'), revenue=Sum(LINE_REVENUE))
+    )
+
+    reviews = {(row['order__restaurant_id'], row['day']): row for row in review_rows}
+    restaurant_stats = []
+    for row in restaurant_rows:
+        review = reviews.get((row['restaurant_id'], row['day']), {})
+        restaurant_stats.append(DailyRestaurantStats(
+            restaurant_id=row['restaurant_id'],
+            date=row['day'],
+            order_count=row['order_count'],
+            revenue=row['revenue'],
+            review_count=review.get('review_count', 0),
+            score_sum=review.get('score_sum', 0),
+        ))
+    item_stats = [
+        DailyItemStats(
+            restaurant_id=row['order__restaurant_id'],
+            item_id=row['item_id'],
+            date=row['day'],
+            quantity=row['quantity'],
+            revenue=row['revenue'],
+        )
+        for row in item_rows
+    ]
+
+    with transaction.atomic():
+        for model, rows in ((DailyRestaurantStats, restaurant_stats), (DailyItemStats, item_stats)):
+            stale = model.objects.filter(date__gte=start, date__lt=end)
+            if restaurant_ids is not None:
+                stale = stale.filter(restaurant_id__in=restaurant_ids)
+            stale.delete()
+            model.objects.bulk_create(rows, batch_size=500)
+
+
+def _add_to_rollups(restaurant_days, item_days):
+    """Add per-day deltas to the rollup rows, keyed by (restaurant_id, date) and (restaurant_id, item_id, date)."""
+    # Rows are first inserted at zero and then incremented, so concurrent jobs never lose a count.
+    DailyRestaurantStats.objects.bulk_create(
+        [DailyRestaurantStats(restaurant_id=restaurant_id, date=date) for restaurant_id, date in restaurant_days],
+        ignore_conflicts=True,
+    )
+    DailyItemStats.objects.bulk_create(
+        [DailyItemStats(restaurant_id=restaurant_id, item_id=item_id, date=date) for restaurant_id, item_id, date in item_days],
+        ignore_conflicts=True,
+    )
+    for (restaurant_id, date), deltas in restaurant_days.items():
+        DailyRestaurantStats.objects.filter(restaurant_id=restaurant_id, date=date).update(
+            **{field: F(field) + delta for field, delta in deltas.items()}
+        )
+    for (restaurant_id, item_id, date), deltas in item_days.items():
+        DailyItemStats.objects.filter(item_id=item_id, date=date).update(
+            **{field: F(field) + delta for field, delta in deltas.items()}
+        )
+
+
+def record_completed_sales(order_ids, reviews=()):
+    """
+    Add completed orders to the daily rollups; call it once per order. reviews holds
+    (order_id, count, score_sum) for the reviews the orders already had when they completed.
+    """
+    review_totals = {order_id: (count, score_sum) for order_id, count, score_sum in reviews}
+    restaurant_days = {}
+    for order_id, restaurant_id, order_date, total_price in (
+        Order.objects.filter(order_id__in=order_ids, state='completed')
+        .values_list('order_id', 'restaurant_id', 'order_date', 'total_price')
+    ):
+        day = restaurant_days.setdefault(
+            (restaurant_id, timezone.localdate(order_date)),
+            {'order_count': 0, 'revenue': 0, 'review_count': 0, 'score_sum': 0},
+        )
+        review_count, score_sum = review_totals.get(order_id, (0, 0))
+        day['order_count'] += 1
+        day['revenue'] += total_price
+        day['review_count'] += review_count
+        day['score_sum'] += score_sum
+
+    item_days = {}
+    for restaurant_id, item_id, order_date, quantity, revenue in (
+        OrderItem.objects.filter(order_id__in=order_ids, order__state='completed')
+        .annotate(revenue=LINE_REVENUE)
+        .values_list('order__restaurant_id', 'item_id', 'order__order_date', 'count', 'revenue')
+    ):
+        day = item_days.setdefault(
+            (restaurant_id, item_id, timezone.localdate(order_date)), {'quantity': 0, 'revenue': 0},
+        )
+        day['quantity'] += quantity
+        day['revenue'] += revenue
+
+    with transaction.atomic():
+        _add_to_rollups(restaurant_days, item_days)
+
+
+def record_review_delta(order_id, count_delta, sum_delta):
+    """Shift the review totals of a completed order's day by a review change made after it completed."""
+    order = Order.objects.filter(order_id=order_id, state='completed').values_list('restaurant_id', 'order_date').first()
+    if order is not None:
+        restaurant_id, order_date = order
+        _add_to_rollups(
+            {(restaurant_id, timezone.localdate(order_date)): {'review_count': count_delta, 'score_sum': sum_delta}}, {},
+        )
+
+
+def restaurant_dashboard(restaurant_id, start, end, top=10):
+    """Read a date-range dashboard, end inclusive, from the rollup tables only."""
+    days = list(
+        DailyRestaurantStats.objects.filter(restaurant_id=restaurant_id, date__gte=start, date__lte=end)
+        .order_by('date')
+        .values('date', 'order_count', 'revenue', 'review_count', 'score_sum')
+    )
+    top_items = list(
+        DailyItemStats.objects.filter(restaurant_id=restaurant_id, date__gte=start, date__lte=end)
+        .values('item_id', 'item__name')
+        .annotate(quantity=Sum('quantity'), revenue=Sum('revenue'))
+        .order_by('-revenue')[:top]
+    )
+
+    for day in days:
+        day['average_score'] = round(day['score_sum'] / day['review_count'], 2) if day['review_count'] else None
+    review_count = sum(day['review_count'] for day in days)
+    score_sum = sum(day['score_sum'] for day in days)
+    return {
+        'days': days,
+        'totals': {
+            'order_count': sum(day['order_count'] for day in days),
+            'revenue': sum((day['revenue'] for day in days), 0),
+            'review_count': review_count,
+            'average_score': round(score_sum / review_count, 2) if review_count else None,
+        },
+        'top_items': [
+            {'item_id': row['item_id'], 'name': row['item__name'], 'quantity': row['quantity'], 'revenue': row['revenue']}
+            for row in top_items
+        ],
+    }
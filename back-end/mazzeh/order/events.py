@@ -0,0 +1,159 @@
+import asyncio
+import json
+import logging
+import socket
+import threading
+from collections import defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+def restaurant_channel(restaurant_id):
+    return f"restaurant:{restaurant_id}"
+
+
+def order_channel(order_id):
+    return f"order:{order_id}"
+
+
+class Subscription:
+    """An async iterator over the messages of one channel, registered as soon as it is created."""
+
+    def __init__(self, broker, channel):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+        broker._add(self)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.queue.get()
+
+    async def get(self, timeout=None):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def close(self):
+        self.broker._remove(self)
+
+
+class InProcessBroker:
+    """Fans messages out to the subscribers of the current process; enough for a single worker and for tests."""
+
+    def __init__(self):
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        return Subscription(self, channel)
+
+    def publish(self, channel, message):
+        self.deliver(channel, json.dumps(message))
+
+    def deliver(self, channel, payload):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.queue.put_nowait, payload)
+            except RuntimeError:
+                # The subscriber's event loop is gone, drop it.
+                subscription.close()
+
+    def subscriber_count(self, channel=None):
+        with self._lock:
+            if channel is not None:
+                return len(self._subscriptions.get(channel, ()))
+            return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+    def _add(self, subscription):
+        with self._lock:
+            self._subscriptions[subscription.channel].add(subscription)
+
+    def _remove(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.channel)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.channel]
+
+
+class UnixSocketBroker(InProcessBroker):
+    """
+    Relays messages between worker processes through the ``run_order_broker`` command
+    listening on ``settings.ORDER_EVENTS_SOCKET``. Each process keeps one subscribing
+    connection per event loop and delivers what it reads to its local subscribers.
+    """
+
+    def __init__(self, path=None):
+        super().__init__()
+        self.path = str(path or settings.ORDER_EVENTS_SOCKET)
+        self._publisher = None
+        self._publisher_lock = threading.Lock()
+        self._readers = {}
+
+    def publish(self, channel, message):
+        line = json.dumps({'channel': channel, 'message': message}).encode() + b'\n'
+        with self._publisher_lock:
+            for attempt in range(2):
+                try:
+                    if self._publisher is None:
+                        self._publisher = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                        self._publisher.connect(self.path)
+                        self._publisher.sendall(b'publish\n')
+                    self._publisher.sendall(line)
+                    return
+                except OSError:
+                    if self._publisher is not None:
+                        self._publisher.close()
+                    self._publisher = None
+                    if attempt:
+                        raise
+
+    def subscribe(self, channel):
+        subscription = super().subscribe(channel)
+        reader = self._readers.get(subscription.loop)
+        if reader is None or reader.done():
+            self._readers[subscription.loop] = subscription.loop.create_task(self._read())
+        return subscription
+
+    async def _read(self):
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path)
+                writer.write(b'subscribe\n')
+                await writer.drain()
+                while line := await reader.readline():
+                    envelope = json.loads(line)
+                    self.deliver(envelope['channel'], json.dumps(envelope['message']))
+            except OSError:
+                pass
+            await asyncio.sleep(1)
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    return import_string(getattr(settings, 'ORDER_EVENTS_BROKER', 'order.events.InProcessBroker'))()
+
+
+def publish_order_state(order_id, restaurant_id, state):
+    """Push an order's new state to its streams. Runs after the commit, so a broker failure is logged, not raised."""
+    message = {
+        'order_id': order_id,
+        'restaurant_id': restaurant_id,
+        'state': state,
+    }
+    broker = get_broker()
+    try:
+        broker.publish(order_channel(order_id), message)
+        broker.publish(restaurant_channel(restaurant_id), message)
+    except OSError:
+        # The change is already committed; streams pick the state up again on reconnect.
+        logger.exception("Could not publish the state of order %s.", order_id)
@@ -0,0 +1,81 @@
+import datetime
+import json
+import random
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from mazzeh.benchmarks import measure, scratch_data
+from order.analytics import LINE_REVENUE, day_bounds, refresh_daily_stats, restaurant_dashboard
+from order.models import Order, OrderItem, Review
+from restaurant.models import Item, RestaurantProfile
+from user.models import User
+
+
+def live_dashboard(restaurant_id, start, end, top=10):
+    lower, upper = day_bounds(start, end + datetime.timedelta(days=1))
+    orders = Order.objects.filter(
+        restaurant_id=restaurant_id, state='completed', order_date__gte=lower, order_date__lt=upper,
+    )
+    return (
+        list(orders.annotate(day=TruncDate('order_date')).values('day').annotate(count=Count('pk'), revenue=Sum('total_price'))),
+        list(Review.objects.filter(order__in=orders).annotate(day=TruncDate('order__order_date')).values('day').annotate(count=Count('pk'), score=Sum('score'))),
+        list(OrderItem.objects.filter(order__in=orders).values('item_id').annotate(revenue=Sum(LINE_REVENUE)).order_by('-revenue')[:top]),
+    )
+
+
+class Command(BaseCommand):
+    help = "Compare rollup-backed dashboards with live aggregation over a year of synthetic orders."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders-per-day', type=int, default=50)
+        parser.add_argument('--days', type=int, default=365)
+
+    def handle(self, *args, **options):
+        results = {}
+        with scratch_data():
+            restaurant, first_day = self.populate(options['days'], options['orders_per_day'])
+            last_day = first_day + datetime.timedelta(days=options['days'] - 1)
+            results['rebuild'] = measure(
+                lambda: refresh_daily_stats(first_day, last_day + datetime.timedelta(days=1)), repeat=1,
+            )
+            for span in (7, 30, options['days']):
+                start = last_day - datetime.timedelta(days=span - 1)
+                results[f'{span}_days'] = {
+                    'rollup': measure(lambda: restaurant_dashboard(restaurant.pk, start, last_day)),
+                    'live': measure(lambda: live_dashboard(restaurant.pk, start, last_day)),
+                }
+        results['orders'] = options['days'] * options['orders_per_day']
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def populate(self, days, orders_per_day):
+        rng = random.Random(days * orders_per_day)
+        manager = User.objects.create(phone_number="stats-m", role="restaurant_manager")
+        customer = User.objects.create(phone_number="stats-c")
+        restaurant = RestaurantProfile.objects.create(manager=manager, name="Bench", city_name="Tehran")
+        items = Item.objects.bulk_create(
+            Item(restaurant=restaurant, name=f"Item {i}", price=rng.randint(50, 500)) for i in range(40)
+        )
+        first_day = timezone.localdate() - datetime.timedelta(days=days)
+        for offset in range(days):
+            orders = Order.objects.bulk_create(
+                Order(user=customer, restaurant=restaurant, total_price=0, state='completed')
+                for _ in range(orders_per_day)
+            )
+            day = datetime.datetime.combine(
+                first_day + datetime.timedelta(days=offset), datetime.time(12), tzinfo=timezone.get_current_timezone(),
+            )
+            Order.objects.filter(order_id__in=[order.order_id for order in orders]).update(order_date=day)
+            lines = [
+                OrderItem(order=order, item=item, count=rng.randint(1, 3), price=item.price)
+                for order in orders
+                for item in rng.sample(items, 3)
+            ]
+            OrderItem.objects.bulk_create(lines, batch_size=500)
+            Review.objects.bulk_create(
+                Review(user=customer, order=order, score=rng.randint(1, 5))
+                for order in orders if rng.random() < 0.3
+            )
+        return restaurant, first_day
@@ -0,0 +1,196 @@
+import datetime
+import json
+import platform
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from customer.models import Cart
+from mazzeh.benchmarks import percentile, scratch_data
+from mazzeh.synthetic import CITIES, DISHES, PASSWORD
+from order.models import Order
+from restaurant.models import Item, RestaurantProfile
+from user.models import User
+from user.serializers import CustomTokenObtainPairSerializer
+from user.tokens import current_token_version
+
+SAMPLE_USERS = 50
+# Differences smaller than these are noise: cache expiry alone can add a query now and then.
+NOISE_FLOOR_MS = 1.0
+NOISE_FLOOR_QUERIES = 0.25
+
+
+def access_token(user):
+    return str(CustomTokenObtainPairSerializer.get_token(user).access_token)
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the main API paths end to end against the loaded data (see generate_data) and print latency "
+        "percentiles and query counts per path as JSON. Writes are rolled back. Pass the JSON of an earlier "
+        "run as --baseline to list regressions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100, help="Measured requests per path.")
+        parser.add_argument('--warmup', type=int, default=5, help="Unmeasured requests per path first.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--only', nargs='+', help="Paths to run, by name.")
+        parser.add_argument('--output', help="Also write the JSON report to this file.")
+        parser.add_argument('--baseline', help="JSON report of an earlier run to compare with.")
+        parser.add_argument('--tolerance', type=float, default=1.25, help="Allowed p50 ratio against the baseline.")
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        # Throttling would turn the login path into 429s, and the test client calls itself 'testserver'.
+        with override_settings(THROTTLE_RATES={}, ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            with scratch_data():
+                scenarios = self.scenarios()
+                if options['only']:
+                    unknown = set(options['only']) - scenarios.keys()
+                    if unknown:
+                        raise CommandError(f"Unknown paths: {', '.join(sorted(unknown))}. Known: {', '.join(scenarios)}.")
+                    scenarios = {name: scenarios[name] for name in options['only']}
+                needed = options['warmup'] + options['requests']
+                if 'checkout' in scenarios and len(self.carts) < needed:
+                    raise CommandError(
+                        f"checkout needs {needed} carts, found {len(self.carts)}; load more data, lower --requests "
+                        "or leave it out with --only."
+                    )
+                report = {
+                    'environment': self.environment(),
+                    'paths': {name: self.run(request, options) for name, request in scenarios.items()},
+                }
+
+        if options['baseline']:
+            with open(options['baseline']) as baseline:
+                report['regressions'] = self.regressions(json.load(baseline), report, options['tolerance'])
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output + '\n')
+        self.stdout.write(output)
+        if options['fail_on_regression'] and report.get('regressions'):
+            raise CommandError(f"{len(report['regressions'])} paths regressed.")
+
+    def environment(self):
+        return {
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'generated_at': timezone.now().isoformat(timespec='seconds'),
+            'rows': {
+                model.__name__: model.objects.count() for model in (User, RestaurantProfile, Item, Order, Cart)
+            },
+        }
+
+    def sample(self, queryset, count=SAMPLE_USERS):
+        pks = list(queryset.values_list('pk', flat=True)[:count * 20])
+        return self.rng.sample(pks, min(count, len(pks)))
+
+    def scenarios(self):
+        """{name: request factory}; a factory returns (client, method, path, data) for one request."""
+        rng = self.rng
+        restaurants = list(
+            RestaurantProfile.objects.filter(state='approved').values_list('pk', 'city_name', 'manager_id')
+        )
+        customers = list(User.objects.filter(pk__in=self.sample(User.objects.filter(role='customer', order__isnull=False).distinct())))
+        self.carts = carts = list(Cart.objects.select_related('user').filter(pk__in=self.sample(Cart.objects.all(), 10 ** 4)))
+        if not restaurants or not customers:
+            raise CommandError("No data to benchmark; load some with manage.py generate_data first.")
+        managers = {manager.pk: manager for manager in User.objects.filter(pk__in=[manager_id for *_, manager_id in restaurants[:SAMPLE_USERS]])}
+        item_ids = self.sample(Item.objects.filter(state='available'), 1000)
+
+        anonymous = Client()
+        for user in [*customers, *managers.values()]:
+            # Load the token versions the first request of each user would otherwise look up.
+            current_token_version(user.pk)
+        customer_clients = [Client(HTTP_AUTHORIZATION=f"Bearer {access_token(user)}") for user in customers]
+        manager_clients = [Client(HTTP_AUTHORIZATION=f"Bearer {access_token(user)}") for user in managers.values()]
+        cities = list(CITIES)
+        today = timezone.localdate()
+
+        def customer():
+            return rng.choice(customer_clients)
+
+        def restaurant_id():
+            return rng.choice(restaurants)[0]
+
+        def checkout():
+            # Every checkout consumes a cart; the rollback brings them back at the end.
+            cart = carts.pop()
+            client = Client(HTTP_AUTHORIZATION=f"Bearer {access_token(cart.user)}")
+            return client, 'post', '/api/order/checkout', {'cart_id': cart.pk, 'delivery_method': 'pickup'}
+
+        return {
+            'login': lambda: (anonymous, 'post', '/api/auth/token', {
+                'phone_number': rng.choice(customers).phone_number, 'password': PASSWORD,
+            }),
+            'restaurant_detail': lambda: (anonymous, 'get', f'/api/restaurant/{restaurant_id()}', None),
+            'restaurant_menu': lambda: (anonymous, 'get', f'/api/restaurant/{restaurant_id()}/menu', None),
+            'open_now': lambda: (anonymous, 'get', '/api/restaurant/open-now', {'city_name': rng.choice(cities)}),
+            'most_loved': lambda: (anonymous, 'get', '/api/restaurant/most-loved', {'city_name': rng.choice(cities)}),
+            'search': lambda: (anonymous, 'get', '/api/restaurant/search', {
+                'q': rng.choice(rng.choice(list(DISHES.values()))).split()[0], 'city_name': rng.choice(cities),
+            }),
+            'nearby': lambda: (customer(), 'get', '/api/restaurant/nearby', {'radius': 3}),
+            'delivery_quotes': lambda: (customer(), 'get', '/api/restaurant/delivery-quotes', {
+                'restaurant_ids': ','.join(str(restaurant_id()) for _ in range(20)),
+            }),
+            'similar_items': lambda: (anonymous, 'get', f'/api/order/recommendations/items/{rng.choice(item_ids)}', None),
+            'usual_restaurants': lambda: (customer(), 'get', '/api/order/recommendations/usual', None),
+            'favorites': lambda: (customer(), 'get', '/api/customer/favorites', None),
+            'order_history': lambda: (customer(), 'get', '/api/order/history', None),
+            'restaurant_active_orders': lambda: (rng.choice(manager_clients), 'get', '/api/order/active', None),
+            'restaurant_order_history': lambda: (rng.choice(manager_clients), 'get', '/api/order/restaurant/history', None),
+            'restaurant_analytics': lambda: (rng.choice(manager_clients), 'get', '/api/order/analytics', {
+                'start': (today - datetime.timedelta(days=30)).isoformat(), 'end': today.isoformat(),
+            }),
+            'checkout': checkout,
+        }
+
+    def run(self, make_request, options):
+        timings, queries, statuses = [], [], {}
+        for number in range(options['warmup'] + options['requests']):
+            client, method, path, data = make_request()
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                response = getattr(client, method)(path, data, **({'content_type': 'application/json'} if method == 'post' else {}))
+                elapsed = (time.perf_counter() - start) * 1000
+            if number < options['warmup']:
+                continue
+            timings.append(elapsed)
+            queries.append(len(captured))
+            statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+        timings.sort()
+        return {
+            'p50_ms': percentile(timings, 0.5),
+            'p90_ms': percentile(timings, 0.9),
+            'p99_ms': percentile(timings, 0.99),
+            'max_ms': round(timings[-1], 3),
+            'mean_queries': round(statistics.fmean(queries), 2),
+            'max_queries': max(queries),
+            'statuses': statuses,
+        }
+
+    def regressions(self, baseline, report, tolerance):
+        found = []
+        for name, current in report['paths'].items():
+            previous = baseline.get('paths', {}).get(name)
+            if previous is None:
+                continue
+            slower = current['p50_ms'] > previous['p50_ms'] * tolerance and current['p50_ms'] - previous['p50_ms'] > NOISE_FLOOR_MS
+            if slower or current['mean_queries'] - previous['mean_queries'] > NOISE_FLOOR_QUERIES:
+                found.append({
+                    'path': name,
+                    'p50_ms': [previous['p50_ms'], current['p50_ms']],
+                    'mean_queries': [previous['mean_queries'], current['mean_queries']],
+                })
+        return found
@@ -0,0 +1,259 @@
+import asyncio
+import json
+import platform
+import random
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from mazzeh.benchmarks import percentile
+from order.models import Order
+from restaurant.models import RestaurantProfile
+from user.serializers import CustomTokenObtainPairSerializer
+
+HOST = '127.0.0.1'
+SAMPLE_SIZE = 50
+
+
+class PooledWSGIServer(WSGIServer):
+    """wsgiref's server with a fixed pool of worker threads, as a threaded WSGI worker runs in production."""
+
+    request_queue_size = 1024
+    threads = 32
+
+    def server_activate(self):
+        super().server_activate()
+        self.executor = ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='wsgi')
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(cancel_futures=True)
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class WSGIBenchmarkServer:
+    def __init__(self, threads):
+        from mazzeh.wsgi import application
+
+        server_class = type('Server', (PooledWSGIServer,), {'threads': threads})
+        self.server = make_server(HOST, 0, application, server_class=server_class, handler_class=QuietRequestHandler)
+        self.port = self.server.server_port
+        self.thread = threading.Thread(target=self.server.serve_forever, kwargs={'poll_interval': 0.1}, daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+
+class ASGIBenchmarkServer:
+    def __init__(self):
+        try:
+            import uvicorn
+        except ImportError:
+            raise CommandError("The ASGI server needs the uvicorn package: pip install uvicorn")
+        from mazzeh.asgi import application
+
+        self.socket = socket.create_server((HOST, 0), backlog=2048)
+        self.port = self.socket.getsockname()[1]
+        self.server = uvicorn.Server(uvicorn.Config(application, lifespan='off', access_log=False, log_level='warning'))
+        self.thread = threading.Thread(target=lambda: asyncio.run(self.server.serve(sockets=[self.socket])), daemon=True)
+
+    def start(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join()
+        self.socket.close()
+
+
+async def fetch(port, path, headers, hold_seconds=0):
+    """One GET on a new connection: status code. A slow client sends the request line, then the rest after hold_seconds."""
+    reader, writer = await asyncio.open_connection(HOST, port)
+    try:
+        writer.write(f"GET {path} HTTP/1.1\r\n".encode())
+        if hold_seconds:
+            await writer.drain()
+            await asyncio.sleep(hold_seconds)
+        lines = [f"Host: {HOST}", "Connection: close", *(f"{name}: {value}" for name, value in headers.items())]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode())
+        await writer.drain()
+        response = await reader.read()
+    finally:
+        writer.close()
+    return int(response.split(b' ', 2)[1]) if response else 0
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the WSGI application (mazzeh.wsgi, sync views) with the ASGI application (mazzeh.asgi under "
+        "uvicorn, async views) on the restaurant listing, menu and order status reads, idle and while many "
+        "slow clients hold connections open. Both servers run in this process on the loaded data (see "
+        "generate_data); prints JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=1000, help="Slow clients connected at once.")
+        parser.add_argument('--hold', type=float, default=5.0, help="Seconds the slow clients hold their requests, then send them over as many seconds again.")
+        parser.add_argument('--seconds', type=float, default=5.0, help="Probing time per phase.")
+        parser.add_argument('--probe-clients', type=int, default=8, help="Concurrent fast clients measuring latency.")
+        parser.add_argument('--timeout', type=float, default=5.0, help="Seconds after which a request counts as timed out.")
+        parser.add_argument('--wsgi-threads', type=int, default=32, help="Worker threads of the WSGI server.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--only', choices=['wsgi', 'asgi'])
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite' and connection.settings_dict['NAME'] == ':memory:':
+            raise CommandError("Needs a database shared between threads.")
+        self.rng = random.Random(options['seed'])
+        targets = self.targets()
+        servers = {
+            'wsgi': lambda: WSGIBenchmarkServer(options['wsgi_threads']),
+            'asgi': ASGIBenchmarkServer,
+        }
+        paths = {
+            'wsgi': {'open_now': '/api/restaurant/open-now', 'menu': '/api/restaurant/{}/menu'},
+            'asgi': {'open_now': '/api/restaurant/async/open-now', 'menu': '/api/restaurant/async/{}/menu'},
+        }
+        report = {'environment': self.environment(options), 'servers': {}}
+        # The requests are addressed to the servers' IP address.
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, HOST]):
+            for name, make_server in servers.items():
+                if options['only'] and name != options['only']:
+                    continue
+                server = make_server()
+                server.start()
+                try:
+                    report['servers'][name] = asyncio.run(self.run(server.port, paths[name], targets, options))
+                finally:
+                    server.stop()
+        self.stdout.write(json.dumps(report, indent=2))
+
+    def environment(self, options):
+        return {
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            **{key: options[key] for key in ('connections', 'hold', 'seconds', 'probe_clients', 'wsgi_threads')},
+        }
+
+    def targets(self):
+        restaurants = list(RestaurantProfile.objects.filter(state='approved').values_list('pk', 'city_name')[:SAMPLE_SIZE * 20])
+        orders = list(Order.objects.select_related('user').order_by('-pk')[:SAMPLE_SIZE])
+        if not restaurants or not orders:
+            raise CommandError("No data to benchmark; load some with manage.py generate_data first.")
+        tokens = {}
+        for order in orders:
+            if order.user_id not in tokens:
+                tokens[order.user_id] = str(CustomTokenObtainPairSerializer.get_token(order.user).access_token)
+        return {
+            'restaurants': restaurants,
+            'orders': [(order.pk, {'Authorization': f"Bearer {tokens[order.user_id]}"}) for order in orders],
+        }
+
+    def request(self, paths, targets):
+        """A random (name, path, headers) of the measured reads; order status is an async view on both servers."""
+        restaurant_id, city_name = self.rng.choice(targets['restaurants'])
+        order_id, headers = self.rng.choice(targets['orders'])
+        return self.rng.choice([
+            ('open_now', f"{paths['open_now']}?city_name={city_name}", {}),
+            ('menu', paths['menu'].format(restaurant_id), {}),
+            ('order_status', f'/api/order/{order_id}', headers),
+        ])
+
+    async def run(self, port, paths, targets, options):
+        # Fill the caches, as a server that has been up for a while would have them.
+        for restaurant_id, city_name in targets['restaurants'][:SAMPLE_SIZE]:
+            await fetch(port, paths['menu'].format(restaurant_id), {})
+            await fetch(port, f"{paths['open_now']}?city_name={city_name}", {})
+
+        result = {'idle': await self.probe(port, paths, targets, options)}
+        sampler = asyncio.create_task(self.sample_threads())
+        # The slow clients finish their requests spread over a second hold period rather than all at once.
+        holds = [options['hold'] * (1 + number / options['connections']) for number in range(options['connections'])]
+        slow = [asyncio.create_task(self.slow_client(port, paths, targets, hold, options)) for hold in holds]
+        # Let the slow clients connect and start holding their requests.
+        await asyncio.sleep(min(1.0, options['hold'] / 4))
+        result['slow_clients'] = await self.probe(port, paths, targets, options)
+        outcomes = await asyncio.gather(*slow)
+        sampler.cancel()
+        result['slow_clients']['slow_responses'] = {outcome: outcomes.count(outcome) for outcome in sorted(set(outcomes))}
+        # Threads of the whole process, this client included.
+        result['slow_clients']['peak_threads'] = self.peak_threads
+        return result
+
+    async def sample_threads(self):
+        self.peak_threads = threading.active_count()
+        while True:
+            await asyncio.sleep(0.05)
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+
+    async def slow_client(self, port, paths, targets, hold, options):
+        _, path, headers = self.request(paths, targets)
+        try:
+            return str(await asyncio.wait_for(fetch(port, path, headers, hold), hold + options['timeout']))
+        except asyncio.TimeoutError:
+            return 'timeout'
+        except OSError:
+            return 'error'
+
+    async def probe(self, port, paths, targets, options):
+        """Latency of fast clients sending requests back to back for options['seconds']."""
+        timings, outcomes = {}, {}
+        deadline = time.monotonic() + options['seconds']
+
+        async def client():
+            while time.monotonic() < deadline:
+                name, path, headers = self.request(paths, targets)
+                start = time.perf_counter()
+                try:
+                    outcome = str(await asyncio.wait_for(fetch(port, path, headers), options['timeout']))
+                except asyncio.TimeoutError:
+                    outcome = 'timeout'
+                except OSError:
+                    outcome = 'error'
+                if outcome == '200':
+                    timings.setdefault(name, []).append((time.perf_counter() - start) * 1000)
+                counts = outcomes.setdefault(name, {})
+                counts[outcome] = counts.get(outcome, 0) + 1
+
+        start = time.monotonic()
+        await asyncio.gather(*(client() for _ in range(options['probe_clients'])))
+        elapsed = time.monotonic() - start
+        result = {'requests_per_second': round(sum(len(values) for values in timings.values()) / elapsed, 1), 'paths': {}}
+        for name in sorted(outcomes):
+            values = sorted(timings.get(name, []))
+            result['paths'][name] = {
+                'p50_ms': percentile(values, 0.5) if values else None,
+                'p90_ms': percentile(values, 0.9) if values else None,
+                'p99_ms': percentile(values, 0.99) if values else None,
+                'responses': outcomes[name],
+            }
+        return result
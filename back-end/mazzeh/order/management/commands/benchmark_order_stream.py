@@ -0,0 +1,87 @@
+import json
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import AsyncRequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import AccessToken
+
+from mazzeh.benchmarks import scratch_data
+from order.models import Order
+from order.views import OrderStreamView
+from restaurant.models import RestaurantProfile
+from user.models import User
+from user.tokens import add_user_claims
+
+STATES = [state for state, _ in Order.STATE_CHOICES]
+
+
+# Query capture has to start and stop on the thread that owns the database connection.
+def start_capture():
+    queries = CaptureQueriesContext(connection)
+    queries.__enter__()
+    return queries
+
+
+def stop_capture(queries):
+    queries.__exit__(None, None, None)
+    return len(queries)
+
+
+class Command(BaseCommand):
+    help = "Show that order state pushes cost the same DB queries for any number of stream subscribers."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscribers', type=int, nargs='+', default=[1, 10, 100, 1000])
+
+    def handle(self, *args, **options):
+        results = []
+        with scratch_data():
+            manager = User.objects.create(phone_number="stream-m", role="restaurant_manager")
+            customer = User.objects.create(phone_number="stream-c")
+            restaurant = RestaurantProfile.objects.create(manager=manager, name="Bench", city_name="Tehran")
+            token = str(add_user_claims(AccessToken.for_user(customer), customer))
+            for count in options['subscribers']:
+                order = Order.objects.create(user=customer, restaurant=restaurant, total_price=100)
+                results.append(async_to_sync(self.run)(order, token, count))
+        self.stdout.write(json.dumps(results, indent=2))
+
+    async def run(self, order, token, count):
+        factory = AsyncRequestFactory()
+        view = OrderStreamView.as_view()
+
+        subscribe_queries = await sync_to_async(start_capture)()
+        streams = []
+        for _ in range(count):
+            request = factory.get(f'/api/order/{order.order_id}/stream', {'token': token})
+            response = await view(request, order_id=order.order_id)
+            stream = response.streaming_content.__aiter__()
+            await stream.__anext__()
+            streams.append(stream)
+        subscribe_query_count = await sync_to_async(stop_capture)(subscribe_queries)
+
+        transition_queries = await sync_to_async(start_capture)()
+        for state in STATES[1:]:
+            await sync_to_async(self.transition)(order, state)
+        transition_query_count = await sync_to_async(stop_capture)(transition_queries)
+
+        delivered = 0
+        for stream in streams:
+            for _ in STATES[1:]:
+                await stream.__anext__()
+                delivered += 1
+            await stream.aclose()
+
+        return {
+            'subscribers': count,
+            'subscribe_queries': subscribe_query_count,
+            'transitions': len(STATES) - 1,
+            'transition_queries': transition_query_count,
+            'events_delivered': delivered,
+        }
+
+    def transition(self, order, state):
+        with TestCase.captureOnCommitCallbacks(execute=True):
+            order.state = state
+            order.save(update_fields=['state'])
@@ -0,0 +1,132 @@
+import json
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import reset_queries
+
+from mazzeh.benchmarks import measure, scratch_data
+from order.models import ItemPairStats, Order, OrderItem
+from order.recommendations import (
+    RECOMMENDATION_TOP_K, fetch_columns, invalidate_recommendations, item_pair_counts, rebuild_recommendations,
+    publish_recommendation_index, record_completed_orders, similar_items, usual_restaurants,
+)
+from restaurant.models import Item, RestaurantProfile
+from user.models import User
+
+ORDER_BATCH = 20000
+
+
+def lookup_micros(lookup, keys):
+    timings = []
+    for key in keys:
+        start = time.perf_counter()
+        lookup(key)
+        timings.append((time.perf_counter() - start) * 1e6)
+    timings.sort()
+    return {
+        'median_us': round(statistics.median(timings), 2),
+        'p99_us': round(timings[int(len(timings) * 0.99)], 2),
+    }
+
+
+def query_similar_items(item_id, limit=10):
+    """The baseline: rank the item's stored pairs in the database on every request."""
+    return list(
+        ItemPairStats.objects.filter(item_id=item_id).exclude(other_item_id=item_id)
+        .order_by('-order_count').values_list('other_item_id', flat=True)[:limit]
+    )
+
+
+class Command(BaseCommand):
+    help = "Time the recommendation rebuild over millions of synthetic order lines, and index lookups."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, default=1000000, help="Completed order lines to generate.")
+        parser.add_argument('--restaurants', type=int, default=500)
+        parser.add_argument('--items-per-restaurant', type=int, default=30)
+        parser.add_argument('--users', type=int, default=50000)
+
+    def handle(self, *args, **options):
+        results = {}
+        with scratch_data():
+            start = time.perf_counter()
+            item_ids, user_ids = self.populate(options)
+            results['populate_s'] = round(time.perf_counter() - start, 1)
+            results['lines'] = OrderItem.objects.count()
+            # With DEBUG the populate queries fill the query log, which would hide the measured ones.
+            reset_queries()
+
+            order_ids, line_item_ids = fetch_columns(OrderItem.objects.order_by(), ('order_id', 'item_id'))
+            results['pair_counts_only'] = measure(lambda: item_pair_counts(order_ids, line_item_ids), repeat=3)
+            results['rebuild'] = measure(lambda: results.update(rows=rebuild_recommendations()), repeat=1)
+            start = time.perf_counter()
+            index = publish_recommendation_index()
+            results['index'] = {
+                'build_ms': round((time.perf_counter() - start) * 1000, 3),
+                'items_bytes': index.items.nbytes,
+                'users_bytes': index.users.nbytes,
+                'top_k': RECOMMENDATION_TOP_K,
+            }
+
+            rng = random.Random(0)
+            items, users = rng.choices(item_ids, k=10000), rng.choices(user_ids, k=10000)
+            results['similar_items'] = lookup_micros(similar_items, items)
+            results['usual_restaurants'] = lookup_micros(usual_restaurants, users)
+            results['similar_items_database_query'] = measure(lambda: query_similar_items(rng.choice(item_ids)), repeat=50)
+
+            completed = list(Order.objects.order_by('-order_id').values_list('order_id', flat=True)[:20])
+            results['record_20_orders'] = measure(lambda: record_completed_orders(completed), repeat=1)
+        invalidate_recommendations()
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def populate(self, options):
+        rng = random.Random(options['lines'])
+        users = User.objects.bulk_create(
+            (User(phone_number=f"recs{i}") for i in range(options['users'])), batch_size=5000,
+        )
+        managers = User.objects.bulk_create(
+            User(phone_number=f"recs-m{i}", role="restaurant_manager") for i in range(options['restaurants'])
+        )
+        restaurants = RestaurantProfile.objects.bulk_create(
+            RestaurantProfile(manager=manager, name=f"Restaurant {i}", city_name="Tehran", state="approved")
+            for i, manager in enumerate(managers)
+        )
+        menus = {}
+        for restaurant in restaurants:
+            menus[restaurant.pk] = Item.objects.bulk_create(
+                Item(restaurant=restaurant, name=f"Item {i}", price=rng.randint(50, 500))
+                for i in range(options['items_per_restaurant'])
+            )
+        # Skewed popularity: a few items and restaurants take most orders, as on a real menu.
+        item_weights = [1 / (rank + 1) for rank in range(options['items_per_restaurant'])]
+        restaurant_ids = list(menus)
+        restaurant_weights = [1 / (rank + 1) ** 0.5 for rank in range(len(restaurant_ids))]
+        regulars = {user.pk: rng.choices(restaurant_ids, restaurant_weights, k=3) for user in users}
+        user_ids = list(regulars)
+
+        lines = 0
+        while lines < options['lines']:
+            baskets = []
+            for _ in range(ORDER_BATCH):
+                user_id = rng.choice(user_ids)
+                restaurant_id = rng.choice(regulars[user_id])
+                size = min(rng.choice([1, 2, 2, 3, 3, 3, 4, 4, 5, 6]), len(menus[restaurant_id]))
+                basket = set(rng.choices(menus[restaurant_id], item_weights, k=size))
+                baskets.append((user_id, restaurant_id, basket))
+            orders = Order.objects.bulk_create(
+                (
+                    Order(user_id=user_id, restaurant_id=restaurant_id, total_price=0, state='completed')
+                    for user_id, restaurant_id, _ in baskets
+                ),
+                batch_size=5000,
+            )
+            order_lines = [
+                OrderItem(order=order, item=item, count=1, price=item.price)
+                for order, (_, _, basket) in zip(orders, baskets)
+                for item in basket
+            ]
+            OrderItem.objects.bulk_create(order_lines, batch_size=5000)
+            lines += len(order_lines)
+        return [item.pk for menu in menus.values() for item in menu], user_ids
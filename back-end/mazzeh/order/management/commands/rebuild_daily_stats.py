@@ -0,0 +1,34 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from order.analytics import refresh_daily_stats
+from order.models import Order
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily restaurant and item sales rollups from completed orders, one date window at a time."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=datetime.date.fromisoformat, help="First day to rebuild (default: first order).")
+        parser.add_argument('--end', type=datetime.date.fromisoformat, help="Last day to rebuild (default: last order).")
+        parser.add_argument('--chunk-days', type=int, default=31)
+
+    def handle(self, *args, **options):
+        bounds = Order.objects.filter(state='completed').aggregate(first=Min('order_date'), last=Max('order_date'))
+        if bounds['first'] is None and not (options['start'] and options['end']):
+            self.stdout.write("No completed orders.")
+            return
+
+        start = options['start'] or timezone.localdate(bounds['first'])
+        end = options['end'] or timezone.localdate(bounds['last'])
+        step = datetime.timedelta(days=options['chunk_days'])
+        window = start
+        while window <= end:
+            window_end = min(window + step, end + datetime.timedelta(days=1))
+            refresh_daily_stats(window, window_end)
+            self.stdout.write(f"Rebuilt {window} to {window_end - datetime.timedelta(days=1)}")
+            window = window_end
+        self.stdout.write(self.style.SUCCESS("Daily stats rebuilt."))
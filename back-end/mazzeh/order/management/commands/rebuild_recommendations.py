@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from order.recommendations import rebuild_recommendations
+
+
+class Command(BaseCommand):
+    help = "Recompute the item pair and user restaurant counts behind recommendations from every completed order."
+
+    def handle(self, *args, **options):
+        rows = rebuild_recommendations()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {rows['item_pairs']} item pairs and {rows['user_restaurants']} user restaurant rows."
+        ))
@@ -0,0 +1,54 @@
+import asyncio
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Relay order events between ASGI worker processes over a Unix socket (see UnixSocketBroker)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--socket', default=str(settings.ORDER_EVENTS_SOCKET))
+
+    def handle(self, *args, **options):
+        path = options['socket']
+        if os.path.exists(path):
+            os.unlink(path)
+        self.subscribers = set()
+        self.stdout.write(f"Relaying order events on {path}")
+        try:
+            asyncio.run(self.serve(path))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if os.path.exists(path):
+                os.unlink(path)
+
+    async def serve(self, path):
+        server = await asyncio.start_unix_server(self.handle_client, path)
+        async with server:
+            await server.serve_forever()
+
+    async def handle_client(self, reader, writer):
+        role = (await reader.readline()).strip()
+        try:
+            if role == b'subscribe':
+                self.subscribers.add(writer)
+                await reader.read()
+            elif role == b'publish':
+                while line := await reader.readline():
+                    for subscriber in list(self.subscribers):
+                        subscriber.write(line)
+                    await asyncio.gather(
+                        *(self.drain(subscriber) for subscriber in list(self.subscribers))
+                    )
+        finally:
+            self.subscribers.discard(writer)
+            writer.close()
+
+    async def drain(self, writer):
+        try:
+            await writer.drain()
+        except ConnectionError:
+            self.subscribers.discard(writer)
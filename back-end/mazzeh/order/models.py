@@ -1,6 +1,9 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_save, pre_delete, pre_save
+from django.dispatch import receiver
 from django.conf import settings 
 from user.models import User
+from .events import publish_order_state
 
 class Order(models.Model):
     DELIVERY_METHOD_CHOICES = [
@@ -21,20 +24,127 @@ class Order(models.Model):
         ('completed', 'Completed'),
     ]
 
+    # Allowed source states for every target state.
+    TRANSITIONS = {
+        'preparing': ['pending'],
+        'ready_for_pickup': ['preparing'],
+        'delivering': ['ready_for_pickup'],
+        'completed': ['ready_for_pickup', 'delivering'],
+    }
+
     order_id = models.AutoField(primary_key=True)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     restaurant = models.ForeignKey('restaurant.RestaurantProfile', on_delete=models.CASCADE)
     order_date = models.DateTimeField(auto_now_add=True)
     total_price = models.DecimalField(max_digits=10, decimal_places=2)
+    delivery_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     state = models.CharField(max_length=20, choices=STATE_CHOICES, default='pending')
     delivery_method = models.CharField(max_length=20, choices=DELIVERY_METHOD_CHOICES, default='pickup')
     payment_method = models.CharField(max_length=20, choices=PAYMENT_METHOD_CHOICES, default='in_person')
     description = models.TextField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'order_date', 'order_id']),
+            models.Index(fields=['restaurant', 'order_date', 'order_id']),
+            models.Index(
+                fields=['restaurant', 'order_date'],
+                condition=~models.Q(state='completed'),
+                name='order_active_idx',
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'state' in field_names:
+            instance._loaded_state = values[field_names.index('state')]
+        return instance
+
     def __str__(self):
         return f"Order {self.order_id} by {self.user}"
 
 
+class OrderEvent(models.Model):
+    """Append-only log of order state transitions."""
+
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='events')
+    restaurant = models.ForeignKey('restaurant.RestaurantProfile', on_delete=models.CASCADE, related_name='order_events')
+    actor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    from_state = models.CharField(max_length=20, choices=Order.STATE_CHOICES)
+    to_state = models.CharField(max_length=20, choices=Order.STATE_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['order', 'created_at']),
+            models.Index(fields=['restaurant', 'created_at']),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Order events are append-only.")
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"Order {self.order_id}: {self.from_state} -> {self.to_state}"
+
+
+class DailyRestaurantStats(models.Model):
+    restaurant = models.ForeignKey('restaurant.RestaurantProfile', on_delete=models.CASCADE, related_name='daily_stats')
+    date = models.DateField()
+    order_count = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    review_count = models.PositiveIntegerField(default=0)
+    score_sum = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['restaurant', 'date'], name='unique_restaurant_daily_stats'),
+        ]
+
+
+class DailyItemStats(models.Model):
+    restaurant = models.ForeignKey('restaurant.RestaurantProfile', on_delete=models.CASCADE, related_name='daily_item_stats')
+    item = models.ForeignKey('restaurant.Item', on_delete=models.CASCADE, related_name='daily_stats')
+    date = models.DateField()
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['item', 'date'], name='unique_item_daily_stats'),
+        ]
+        indexes = [
+            models.Index(fields=['restaurant', 'date']),
+        ]
+
+
+class ItemPairStats(models.Model):
+    """Completed orders containing both items. The row with item == other_item counts the item's own orders."""
+
+    item = models.ForeignKey('restaurant.Item', on_delete=models.CASCADE, related_name='+')
+    other_item = models.ForeignKey('restaurant.Item', on_delete=models.CASCADE, related_name='+')
+    order_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['item', 'other_item'], name='unique_item_pair_stats'),
+        ]
+
+
+class UserRestaurantStats(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='+')
+    restaurant = models.ForeignKey('restaurant.RestaurantProfile', on_delete=models.CASCADE, related_name='+')
+    order_count = models.PositiveIntegerField(default=0)
+    last_ordered_at = models.DateTimeField(null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'restaurant'], name='unique_user_restaurant_stats'),
+        ]
+
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='order_items')
     item = models.ForeignKey('restaurant.Item', on_delete=models.CASCADE, related_name='order_items')
@@ -50,4 +160,50 @@ class Review(models.Model):
     description = models.TextField(null=True, blank=True)
 
     class Meta:
-        unique_together = ('user', 'order')
\ No newline at end of file
+        unique_together = ('user', 'order')
+
+    def save(self, *args, **kwargs):
+        # Rating aggregates are adjusted from the save signals, keep them in the same transaction.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+@receiver(post_save, sender=Order)
+def order_post_save(sender, instance, created, raw, update_fields, **kwargs):
+    if raw or (update_fields is not None and 'state' not in update_fields):
+        return
+    if created or instance.state != getattr(instance, '_loaded_state', None):
+        instance._loaded_state = instance.state
+        order_id, restaurant_id, state = instance.order_id, instance.restaurant_id, instance.state
+        transaction.on_commit(lambda: publish_order_state(order_id, restaurant_id, state))
+
+
+
+def review_rollup_delta(order_id, count_delta, sum_delta):
+    """Queue a review change for the daily rollups if its order has already been counted there."""
+    from .tasks import record_review_delta
+
+    # The lock orders this against the completing transition, which counts the reviews it can see.
+    state = Order.objects.select_for_update().filter(pk=order_id).values_list('state', flat=True).first()
+    if state == 'completed':
+        record_review_delta.enqueue(order_id=order_id, count_delta=count_delta, sum_delta=sum_delta)
+
+
+@receiver(pre_save, sender=Review)
+def review_pre_save_daily_stats(sender, instance, raw, **kwargs):
+    if raw or instance._state.adding:
+        return
+    previous = sender.objects.filter(pk=instance.pk).values_list('score', flat=True).first()
+    if previous is not None and previous != instance.score:
+        review_rollup_delta(instance.order_id, 0, instance.score - previous)
+
+
+@receiver(post_save, sender=Review)
+def review_post_save_daily_stats(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        review_rollup_delta(instance.order_id, 1, instance.score)
+
+
+@receiver(pre_delete, sender=Review)
+def review_pre_delete_daily_stats(sender, instance, **kwargs):
+    review_rollup_delta(instance.order_id, -1, -instance.score)
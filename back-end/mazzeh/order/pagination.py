@@ -0,0 +1,49 @@
+import base64
+import json
+
+from django.db.models import Prefetch, Q
+from django.utils.dateparse import parse_datetime
+
+from .models import OrderItem
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(order):
+    position = json.dumps([order.order_date.isoformat(), order.order_id])
+    return base64.urlsafe_b64encode(position.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        order_date, order_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        order_date = parse_datetime(order_date)
+    except (ValueError, TypeError):
+        raise InvalidCursor("Invalid cursor.")
+    if order_date is None or not isinstance(order_id, int):
+        raise InvalidCursor("Invalid cursor.")
+    return order_date, order_id
+
+
+def paginate_orders(queryset, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Return one page of orders, newest first, and the cursor of the next page (or None).
+    Seeks on (order_date, order_id) so every page costs the same, with the lines and item
+    names of the page loaded in a single extra query.
+    """
+    queryset = queryset.order_by('-order_date', '-order_id')
+    if cursor:
+        order_date, order_id = decode_cursor(cursor)
+        queryset = queryset.filter(Q(order_date__lt=order_date) | Q(order_date=order_date, order_id__lt=order_id))
+
+    lines = OrderItem.objects.select_related('item').only(
+        'order_id', 'item_id', 'count', 'price', 'discount', 'item__name',
+    )
+    orders = list(queryset.prefetch_related(Prefetch('order_items', queryset=lines))[:page_size + 1])
+    next_cursor = encode_cursor(orders[page_size - 1]) if len(orders) > page_size else None
+    return orders[:page_size], next_cursor
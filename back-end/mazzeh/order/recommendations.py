@@ -0,0 +1,271 @@
+"""
+"Often ordered together" and "your usual" suggestions, learned from completed orders.
+
+Two sparse count matrices are stored in the database. ItemPairStats counts the completed orders
+holding both of two items, and its diagonal counts each item's own orders. UserRestaurantStats
+counts each user's completed orders per restaurant. record_completed_orders adds orders to both as
+they complete. rebuild_recommendations recomputes them from every order line with NumPy; it fills
+the tables the first time and repairs them later.
+
+Lookups never read those tables. Every process keeps the best RECOMMENDATION_TOP_K entries of each
+row in CSR-style arrays. A background job builds the arrays, publishes them in the shared cache and
+bumps the version; processes swap the published index in on their next lookup and keep serving the
+one they have until then. Completed orders queue one build per RECOMMENDATION_INDEX_MAX_AGE seconds,
+which is how long they take to show up. Only a process that has no index yet, or a cache that lost
+the version, builds one during a request.
+
+Items are ranked by the cosine of their order counts, pairs / sqrt(orders of one * orders of the
+other), so items that are in every basket do not crowd out the ones that really go together. The
+cosine is shrunk by pairs / (pairs + PAIR_SHRINKAGE), so that two rare items seen together once
+do not look like a perfect match. Restaurants are ranked by how often the user ordered there, halved
+every AFFINITY_HALF_LIFE_DAYS since their last order.
+"""
+import threading
+import time
+from datetime import timedelta
+from itertools import chain
+
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Max, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import ItemPairStats, Order, OrderItem, UserRestaurantStats
+
+RECOMMENDATION_TOP_K = 20
+RECOMMENDATION_INDEX_MAX_AGE = 600
+PAIR_SHRINKAGE = 3
+AFFINITY_HALF_LIFE_DAYS = 60
+REBUILD_BATCH_SIZE = 5000
+VERSION_KEY = 'recommendations-version'
+
+
+class TopK:
+    """The best scored columns of every row of a sparse matrix, in compressed sparse row form."""
+
+    def __init__(self, rows, columns, scores, k):
+        rows, columns, scores = (np.asarray(a) for a in (rows, columns, scores))
+        # By row, best score first; ties go to the lower column so the index is deterministic.
+        order = np.lexsort((columns, -scores, rows))
+        rows, columns, scores = rows[order], columns[order], scores[order]
+        self.keys, starts, counts = np.unique(rows, return_index=True, return_counts=True)
+        rank = np.arange(len(rows)) - np.repeat(starts, counts)
+        keep = rank < k
+        self.columns = columns[keep].astype(np.int64)
+        self.scores = scores[keep].astype(np.float32)
+        self.offsets = np.zeros(len(self.keys) + 1, dtype=np.int64)
+        np.cumsum(np.minimum(counts, k), out=self.offsets[1:])
+
+    @property
+    def nbytes(self):
+        return self.keys.nbytes + self.offsets.nbytes + self.columns.nbytes + self.scores.nbytes
+
+    def get(self, key, limit):
+        position = int(np.searchsorted(self.keys, key))
+        if position == len(self.keys) or self.keys[position] != key:
+            return []
+        start = self.offsets[position]
+        return self.columns[start:min(start + limit, self.offsets[position + 1])].tolist()
+
+
+def fetch_columns(queryset, fields):
+    """Integer columns of a values_list query, read in chunks straight into one array."""
+    values = chain.from_iterable(queryset.values_list(*fields).iterator(chunk_size=10000))
+    return np.fromiter(values, dtype=np.int64).reshape(-1, len(fields)).T
+
+
+def item_scores(items, other_items, order_counts):
+    """Similarity of the off-diagonal item pairs, given the pair counts including the diagonal."""
+    diagonal = items == other_items
+    singles, single_counts = items[diagonal], order_counts[diagonal]
+    pairs = ~diagonal
+    items, other_items, order_counts = items[pairs], other_items[pairs], order_counts[pairs].astype(np.float64)
+    # The orders that wrote a pair also wrote the diagonal rows of both its items.
+    norms = np.sqrt(
+        single_counts[np.searchsorted(singles, items)] * single_counts[np.searchsorted(singles, other_items)]
+    )
+    return items, other_items, order_counts / norms * order_counts / (order_counts + PAIR_SHRINKAGE)
+
+
+class RecommendationIndex:
+    def __init__(self, version):
+        self.version = version
+        self.built_at = time.monotonic()
+        items, other_items, order_counts = fetch_columns(
+            ItemPairStats.objects.order_by('item_id', 'other_item_id'), ('item_id', 'other_item_id', 'order_count'),
+        )
+        self.items = TopK(*item_scores(items, other_items, order_counts), RECOMMENDATION_TOP_K)
+
+        now = timezone.now()
+        users, restaurants, scores = [], [], []
+        stats = UserRestaurantStats.objects.values_list('user_id', 'restaurant_id', 'order_count', 'last_ordered_at')
+        for user_id, restaurant_id, order_count, last_ordered_at in stats.iterator(chunk_size=10000):
+            age_days = (now - last_ordered_at).total_seconds() / 86400 if last_ordered_at else 0
+            users.append(user_id)
+            restaurants.append(restaurant_id)
+            scores.append(order_count * 0.5 ** (max(age_days, 0) / AFFINITY_HALF_LIFE_DAYS))
+        self.users = TopK(
+            np.array(users, dtype=np.int64), np.array(restaurants, dtype=np.int64),
+            np.array(scores, dtype=np.float64), RECOMMENDATION_TOP_K,
+        )
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def index_key(version):
+    return f'recommendations-index:{version}'
+
+
+def invalidate_recommendations():
+    """Forget the published index, so that the next lookup builds a new one."""
+    cache.delete(VERSION_KEY)
+
+
+def publish_recommendation_index():
+    """Build the index from the count tables and make it the one every process serves."""
+    index = RecommendationIndex(time.time_ns())
+    previous = cache.get(VERSION_KEY)
+    cache.set(index_key(index.version), index, None)
+    cache.set(VERSION_KEY, index.version, None)
+    if previous is not None:
+        cache.delete(index_key(previous))
+    return index
+
+
+def schedule_recommendation_index():
+    """Queue one index build at the end of the current RECOMMENDATION_INDEX_MAX_AGE window."""
+    from .tasks import build_recommendation_index
+
+    now = time.time()
+    window = int(now // RECOMMENDATION_INDEX_MAX_AGE)
+    build_recommendation_index.enqueue(
+        key=f"recommendation-index:{window}", delay=timedelta(seconds=(window + 1) * RECOMMENDATION_INDEX_MAX_AGE - now),
+    )
+
+
+def recommendation_index():
+    global _index
+    version = cache.get(VERSION_KEY)
+    index = _index
+    if index is None or version is None:
+        with _index_lock:
+            if _index is index:
+                _index = (version is not None and cache.get(index_key(version))) or publish_recommendation_index()
+            return _index
+    if index.version != version and _index_lock.acquire(blocking=False):
+        # Whoever holds the lock swaps the new index in; the others keep serving the current one.
+        try:
+            published = cache.get(index_key(version))
+            if published is not None:
+                _index = index = published
+            else:
+                schedule_recommendation_index()
+        finally:
+            _index_lock.release()
+    return index
+
+
+def similar_items(item_id, limit=10):
+    """Ids of the items most often ordered together with item_id, best first."""
+    return recommendation_index().items.get(item_id, limit)
+
+
+def usual_restaurants(user_id, limit=10):
+    """Ids of the restaurants the user orders from most, recent orders weighing more, best first."""
+    return recommendation_index().users.get(user_id, limit)
+
+
+def record_completed_orders(order_ids):
+    """Add completed orders to the pair and affinity counts; call it once per order."""
+    baskets = {}
+    for order_id, item_id in OrderItem.objects.filter(order_id__in=order_ids).values_list('order_id', 'item_id'):
+        baskets.setdefault(order_id, set()).add(item_id)
+    orders = list(
+        Order.objects.filter(order_id__in=order_ids, state='completed')
+        .values_list('order_id', 'user_id', 'restaurant_id', 'order_date')
+    )
+
+    # Rows are first inserted at zero and then incremented, so concurrent jobs never lose a count.
+    ItemPairStats.objects.bulk_create(
+        [
+            ItemPairStats(item_id=item_id, other_item_id=other_item_id)
+            for order_id, *_ in orders
+            for item_id in baskets.get(order_id, ())
+            for other_item_id in baskets[order_id]
+        ],
+        batch_size=REBUILD_BATCH_SIZE, ignore_conflicts=True,
+    )
+    UserRestaurantStats.objects.bulk_create(
+        [UserRestaurantStats(user_id=user_id, restaurant_id=restaurant_id) for _, user_id, restaurant_id, _ in orders],
+        ignore_conflicts=True,
+    )
+    for order_id, user_id, restaurant_id, order_date in orders:
+        basket = baskets.get(order_id)
+        if basket:
+            # The basket's items form a clique, so one UPDATE covers all its pairs and the diagonal.
+            ItemPairStats.objects.filter(item_id__in=basket, other_item_id__in=basket).update(
+                order_count=F('order_count') + 1,
+            )
+        UserRestaurantStats.objects.filter(user_id=user_id, restaurant_id=restaurant_id).update(
+            order_count=F('order_count') + 1,
+            last_ordered_at=Greatest(Coalesce('last_ordered_at', Value(order_date)), Value(order_date)),
+        )
+    if orders:
+        schedule_recommendation_index()
+
+
+def item_pair_counts(order_ids, item_ids):
+    """Sparse co-occurrence counts of the baskets given as parallel arrays: (items, other_items, counts).
+
+    The result holds both orders of every pair and, on the diagonal, the number of baskets of each item.
+    """
+    base = int(item_ids.max()) + 1
+    # One line per basket and item, sorted by basket.
+    lines = np.unique(order_ids * base + item_ids)
+    baskets, items = np.divmod(lines, base)
+    _, starts, sizes = np.unique(baskets, return_index=True, return_counts=True)
+    # Pair every line with each line of its basket, itself included.
+    line_sizes = np.repeat(sizes, sizes)
+    left = np.repeat(np.arange(len(lines)), line_sizes)
+    first = np.repeat(np.repeat(starts, sizes), line_sizes)
+    within = np.arange(len(left)) - np.repeat(np.cumsum(line_sizes) - line_sizes, line_sizes)
+    pairs, counts = np.unique(items[left] * base + items[first + within], return_counts=True)
+    return *np.divmod(pairs, base), counts
+
+
+def rebuild_recommendations():
+    """Recompute both count tables from every completed order. Returns the number of rows written.
+
+    Orders that complete while it runs may be missed; stop run_jobs first, or rebuild again later.
+    """
+    from .tasks import build_recommendation_index
+
+    with transaction.atomic():
+        order_ids, item_ids = fetch_columns(
+            OrderItem.objects.filter(order__state='completed').order_by(), ('order_id', 'item_id'),
+        )
+        ItemPairStats.objects.all().delete()
+        pair_rows = 0
+        if len(order_ids):
+            items, other_items, counts = (column.tolist() for column in item_pair_counts(order_ids, item_ids))
+            pair_rows = len(counts)
+            for start in range(0, pair_rows, REBUILD_BATCH_SIZE):
+                end = start + REBUILD_BATCH_SIZE
+                ItemPairStats.objects.bulk_create(
+                    ItemPairStats(item_id=item_id, other_item_id=other_item_id, order_count=count)
+                    for item_id, other_item_id, count in zip(items[start:end], other_items[start:end], counts[start:end])
+                )
+
+        UserRestaurantStats.objects.all().delete()
+        affinities = (
+            Order.objects.filter(state='completed').order_by().values('user_id', 'restaurant_id')
+            .annotate(order_count=Count('pk'), last_ordered_at=Max('order_date'))
+        )
+        stats = [UserRestaurantStats(**row) for row in affinities.iterator(chunk_size=10000)]
+        UserRestaurantStats.objects.bulk_create(stats, batch_size=REBUILD_BATCH_SIZE)
+        build_recommendation_index.enqueue()
+    return {'item_pairs': pair_rows, 'user_restaurants': len(stats)}
@@ -0,0 +1,80 @@
+from rest_framework import serializers
+from .models import Order, OrderEvent, OrderItem
+from .pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from .recommendations import RECOMMENDATION_TOP_K
+
+
+class CheckoutSerializer(serializers.Serializer):
+    cart_id = serializers.IntegerField()
+    delivery_method = serializers.ChoiceField(choices=Order.DELIVERY_METHOD_CHOICES, default='pickup')
+    payment_method = serializers.ChoiceField(choices=Order.PAYMENT_METHOD_CHOICES, default='in_person')
+    description = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
+
+class OrderTransitionSerializer(serializers.Serializer):
+    order_ids = serializers.ListField(child=serializers.IntegerField(), min_length=1, max_length=500)
+    state = serializers.ChoiceField(choices=list(Order.TRANSITIONS))
+
+
+class AnalyticsRangeSerializer(serializers.Serializer):
+    start = serializers.DateField()
+    end = serializers.DateField()
+
+    def validate(self, attrs):
+        if attrs['start'] > attrs['end']:
+            raise serializers.ValidationError("start must not be after end.")
+        if (attrs['end'] - attrs['start']).days > 731:
+            raise serializers.ValidationError("The range cannot be longer than two years.")
+        return attrs
+
+
+class OrderItemSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OrderItem
+        fields = ['item', 'count', 'price', 'discount']
+
+
+class OrderSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Order
+        fields = [
+            'order_id', 'restaurant', 'order_date', 'total_price', 'delivery_price', 'state',
+            'delivery_method', 'payment_method', 'description',
+        ]
+
+
+class OrderHistoryItemSerializer(OrderItemSerializer):
+    name = serializers.CharField(source='item.name', read_only=True)
+
+    class Meta(OrderItemSerializer.Meta):
+        fields = OrderItemSerializer.Meta.fields + ['name']
+
+
+class OrderHistorySerializer(OrderSerializer):
+    items = OrderHistoryItemSerializer(source='order_items', many=True, read_only=True)
+
+    class Meta(OrderSerializer.Meta):
+        fields = OrderSerializer.Meta.fields + ['user', 'items']
+
+
+class OrderEventSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OrderEvent
+        fields = ['from_state', 'to_state', 'created_at']
+
+
+def order_status_data(order, items, events):
+    """An order with its lines (items selected) and state changes, as returned by the order status endpoint."""
+    data = OrderSerializer(order).data
+    data['items'] = OrderHistoryItemSerializer(items, many=True).data
+    data['events'] = OrderEventSerializer(events, many=True).data
+    return data
+
+
+class OrderHistoryQuerySerializer(serializers.Serializer):
+    cursor = serializers.CharField(required=False)
+    page_size = serializers.IntegerField(min_value=1, max_value=MAX_PAGE_SIZE, default=DEFAULT_PAGE_SIZE)
+
+
+class RecommendationQuerySerializer(serializers.Serializer):
+    limit = serializers.IntegerField(min_value=1, max_value=RECOMMENDATION_TOP_K, default=10)
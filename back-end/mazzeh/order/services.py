@@ -0,0 +1,139 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from customer.models import Cart, CartItem, CustomerProfile
+from restaurant.delivery import delivery_fee
+from restaurant.tasks import refresh_prep_minutes
+from .events import publish_order_state
+from .models import Order, OrderEvent, OrderItem, Review
+from .tasks import record_completed_orders, record_completed_sales
+
+CENT = Decimal('0.01')
+
+
+class CheckoutError(Exception):
+    pass
+
+
+class TransitionError(Exception):
+    pass
+
+
+def line_total(count, price, discount):
+    return (count * price * (100 - discount) / 100).quantize(CENT)
+
+
+def _delivery_price(user, restaurant):
+    """Distance-based when both ends have a location, otherwise the restaurant's flat delivery_price."""
+    customer = CustomerProfile.objects.filter(user_id=user.pk).only('latitude', 'longitude').first()
+    if customer is None or None in (customer.latitude, customer.longitude, restaurant.latitude, restaurant.longitude):
+        return restaurant.delivery_price
+    fee = delivery_fee(restaurant, customer.latitude, customer.longitude)
+    if fee is None:
+        raise CheckoutError("This restaurant does not deliver to your location.")
+    return fee
+
+
+def checkout(user, cart_id, delivery_method='pickup', payment_method='in_person', description=None):
+    """Turn the user's cart into an order in one transaction, with a fixed number of queries."""
+    with transaction.atomic():
+        cart = (
+            Cart.objects.select_for_update(of=('self',))
+            .select_related('restaurant')
+            .filter(pk=cart_id, user_id=user.pk)
+            .first()
+        )
+        if cart is None:
+            raise CheckoutError("Cart not found.")
+        if cart.restaurant.state != 'approved':
+            raise CheckoutError("This restaurant is not accepting orders.")
+
+        cart_items = list(CartItem.objects.filter(cart=cart).select_related('item'))
+        if not cart_items:
+            raise CheckoutError("Cart is empty.")
+        unavailable = [cart_item.item.name for cart_item in cart_items if cart_item.item.state != 'available']
+        if unavailable:
+            raise CheckoutError(f"Unavailable items: {', '.join(unavailable)}.")
+
+        delivery_price = Decimal('0')
+        if delivery_method == 'delivery':
+            delivery_price = _delivery_price(user, cart.restaurant)
+        order_items = [
+            OrderItem(
+                item=cart_item.item,
+                count=cart_item.count,
+                price=cart_item.item.price,
+                discount=cart_item.item.discount,
+            )
+            for cart_item in cart_items
+        ]
+        items_price = sum(
+            (line_total(order_item.count, order_item.price, order_item.discount) for order_item in order_items),
+            Decimal('0'),
+        )
+
+        order = Order.objects.create(
+            user_id=user.pk,
+            restaurant=cart.restaurant,
+            total_price=items_price + delivery_price,
+            delivery_price=delivery_price,
+            delivery_method=delivery_method,
+            payment_method=payment_method,
+            description=description,
+        )
+        for order_item in order_items:
+            order_item.order = order
+        OrderItem.objects.bulk_create(order_items)
+
+        cart.delete()
+
+    return order, order_items
+
+
+def transition_orders(restaurant_id, order_ids, to_state, actor=None):
+    """
+    Move a batch of the restaurant's orders to to_state with one conditional UPDATE and log
+    every change. Orders that are missing or not in an allowed source state are reported back.
+    """
+    from_states = Order.TRANSITIONS.get(to_state)
+    if from_states is None:
+        raise TransitionError(f"Orders cannot be moved to '{to_state}'.")
+
+    order_ids = set(order_ids)
+    with transaction.atomic():
+        eligible = Order.objects.filter(restaurant_id=restaurant_id, order_id__in=order_ids, state__in=from_states)
+        if to_state == 'delivering':
+            eligible = eligible.filter(delivery_method='delivery')
+        current = dict(eligible.select_for_update().values_list('order_id', 'state'))
+        if current:
+            Order.objects.filter(order_id__in=current, state__in=from_states).update(state=to_state)
+            OrderEvent.objects.bulk_create(
+                OrderEvent(
+                    order_id=order_id, restaurant_id=restaurant_id, actor_id=actor.pk if actor else None,
+                    from_state=from_state, to_state=to_state,
+                )
+                for order_id, from_state in current.items()
+            )
+            if to_state == 'ready_for_pickup':
+                # One refresh per restaurant and hour is plenty for a median over weeks of orders.
+                refresh_prep_minutes.enqueue(
+                    key=f"prep-minutes:{restaurant_id}:{timezone.now():%Y%m%d%H}", restaurant_id=restaurant_id,
+                )
+            if to_state == 'completed':
+                # Reviews lock their order before touching the rollups, so the ones read here are exactly
+                # those that were written before the orders completed and never enqueued a delta.
+                reviews = (
+                    Review.objects.filter(order_id__in=current).order_by().values('order_id')
+                    .annotate(count=Count('pk'), score_sum=Sum('score')).values_list('order_id', 'count', 'score_sum')
+                )
+                record_completed_sales.enqueue(order_ids=list(current), reviews=[list(row) for row in reviews])
+                # Completed is final, so every order is counted once without an idempotency key.
+                record_completed_orders.enqueue(order_ids=list(current))
+            transaction.on_commit(lambda: [
+                publish_order_state(order_id, restaurant_id, to_state) for order_id in current
+            ])
+
+    return sorted(current), sorted(order_ids - current.keys())
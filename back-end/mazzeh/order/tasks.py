@@ -0,0 +1,22 @@
+from jobs.queue import task
+from . import analytics, recommendations
+
+
+@task(name='order.record_completed_sales')
+def record_completed_sales(order_ids, reviews=()):
+    analytics.record_completed_sales(order_ids, reviews)
+
+
+@task(name='order.record_review_delta')
+def record_review_delta(order_id, count_delta, sum_delta):
+    analytics.record_review_delta(order_id, count_delta, sum_delta)
+
+
+@task(name='order.record_completed_orders')
+def record_completed_orders(order_ids):
+    recommendations.record_completed_orders(order_ids)
+
+
+@task(name='order.build_recommendation_index')
+def build_recommendation_index():
+    recommendations.publish_recommendation_index()
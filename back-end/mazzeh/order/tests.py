@@ -1,3 +1,479 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import json
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import transaction
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from customer.models import Cart, CartItem, CustomerProfile
+from jobs.models import Job
+from jobs.queue import work
+from mazzeh.synthetic import generate
+from mazzeh.testing import QueryBudgetMixin
+from restaurant.models import Item, RestaurantProfile
+from user.models import User
+from user.serializers import CustomTokenObtainPairSerializer
+from .analytics import refresh_daily_stats, restaurant_dashboard
+from .events import get_broker, order_channel
+from .models import (
+    DailyItemStats, DailyRestaurantStats, ItemPairStats, Order, OrderEvent, OrderItem, Review, UserRestaurantStats,
+)
+from .recommendations import rebuild_recommendations, similar_items, usual_restaurants
+from .services import TransitionError, line_total, transition_orders
+from .views import OrderStreamView
+
+
+class CheckoutTests(TestCase):
+    def setUp(self):
+        manager = User.objects.create_user("09120000001", "pass", role="restaurant_manager")
+        self.customer = User.objects.create_user("09120000002", "pass")
+        self.restaurant = RestaurantProfile.objects.create(
+            manager=manager, name="Mazzeh", city_name="Tehran", state="approved", delivery_price=30,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def make_cart(self, size):
+        cart = Cart.objects.create(user=self.customer, restaurant=self.restaurant)
+        items = Item.objects.bulk_create(
+            Item(restaurant=self.restaurant, name=f"Item {i}", price=100, discount=10)
+            for i in range(size)
+        )
+        CartItem.objects.bulk_create(
+            CartItem(cart=cart, item=item, count=2, price=50, discount=0) for item in items
+        )
+        return cart
+
+    def test_checkout_reprices_cart_and_removes_it(self):
+        cart = self.make_cart(2)
+
+        response = self.client.post(
+            '/api/order/checkout', {'cart_id': cart.pk, 'delivery_method': 'delivery'}, format='json',
+        )
+
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get(pk=response.data['order_id'])
+        self.assertEqual(order.delivery_price, Decimal('30.00'))
+        self.assertEqual(order.total_price, Decimal('390.00'))
+        self.assertEqual(OrderItem.objects.filter(order=order, price=100, discount=10).count(), 2)
+        self.assertFalse(Cart.objects.filter(pk=cart.pk).exists())
+        self.assertFalse(CartItem.objects.filter(cart_id=cart.pk).exists())
+
+    def test_checkout_query_count_does_not_depend_on_cart_size(self):
+        for size in (1, 25):
+            cart = self.make_cart(size)
+            with self.assertNumQueries(8):
+                response = self.client.post('/api/order/checkout', {'cart_id': cart.pk}, format='json')
+            self.assertEqual(response.status_code, 201)
+            Item.objects.all().delete()
+
+    def test_delivery_is_priced_by_distance_when_locations_are_known(self):
+        RestaurantProfile.objects.filter(pk=self.restaurant.pk).update(latitude=35.75, longitude=51.4)
+        CustomerProfile.objects.create(user=self.customer, latitude=35.7, longitude=51.4)
+
+        response = self.client.post(
+            '/api/order/checkout', {'cart_id': self.make_cart(1).pk, 'delivery_method': 'delivery'}, format='json',
+        )
+        self.assertEqual(Order.objects.get(pk=response.data['order_id']).delivery_price, Decimal('56.14'))
+
+        RestaurantProfile.objects.filter(pk=self.restaurant.pk).update(latitude=36.7)
+        Item.objects.all().delete()
+        response = self.client.post(
+            '/api/order/checkout', {'cart_id': self.make_cart(1).pk, 'delivery_method': 'delivery'}, format='json',
+        )
+        self.assertEqual(response.data, {"error": "This restaurant does not deliver to your location."})
+
+    def test_checkout_rejects_unavailable_items(self):
+        cart = self.make_cart(2)
+        Item.objects.filter(name="Item 1").update(state="unavailable")
+
+        response = self.client.post('/api/order/checkout', {'cart_id': cart.pk}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data, {"error": "Unavailable items: Item 1."})
+        self.assertTrue(Cart.objects.filter(pk=cart.pk).exists())
+        self.assertFalse(Order.objects.exists())
+
+
+class OrderHistoryTests(QueryBudgetMixin, TestCase):
+    def test_history_page_stays_within_query_budget(self):
+        manager = User.objects.create_user("09120000001", "pass", role="restaurant_manager")
+        customer = User.objects.create_user("09120000002", "pass")
+        restaurant = RestaurantProfile.objects.create(manager=manager, name="Mazzeh", city_name="Tehran")
+        items = Item.objects.bulk_create(Item(restaurant=restaurant, name=f"Item {i}", price=100) for i in range(3))
+        for _ in range(10):
+            order = Order.objects.create(user=customer, restaurant=restaurant, total_price=300)
+            OrderItem.objects.bulk_create(OrderItem(order=order, item=item, count=1, price=100) for item in items)
+        client = APIClient()
+        client.force_authenticate(customer)
+
+        with self.assertQueryBudget(2):
+            response = client.get('/api/order/history')
+
+        self.assertEqual(len(response.data['results']), 10)
+
+
+class OrderStatusTests(QueryBudgetMixin, TestCase):
+    def test_customer_sees_own_order_with_items_and_events(self):
+        cache.clear()
+        manager = User.objects.create_user("09120000001", "pass", role="restaurant_manager")
+        customer = User.objects.create_user("09120000002", "pass")
+        other = User.objects.create_user("09120000003", "pass")
+        restaurant = RestaurantProfile.objects.create(manager=manager, name="Mazzeh", city_name="Tehran", state="approved")
+        item = Item.objects.create(restaurant=restaurant, name="Kabab", price=100)
+        order = Order.objects.create(user=customer, restaurant=restaurant, total_price=200)
+        OrderItem.objects.create(order=order, item=item, count=2, price=100)
+        transition_orders(restaurant.pk, [order.pk], 'preparing', manager)
+        client = APIClient()
+        url = f'/api/order/{order.pk}'
+
+        self.assertEqual(client.get(url).status_code, 401)
+        access = CustomTokenObtainPairSerializer.get_token(customer).access_token
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+        client.get(url)
+        with self.assertQueryBudget(3):
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data['order_id'], data['state']), (order.pk, 'preparing'))
+        self.assertEqual([(line['name'], line['count']) for line in data['items']], [("Kabab", 2)])
+        self.assertEqual([(event['from_state'], event['to_state']) for event in data['events']], [('pending', 'preparing')])
+
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {CustomTokenObtainPairSerializer.get_token(other).access_token}")
+        self.assertEqual(client.get(url).status_code, 404)
+
+
+class OrderTransitionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.manager = User.objects.create_user("09120000001", "pass", role="restaurant_manager")
+        customer = User.objects.create_user("09120000002", "pass")
+        self.restaurant = RestaurantProfile.objects.create(manager=self.manager, name="Mazzeh", city_name="Tehran", state="approved")
+        other = RestaurantProfile.objects.create(
+            manager=User.objects.create_user("09120000003", "pass", role="restaurant_manager"), name="Other", city_name="Tehran",
+        )
+        self.pickup, self.delivery = (
+            Order.objects.create(user=customer, restaurant=self.restaurant, total_price=100, delivery_method=method)
+            for method in ('pickup', 'delivery')
+        )
+        self.foreign = Order.objects.create(user=customer, restaurant=other, total_price=100)
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def transition(self, order_ids, state):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/order/transitions', {'order_ids': order_ids, 'state': state}, format='json')
+
+    def events(self, order):
+        return list(OrderEvent.objects.filter(order=order).order_by('pk').values_list('from_state', 'to_state', 'actor'))
+
+    def test_only_allowed_transitions_are_applied_and_logged(self):
+        self.assertEqual(self.transition([self.pickup.pk], 'pending').status_code, 400)
+        with self.assertRaises(TransitionError):
+            transition_orders(self.restaurant.pk, [self.pickup.pk], 'pending')
+
+        response = self.transition([self.pickup.pk], 'ready_for_pickup')
+        self.assertEqual(response.data, {"updated": [], "rejected": [self.pickup.pk]})
+        response = self.transition([self.pickup.pk, self.delivery.pk, self.foreign.pk, 0], 'preparing')
+        self.assertEqual(response.data, {"updated": [self.pickup.pk, self.delivery.pk], "rejected": [0, self.foreign.pk]})
+        self.transition([self.pickup.pk, self.delivery.pk], 'ready_for_pickup')
+        # Only delivery orders go out for delivery.
+        response = self.transition([self.pickup.pk, self.delivery.pk], 'delivering')
+        self.assertEqual(response.data, {"updated": [self.delivery.pk], "rejected": [self.pickup.pk]})
+        self.transition([self.pickup.pk, self.delivery.pk], 'completed')
+        response = self.transition([self.pickup.pk], 'preparing')
+        self.assertEqual(response.data['rejected'], [self.pickup.pk])
+
+        self.assertEqual(
+            list(Order.objects.order_by('pk').values_list('state', flat=True)), ['completed', 'completed', 'pending'],
+        )
+        manager = self.manager.pk
+        self.assertEqual(self.events(self.pickup), [
+            ('pending', 'preparing', manager), ('preparing', 'ready_for_pickup', manager),
+            ('ready_for_pickup', 'completed', manager),
+        ])
+        self.assertEqual(self.events(self.delivery), [
+            ('pending', 'preparing', manager), ('preparing', 'ready_for_pickup', manager),
+            ('ready_for_pickup', 'delivering', manager), ('delivering', 'completed', manager),
+        ])
+        self.assertEqual(self.events(self.foreign), [])
+
+    def test_active_orders_are_the_restaurants_unfinished_ones_oldest_first(self):
+        Order.objects.filter(pk=self.pickup.pk).update(order_date=self.delivery.order_date + datetime.timedelta(minutes=5))
+        completed = Order.objects.create(user=self.pickup.user, restaurant=self.restaurant, total_price=100)
+        self.transition([self.delivery.pk, completed.pk], 'preparing')
+        self.transition([completed.pk], 'ready_for_pickup')
+        self.transition([completed.pk], 'completed')
+
+        response = self.client.get('/api/order/active')
+        self.assertEqual(
+            [(order['order_id'], order['state']) for order in response.data],
+            [(self.delivery.pk, 'preparing'), (self.pickup.pk, 'pending')],
+        )
+
+        self.client.force_authenticate(self.pickup.user)
+        self.assertEqual(self.client.get('/api/order/active').status_code, 403)
+        self.client.force_authenticate(User.objects.create_user("09120000009", "pass", role="restaurant_manager"))
+        self.assertEqual(self.client.get('/api/order/active').status_code, 404)
+
+
+class OrderStreamTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.manager = User.objects.create_user("09120000001", "pass", role="restaurant_manager")
+        self.customer = User.objects.create_user("09120000002", "pass")
+        self.restaurant = RestaurantProfile.objects.create(manager=self.manager, name="Mazzeh", city_name="Tehran", state="approved")
+        self.order = Order.objects.create(user=self.customer, restaurant=self.restaurant, total_price=100)
+        self.token = str(CustomTokenObtainPairSerializer.get_token(self.customer).access_token)
+
+    def transition(self, state, rollback=False):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    transition_orders(self.restaurant.pk, [self.order.pk], state, self.manager)
+                    if rollback:
+                        raise RuntimeError
+            except RuntimeError:
+                pass
+
+    async def test_stream_sends_the_current_state_then_committed_transitions(self):
+        request = AsyncRequestFactory().get(f'/api/order/{self.order.pk}/stream', {'token': self.token})
+        response = await OrderStreamView.as_view()(request, order_id=self.order.pk)
+        stream = response.streaming_content.__aiter__()
+        self.assertIn(b'"state": "pending"', await stream.__anext__())
+
+        await sync_to_async(self.transition)('preparing')
+        self.assertIn(b'"state": "preparing"', await asyncio.wait_for(stream.__anext__(), 1))
+        await stream.aclose()
+
+    async def test_nothing_is_published_when_the_transition_rolls_back(self):
+        subscription = get_broker().subscribe(order_channel(self.order.pk))
+        self.addCleanup(subscription.close)
+        await sync_to_async(self.transition)('preparing', rollback=True)
+        await asyncio.sleep(0.05)
+        self.assertTrue(subscription.queue.empty())
+
+        await sync_to_async(self.transition)('preparing')
+        self.assertIn('"preparing"', await subscription.get(timeout=1))
+
+    def test_transition_succeeds_while_the_broker_is_down(self):
+        self.addCleanup(get_broker.cache_clear)
+        client = APIClient()
+        client.force_authenticate(self.manager)
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(
+                ORDER_EVENTS_BROKER='order.events.UnixSocketBroker', ORDER_EVENTS_SOCKET=Path(directory) / 'missing.sock',
+            ):
+                get_broker.cache_clear()
+                with self.assertLogs('order.events', 'ERROR'), self.captureOnCommitCallbacks(execute=True):
+                    response = client.post('/api/order/transitions', {'order_ids': [self.order.pk], 'state': 'preparing'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['updated'], [self.order.pk])
+
+
+class AnalyticsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.manager = User.objects.create_user("09120000001", "pass", role="restaurant_manager")
+        self.customer = User.objects.create_user("09120000002", "pass")
+        self.restaurant = RestaurantProfile.objects.create(manager=self.manager, name="Mazzeh", city_name="Tehran", state="approved")
+        self.other = RestaurantProfile.objects.create(
+            manager=User.objects.create_user("09120000003", "pass", role="restaurant_manager"), name="Other", city_name="Tehran",
+        )
+        self.kabab = Item.objects.create(restaurant=self.restaurant, name="Kabab", price=Decimal('100'))
+        self.rice = Item.objects.create(restaurant=self.restaurant, name="Rice", price=Decimal('50'), discount=20)
+        self.day = datetime.date(2026, 3, 1)
+
+    def order(self, restaurant, day, lines, state='ready_for_pickup'):
+        order = Order.objects.create(user=self.customer, restaurant=restaurant, total_price=0, state=state)
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, item=item, count=count, price=item.price, discount=item.discount) for item, count in lines
+        )
+        order_date = timezone.make_aware(datetime.datetime.combine(day, datetime.time(21, 30)))
+        Order.objects.filter(pk=order.pk).update(
+            order_date=order_date, total_price=sum(line_total(count, item.price, item.discount) for item, count in lines),
+        )
+        return order
+
+    def complete(self, restaurant, orders):
+        transition_orders(restaurant.pk, [order.pk for order in orders], 'completed')
+        work(burst=True)
+
+    def rollups(self):
+        return (
+            set(DailyRestaurantStats.objects.values_list('restaurant_id', 'date', 'order_count', 'revenue', 'review_count', 'score_sum')),
+            set(DailyItemStats.objects.values_list('item_id', 'date', 'quantity', 'revenue')),
+        )
+
+    def test_incremental_refreshes_match_a_full_rebuild(self):
+        next_day = self.day + datetime.timedelta(days=1)
+        first = self.order(self.restaurant, self.day, [(self.kabab, 2)])
+        second = self.order(self.restaurant, self.day, [(self.rice, 1)])
+        third = self.order(self.restaurant, next_day, [(self.kabab, 1), (self.rice, 2)])
+        self.order(self.restaurant, self.day, [(self.kabab, 5)], state='pending')
+        early = Review.objects.create(user=self.customer, order=first, score=3)
+        self.complete(self.restaurant, [first, second])
+        self.complete(self.restaurant, [third])
+        self.complete(self.other, [self.order(self.other, self.day, [])])
+        early.score = 5
+        early.save()
+        review = Review.objects.create(user=self.customer, order=third, score=2)
+        Review.objects.create(user=self.customer, order=second, score=1).delete()
+        work(burst=True)
+
+        incremental = self.rollups()
+        self.assertIn((self.restaurant.pk, self.day, 2, Decimal('240.00'), 1, 5), incremental[0])
+        self.assertIn((self.restaurant.pk, next_day, 1, Decimal('180.00'), 1, 2), incremental[0])
+        self.assertIn((self.rice.pk, next_day, 2, Decimal('80.00')), incremental[1])
+
+        DailyRestaurantStats.objects.update(order_count=9)
+        DailyItemStats.objects.all().delete()
+        refresh_daily_stats(self.day, next_day + datetime.timedelta(days=1))
+        self.assertEqual(self.rollups(), incremental)
+
+        review.delete()
+        work(burst=True)
+        incremental = self.rollups()
+        call_command('rebuild_daily_stats', stdout=StringIO())
+        self.assertEqual(self.rollups(), incremental)
+        self.assertIn((self.restaurant.pk, next_day, 1, Decimal('180.00'), 0, 0), incremental[0])
+
+    def test_dashboard_reads_the_rollups_for_an_inclusive_range(self):
+        next_day = self.day + datetime.timedelta(days=1)
+        orders = [
+            self.order(self.restaurant, self.day, [(self.kabab, 2)]),
+            self.order(self.restaurant, next_day, [(self.kabab, 1), (self.rice, 2)]),
+            self.order(self.restaurant, next_day + datetime.timedelta(days=1), [(self.rice, 10)]),
+        ]
+        self.complete(self.restaurant, orders)
+        Review.objects.create(user=self.customer, order=orders[0], score=5)
+        Review.objects.create(user=self.customer, order=orders[1], score=2)
+        work(burst=True)
+
+        with self.assertNumQueries(2):
+            dashboard = restaurant_dashboard(self.restaurant.pk, self.day, next_day)
+        self.assertEqual([(day['date'], day['average_score']) for day in dashboard['days']], [(self.day, 5), (next_day, 2)])
+        self.assertEqual(
+            dashboard['totals'], {'order_count': 2, 'revenue': Decimal('380.00'), 'review_count': 2, 'average_score': 3.5},
+        )
+        self.assertEqual(
+            [(item['name'], item['quantity'], item['revenue']) for item in dashboard['top_items']],
+            [("Kabab", 3, Decimal('300.00')), ("Rice", 2, Decimal('80.00'))],
+        )
+
+        client = APIClient()
+        client.force_authenticate(self.manager)
+        response = client.get('/api/order/analytics', {'start': self.day, 'end': next_day})
+        self.assertEqual(response.data['totals']['order_count'], 2)
+        self.assertEqual(client.get('/api/order/analytics', {'start': next_day, 'end': self.day}).status_code, 400)
+
+
+class RecommendationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.customer = User.objects.create_user("09120000001", "pass")
+        self.restaurants = [
+            RestaurantProfile.objects.create(
+                manager=User.objects.create_user(f"0913000000{i}", "pass", role="restaurant_manager"),
+                name=f"Restaurant {i}", city_name="Tehran", state="approved",
+            )
+            for i in range(2)
+        ]
+        self.a, self.b, self.c, self.d = Item.objects.bulk_create(
+            Item(restaurant=self.restaurants[0], name=name, price=100) for name in "abcd"
+        )
+
+    def complete_orders(self, restaurant, baskets):
+        orders = []
+        for basket in baskets:
+            order = Order.objects.create(user=self.customer, restaurant=restaurant, total_price=100, state='ready_for_pickup')
+            OrderItem.objects.bulk_create(OrderItem(order=order, item=item, count=1, price=100) for item in basket)
+            orders.append(order.pk)
+        transition_orders(restaurant.pk, orders, 'completed')
+        work(burst=True)
+
+    def counts(self):
+        return (
+            set(ItemPairStats.objects.values_list('item_id', 'other_item_id', 'order_count')),
+            set(UserRestaurantStats.objects.values_list('restaurant_id', 'order_count', 'last_ordered_at')),
+        )
+
+    def test_incremental_counts_match_a_rebuild_and_rank_suggestions(self):
+        a, b, c, d = self.a, self.b, self.c, self.d
+        self.complete_orders(self.restaurants[0], [[a, b], [a, b, c]])
+        self.complete_orders(self.restaurants[0], [[a, c], [a, b], [d]])
+        self.complete_orders(self.restaurants[1], [[]])
+        incremental = self.counts()
+        self.assertIn((a.pk, b.pk, 3), incremental[0])
+        self.assertIn((a.pk, a.pk, 4), incremental[0])
+
+        ItemPairStats.objects.update(order_count=7)
+        self.assertEqual(rebuild_recommendations(), {'item_pairs': 10, 'user_restaurants': 2})
+        self.assertEqual(self.counts(), incremental)
+
+        # a-b were ordered together 3 times, a-c twice and b-c once; d is never ordered with anything.
+        self.assertEqual(similar_items(a.pk), [b.pk, c.pk])
+        self.assertEqual(similar_items(c.pk, limit=1), [a.pk])
+        self.assertEqual(similar_items(d.pk), [])
+        self.assertEqual(usual_restaurants(self.customer.pk), [r.pk for r in self.restaurants])
+
+    def test_lookups_serve_the_current_index_until_a_job_publishes_the_next(self):
+        a, b, c = self.a, self.b, self.c
+        self.complete_orders(self.restaurants[0], [[a, b]])
+        self.assertEqual(similar_items(a.pk), [b.pk])
+
+        self.complete_orders(self.restaurants[0], [[a, c], [a, c]])
+        with self.assertNumQueries(0):
+            self.assertEqual(similar_items(a.pk), [b.pk])
+        # The build queued by the completions runs at the end of the window.
+        Job.objects.filter(task='order.build_recommendation_index').update(run_at=timezone.now())
+        work(burst=True)
+        with self.assertNumQueries(0):
+            self.assertEqual(similar_items(a.pk), [c.pk, b.pk])
+
+    def test_endpoints_only_suggest_what_can_be_ordered(self):
+        self.complete_orders(self.restaurants[0], [[self.a, self.b], [self.a, self.b], [self.a, self.c]])
+        self.complete_orders(self.restaurants[1], [[]])
+        client = APIClient()
+
+        response = client.get(f'/api/order/recommendations/items/{self.a.pk}')
+        self.assertEqual([item['item_id'] for item in response.data], [self.b.pk, self.c.pk])
+        Item.objects.filter(pk=self.b.pk).update(state='unavailable')
+        response = client.get(f'/api/order/recommendations/items/{self.a.pk}', {'limit': 1})
+        self.assertEqual([item['item_id'] for item in response.data], [self.c.pk])
+        self.assertEqual(client.get(f'/api/order/recommendations/items/{self.a.pk}', {'limit': 0}).status_code, 400)
+
+        self.assertEqual(client.get('/api/order/recommendations/usual').status_code, 401)
+        client.force_authenticate(self.customer)
+        RestaurantProfile.objects.filter(pk=self.restaurants[1].pk).update(state='pending')
+        response = client.get('/api/order/recommendations/usual')
+        self.assertEqual([restaurant['id'] for restaurant in response.data], [self.restaurants[0].pk])
+
+
+class BenchmarkSmokeTests(TestCase):
+    def test_benchmark_api_runs_on_generated_data(self):
+        counts = generate(customers=20, restaurants=3, log=lambda message: None)
+        self.assertEqual(counts['RestaurantProfile'], 3)
+
+        out = StringIO()
+        call_command('benchmark_api', '--requests', '1', '--warmup', '0', stdout=out)
+        report = json.loads(out.getvalue())
+        statuses = {name: path['statuses'] for name, path in report['paths'].items()}
+        self.assertIn('checkout', statuses)
+        for name, counted in statuses.items():
+            self.assertTrue(all(code.startswith('2') for code in counted), (name, counted))
+        # The run is rolled back, carts included.
+        self.assertEqual(Cart.objects.count(), counts['Cart'])
+
+        with self.assertRaisesMessage(CommandError, "checkout needs"):
+            call_command('benchmark_api', '--requests', str(counts['Cart'] + 1), '--only', 'checkout', stdout=StringIO())
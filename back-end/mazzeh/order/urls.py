@@ -0,0 +1,20 @@
+from django.urls import path
+from .views import (
+    ActiveOrdersView, CheckoutView, CustomerOrderHistoryView, OrderStatusView, OrderStreamView, OrderTransitionView,
+    RestaurantAnalyticsView, RestaurantOrderHistoryView, RestaurantOrderStreamView, SimilarItemsView,
+    UsualRestaurantsView,
+)
+
+urlpatterns = [
+    path('checkout', CheckoutView.as_view(), name='order_checkout'),
+    path('transitions', OrderTransitionView.as_view(), name='order_transitions'),
+    path('active', ActiveOrdersView.as_view(), name='order_active'),
+    path('analytics', RestaurantAnalyticsView.as_view(), name='restaurant_analytics'),
+    path('history', CustomerOrderHistoryView.as_view(), name='customer_order_history'),
+    path('restaurant/history', RestaurantOrderHistoryView.as_view(), name='restaurant_order_history'),
+    path('stream/restaurant', RestaurantOrderStreamView.as_view(), name='restaurant_order_stream'),
+    path('recommendations/items/<int:item_id>', SimilarItemsView.as_view(), name='similar_items'),
+    path('recommendations/usual', UsualRestaurantsView.as_view(), name='usual_restaurants'),
+    path('<int:order_id>', OrderStatusView.as_view(), name='order_status'),
+    path('<int:order_id>/stream', OrderStreamView.as_view(), name='order_stream'),
+]
@@ -1,3 +1,308 @@
-from django.shortcuts import render
+import asyncio
+import json
 
-# Create your views here.
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from drf_yasg.utils import swagger_auto_schema
+from drf_yasg import openapi
+from mazzeh.asynchronous import alist, json_response
+from mazzeh.routers import ReplicaReadMixin
+from restaurant.models import Item, RestaurantProfile
+from restaurant.permissions import IsRestaurantManager, managed_restaurant_id
+from restaurant.serializers import ItemSerializer, RestaurantProfileSerializer
+from user.authentication import aauthenticate_request
+from .events import get_broker, order_channel, restaurant_channel
+from .models import Order, OrderEvent, OrderItem
+from .analytics import restaurant_dashboard
+from .pagination import InvalidCursor, paginate_orders
+from .recommendations import RECOMMENDATION_TOP_K, similar_items, usual_restaurants
+from .serializers import (
+    AnalyticsRangeSerializer, CheckoutSerializer, OrderHistoryQuerySerializer, OrderHistorySerializer,
+    OrderItemSerializer, OrderSerializer, OrderTransitionSerializer, RecommendationQuerySerializer, order_status_data,
+)
+from .services import CheckoutError, checkout, transition_orders
+
+
+class CheckoutView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary="Checkout cart",
+        operation_description="Turns one of the user's carts into an order using the current item prices and discounts, then empties the cart.",
+        request_body=CheckoutSerializer,
+        responses={
+            201: openapi.Response("Order created", examples={"application/json": {"order_id": 1, "total_price": "230.00", "delivery_price": "30.00", "items": []}}),
+            400: openapi.Response("Invalid cart", examples={"application/json": {"error": "Cart is empty."}}),
+        }
+    )
+
+    def post(self, request):
+        serializer = CheckoutSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            order, order_items = checkout(request.user, **serializer.validated_data)
+        except CheckoutError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        data = OrderSerializer(order).data
+        data['items'] = OrderItemSerializer(order_items, many=True).data
+        return Response(data, status=status.HTTP_201_CREATED)
+
+
+class OrderTransitionView(APIView):
+    permission_classes = [IsRestaurantManager]
+
+    @swagger_auto_schema(
+        operation_summary="Change order states",
+        operation_description=(
+            "Moves a batch of the restaurant's orders to a new state in one update. "
+            "Orders that do not exist or cannot make that transition are returned in 'rejected'."
+        ),
+        request_body=OrderTransitionSerializer,
+        responses={
+            200: openapi.Response("Transition result", examples={"application/json": {"updated": [12, 13], "rejected": [9]}}),
+            400: openapi.Response("Invalid input"),
+        }
+    )
+
+    def post(self, request):
+        serializer = OrderTransitionSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        restaurant_id = managed_restaurant_id(request.user)
+        if restaurant_id is None:
+            return Response({"error": "Restaurant profile not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        updated, rejected = transition_orders(
+            restaurant_id, serializer.validated_data['order_ids'], serializer.validated_data['state'], request.user,
+        )
+        return Response({"updated": updated, "rejected": rejected}, status=status.HTTP_200_OK)
+
+
+class ActiveOrdersView(APIView):
+    permission_classes = [IsRestaurantManager]
+
+    @swagger_auto_schema(
+        operation_summary="Active orders",
+        operation_description="Lists the restaurant's orders that are not completed yet, oldest first.",
+        responses={200: OrderSerializer(many=True), 404: openapi.Response("Restaurant profile not found")},
+    )
+
+    def get(self, request):
+        restaurant_id = managed_restaurant_id(request.user)
+        if restaurant_id is None:
+            return Response({"error": "Restaurant profile not found."}, status=status.HTTP_404_NOT_FOUND)
+        orders = Order.objects.filter(restaurant_id=restaurant_id).exclude(state='completed').order_by('order_date')
+        return Response(OrderSerializer(orders, many=True).data)
+
+
+class RestaurantAnalyticsView(ReplicaReadMixin, APIView):
+    permission_classes = [IsRestaurantManager]
+
+    @swagger_auto_schema(
+        operation_summary="Restaurant sales analytics",
+        operation_description="Daily revenue, order count and review score plus the top items for a date range (inclusive), read from daily rollups.",
+        query_serializer=AnalyticsRangeSerializer,
+        responses={
+            200: openapi.Response("Dashboard", examples={"application/json": {"days": [], "totals": {"order_count": 0, "revenue": 0, "review_count": 0, "average_score": None}, "top_items": []}}),
+            400: openapi.Response("Invalid range"),
+        }
+    )
+
+    def get(self, request):
+        serializer = AnalyticsRangeSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        restaurant_id = managed_restaurant_id(request.user)
+        if restaurant_id is None:
+            return Response({"error": "Restaurant profile not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(restaurant_dashboard(restaurant_id, **serializer.validated_data))
+
+
+def in_ranking_order(rows, ids, limit):
+    by_id = {row.pk: row for row in rows}
+    return [by_id[pk] for pk in ids if pk in by_id][:limit]
+
+
+class SimilarItemsView(APIView):
+
+    @swagger_auto_schema(
+        operation_summary="Often ordered together",
+        operation_description="Available items that customers most often ordered together with the given item, best first. Learned from completed orders and refreshed every few minutes.",
+        query_serializer=RecommendationQuerySerializer,
+        responses={
+            200: ItemSerializer(many=True),
+            400: openapi.Response("Invalid limit"),
+        }
+    )
+
+    def get(self, request, item_id):
+        serializer = RecommendationQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        # Every stored suggestion is fetched, so those that cannot be ordered now are replaced by the next ones.
+        item_ids = similar_items(item_id, RECOMMENDATION_TOP_K)
+        items = Item.objects.filter(pk__in=item_ids, state='available', restaurant__state='approved')
+        return Response(ItemSerializer(in_ranking_order(items, item_ids, serializer.validated_data['limit']), many=True).data)
+
+
+class UsualRestaurantsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary="Your usual restaurants",
+        operation_description="Approved restaurants the user orders from most, recent orders weighing more, best first. Refreshed every few minutes.",
+        query_serializer=RecommendationQuerySerializer,
+        responses={
+            200: RestaurantProfileSerializer(many=True),
+            400: openapi.Response("Invalid limit"),
+        }
+    )
+
+    def get(self, request):
+        serializer = RecommendationQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        restaurant_ids = usual_restaurants(request.user.id, RECOMMENDATION_TOP_K)
+        restaurants = RestaurantProfile.objects.filter(pk__in=restaurant_ids, state='approved')
+        return Response(RestaurantProfileSerializer(
+            in_ranking_order(restaurants, restaurant_ids, serializer.validated_data['limit']), many=True,
+        ).data)
+
+
+HISTORY_RESPONSES = {
+    200: openapi.Response("One page of orders, newest first", examples={"application/json": {"results": [], "next_cursor": None}}),
+    400: openapi.Response("Invalid cursor", examples={"application/json": {"error": "Invalid cursor."}}),
+}
+
+
+def order_history_response(request, orders):
+    serializer = OrderHistoryQuerySerializer(data=request.query_params)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        page, next_cursor = paginate_orders(orders, **serializer.validated_data)
+    except InvalidCursor as exc:
+        return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({"results": OrderHistorySerializer(page, many=True).data, "next_cursor": next_cursor})
+
+
+class CustomerOrderHistoryView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary="Customer order history",
+        operation_description="Pages through the user's orders, newest first. Pass next_cursor back as cursor to get the following page.",
+        query_serializer=OrderHistoryQuerySerializer,
+        responses=HISTORY_RESPONSES,
+    )
+
+    def get(self, request):
+        return order_history_response(request, Order.objects.filter(user_id=request.user.id))
+
+
+class RestaurantOrderHistoryView(APIView):
+    permission_classes = [IsRestaurantManager]
+
+    @swagger_auto_schema(
+        operation_summary="Restaurant order history",
+        operation_description="Pages through the restaurant's orders, newest first. Pass next_cursor back as cursor to get the following page.",
+        query_serializer=OrderHistoryQuerySerializer,
+        responses=HISTORY_RESPONSES,
+    )
+
+    def get(self, request):
+        restaurant_id = managed_restaurant_id(request.user)
+        if restaurant_id is None:
+            return Response({"error": "Restaurant profile not found."}, status=status.HTTP_404_NOT_FOUND)
+        return order_history_response(request, Order.objects.filter(restaurant_id=restaurant_id))
+
+
+class OrderStatusView(View):
+    """One of the customer's orders with its lines and state changes, as an async view."""
+
+    async def get(self, request, order_id):
+        user = await aauthenticate_request(request)
+        if user is None:
+            return JsonResponse({"error": "Authentication required."}, status=status.HTTP_401_UNAUTHORIZED)
+
+        # The three reads only share the filter, so none has to wait for the order row first.
+        orders = Order.objects.filter(order_id=order_id, user_id=user.id)
+        order, items, events = await asyncio.gather(
+            orders.afirst(),
+            alist(OrderItem.objects.filter(order__in=orders).select_related('item').order_by('pk')),
+            alist(OrderEvent.objects.filter(order__in=orders).order_by('created_at', 'pk')),
+        )
+        if order is None:
+            return JsonResponse({"error": "Order not found."}, status=status.HTTP_404_NOT_FOUND)
+        return json_response(await sync_to_async(order_status_data)(order, items, events))
+
+
+STREAM_HEARTBEAT_SECONDS = 15
+
+
+async def authenticate_stream(request):
+    # Browsers' EventSource cannot set headers, so the access token may also come as ?token=.
+    return await aauthenticate_request(request, query_token=True)
+
+
+async def event_stream(subscription, initial=None):
+    try:
+        if initial is not None:
+            yield f"event: order\ndata: {json.dumps(initial)}\n\n"
+        while True:
+            try:
+                payload = await subscription.get(timeout=STREAM_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"event: order\ndata: {payload}\n\n"
+    finally:
+        subscription.close()
+
+
+def event_stream_response(subscription, initial=None):
+    return StreamingHttpResponse(
+        event_stream(subscription, initial),
+        content_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
+class RestaurantOrderStreamView(View):
+    """Server-Sent Events with every new order and state change of the manager's restaurant."""
+
+    async def get(self, request):
+        user = await authenticate_stream(request)
+        if user is None:
+            return JsonResponse({"error": "Authentication required."}, status=status.HTTP_401_UNAUTHORIZED)
+        restaurant_id = await sync_to_async(managed_restaurant_id)(user)
+        if restaurant_id is None:
+            return JsonResponse({"error": "Restaurant profile not found."}, status=status.HTTP_404_NOT_FOUND)
+        return event_stream_response(get_broker().subscribe(restaurant_channel(restaurant_id)))
+
+
+class OrderStreamView(View):
+    """Server-Sent Events with the state of one of the customer's orders, starting with the current one."""
+
+    async def get(self, request, order_id):
+        user = await authenticate_stream(request)
+        if user is None:
+            return JsonResponse({"error": "Authentication required."}, status=status.HTTP_401_UNAUTHORIZED)
+
+        # Subscribe before reading the current state so no transition in between is missed.
+        subscription = get_broker().subscribe(order_channel(order_id))
+        order = await Order.objects.filter(order_id=order_id, user_id=user.id).values(
+            'order_id', 'restaurant_id', 'state',
+        ).afirst()
+        if order is None:
+            subscription.close()
+            return JsonResponse({"error": "Order not found."}, status=status.HTTP_404_NOT_FOUND)
+        return event_stream_response(subscription, order)
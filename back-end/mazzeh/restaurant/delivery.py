@@ -0,0 +1,199 @@
+"""
+Distance-based delivery fees and ETAs, quoted for one customer against many restaurants at once.
+
+Every process keeps the coordinates, base fees and prep times of all approved restaurants in NumPy
+arrays, so quoting a whole listing is a handful of array operations. Restaurant changes to those
+fields and prep-time refreshes queue a job that builds the arrays, publishes them in the shared cache
+and bumps the version. Processes swap the published snapshot in on their next quote and keep serving
+the one they have until then; only a process without one, or a cache that lost the version, reads
+the restaurants during a request.
+
+fee = restaurant.delivery_price + fee_per_km for every road kilometer past included_km
+eta = prep minutes + handoff_minutes + road kilometers at speed_kmh
+
+Road distance is the great-circle distance times road_factor. Restaurants farther than max_km do
+not deliver. Prep minutes are the median time from placing an order to ready_for_pickup over the
+restaurant's recent orders, see refresh_prep_minutes.
+"""
+import statistics
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from order.models import OrderEvent
+from .geo import EARTH_RADIUS_KM
+from .models import RestaurantProfile
+
+VERSION_KEY = 'delivery-quotes-version'
+PREP_WINDOW = timedelta(days=30)
+PREP_MIN_ORDERS = 5
+
+
+class Snapshot:
+    """Columns of the approved restaurants that have a location, sorted by id."""
+
+    def __init__(self, rows, version):
+        self.version = version
+        ids, latitudes, longitudes, base_fees, prep_minutes = zip(*rows) if rows else ((),) * 5
+        self.ids = np.array(ids, dtype=np.int64)
+        self.latitudes = np.radians(np.array(latitudes, dtype=np.float64))
+        self.longitudes = np.radians(np.array(longitudes, dtype=np.float64))
+        self.cos_latitudes = np.cos(self.latitudes)
+        self.base_fees = np.array(base_fees, dtype=np.float64)
+        default_prep = settings.DELIVERY_QUOTES['default_prep_minutes']
+        self.prep_minutes = np.array([default_prep if p is None else p for p in prep_minutes], dtype=np.float64)
+
+    def positions(self, restaurant_ids):
+        """Indexes of the given ids in the snapshot, and a mask of the ids it has."""
+        restaurant_ids = np.asarray(restaurant_ids, dtype=np.int64)
+        positions = np.searchsorted(self.ids, restaurant_ids).clip(max=max(len(self.ids) - 1, 0))
+        found = self.ids[positions] == restaurant_ids if len(self.ids) else np.zeros(len(restaurant_ids), bool)
+        return positions, found
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def snapshot_key(version):
+    return f'delivery-quotes-snapshot:{version}'
+
+
+def invalidate_delivery_quotes():
+    """Forget the published snapshot, so that the next quote builds a new one."""
+    cache.delete(VERSION_KEY)
+
+
+def publish_restaurant_snapshot():
+    """Read the snapshot from the database and make it the one every process serves."""
+    rows = list(
+        RestaurantProfile.objects.filter(state='approved', latitude__isnull=False, longitude__isnull=False)
+        .order_by('id').values_list('id', 'latitude', 'longitude', 'delivery_price', 'prep_minutes')
+    )
+    snapshot = Snapshot(rows, time.time_ns())
+    previous = cache.get(VERSION_KEY)
+    cache.set(snapshot_key(snapshot.version), snapshot, None)
+    cache.set(VERSION_KEY, snapshot.version, None)
+    if previous is not None:
+        cache.delete(snapshot_key(previous))
+    return snapshot
+
+
+def schedule_restaurant_snapshot(key=None):
+    """Queue a snapshot build; it commits, or rolls back, with the restaurant changes that need it."""
+    from .tasks import build_restaurant_snapshot
+
+    build_restaurant_snapshot.enqueue(key=key)
+
+
+def restaurant_snapshot():
+    global _snapshot
+    version = cache.get(VERSION_KEY)
+    snapshot = _snapshot
+    if snapshot is None or version is None:
+        with _snapshot_lock:
+            if _snapshot is snapshot:
+                _snapshot = (version is not None and cache.get(snapshot_key(version))) or publish_restaurant_snapshot()
+            return _snapshot
+    if snapshot.version != version and _snapshot_lock.acquire(blocking=False):
+        # Whoever holds the lock swaps the new snapshot in; the others keep quoting from the current one.
+        try:
+            published = cache.get(snapshot_key(version))
+            if published is not None:
+                _snapshot = snapshot = published
+            else:
+                # The cache dropped the published snapshot; one rebuild per version is enough.
+                schedule_restaurant_snapshot(key=f"delivery-snapshot:{version}")
+        finally:
+            _snapshot_lock.release()
+    return snapshot
+
+
+def distances_km(latitude, longitude, latitudes, longitudes, cos_latitudes):
+    """Great-circle distances from one point, in degrees, to arrays of points in radians."""
+    latitude, longitude = np.radians(float(latitude)), np.radians(float(longitude))
+    a = (
+        np.sin((latitudes - latitude) / 2) ** 2
+        + np.cos(latitude) * cos_latitudes * np.sin((longitudes - longitude) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def price_deliveries(distances, base_fees, prep_minutes):
+    """Fees, ETAs in whole minutes and a deliverable mask for arrays of great-circle distances."""
+    pricing = settings.DELIVERY_QUOTES
+    road_km = distances * pricing['road_factor']
+    fees = np.round(base_fees + np.maximum(road_km - pricing['included_km'], 0) * pricing['fee_per_km'], 2)
+    etas = np.ceil(prep_minutes + pricing['handoff_minutes'] + road_km / pricing['speed_kmh'] * 60)
+    return fees, etas.astype(np.int64), road_km <= pricing['max_km']
+
+
+def quote_deliveries(latitude, longitude, restaurant_ids=None):
+    """{restaurant_id: {'fee', 'eta_minutes', 'distance_km'}} for the restaurants that deliver there.
+
+    Without restaurant_ids every approved restaurant is quoted.
+    """
+    snapshot = restaurant_snapshot()
+    if restaurant_ids is None:
+        positions = slice(None)
+    else:
+        positions, found = snapshot.positions(restaurant_ids)
+        positions = positions[found]
+    distances = distances_km(
+        latitude, longitude,
+        snapshot.latitudes[positions], snapshot.longitudes[positions], snapshot.cos_latitudes[positions],
+    )
+    fees, etas, deliverable = price_deliveries(distances, snapshot.base_fees[positions], snapshot.prep_minutes[positions])
+    # tolist() converts whole columns at once; per-element NumPy scalars would cost more than the math.
+    return {
+        pk: {'fee': fee, 'eta_minutes': eta, 'distance_km': distance}
+        for pk, fee, eta, distance in zip(
+            snapshot.ids[positions][deliverable].tolist(), fees[deliverable].tolist(),
+            etas[deliverable].tolist(), np.round(distances[deliverable], 2).tolist(),
+        )
+    }
+
+
+def delivery_fee(restaurant, latitude, longitude):
+    """The fee to deliver from restaurant to the point, or None when it is out of range.
+
+    Priced from the given row rather than the snapshot, so checkout charges the current base fee.
+    """
+    distances = distances_km(
+        latitude, longitude,
+        np.radians([float(restaurant.latitude)]), np.radians([float(restaurant.longitude)]),
+        np.cos(np.radians([float(restaurant.latitude)])),
+    )
+    fees, _, deliverable = price_deliveries(distances, np.array([float(restaurant.delivery_price)]), np.zeros(1))
+    return Decimal(f"{fees[0]:.2f}") if deliverable[0] else None
+
+
+def refresh_prep_minutes(restaurant_ids=None):
+    """Store each restaurant's median minutes from order to ready_for_pickup over PREP_WINDOW."""
+    events = OrderEvent.objects.filter(to_state='ready_for_pickup', created_at__gte=timezone.now() - PREP_WINDOW)
+    restaurants = RestaurantProfile.objects.all()
+    if restaurant_ids is not None:
+        events = events.filter(restaurant_id__in=restaurant_ids)
+        restaurants = restaurants.filter(pk__in=restaurant_ids)
+    durations = {}
+    for restaurant_id, ready_at, ordered_at in events.values_list('restaurant_id', 'created_at', 'order__order_date'):
+        durations.setdefault(restaurant_id, []).append((ready_at - ordered_at).total_seconds() / 60)
+
+    updated = []
+    for restaurant in restaurants.only('pk', 'prep_minutes'):
+        minutes = durations.get(restaurant.pk, [])
+        # Too few orders say more about luck than about the kitchen; those use default_prep_minutes.
+        prep_minutes = round(statistics.median(minutes)) if len(minutes) >= PREP_MIN_ORDERS else None
+        if prep_minutes != restaurant.prep_minutes:
+            restaurant.prep_minutes = prep_minutes
+            updated.append(restaurant)
+    RestaurantProfile.objects.bulk_update(updated, ['prep_minutes'], batch_size=500)
+    if updated:
+        schedule_restaurant_snapshot()
+    return len(updated)
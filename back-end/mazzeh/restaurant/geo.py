@@ -0,0 +1,88 @@
+import math
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9
+EARTH_RADIUS_KM = 6371.0088
+# Along a meridian, on the same sphere haversine_km measures on, so the box never cuts the circle.
+KM_PER_DEGREE = math.radians(1) * EARTH_RADIUS_KM
+# Relative slack that keeps float rounding from pulling the box edges inside the circle.
+BOX_MARGIN = 1e-9
+MAX_COVERING_CELLS = 16
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    latitude, longitude = float(latitude), float(longitude)
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        interval, coordinate = (lng_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits = 0
+            value = 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """Return the (latitude, longitude) size in degrees of a geohash cell."""
+    lng_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """(lat_min, lat_max, lng_min, lng_max) of a box that contains the haversine circle of radius_km."""
+    latitude, longitude = float(latitude), float(longitude)
+    angle = radius_km / EARTH_RADIUS_KM
+    lat_delta = math.degrees(angle) * (1 + BOX_MARGIN)
+    # The circle is widest poleward of its centre, asin(sin(angle) / cos(latitude)) rather than angle / cos(latitude).
+    ratio = math.sin(angle) / max(math.cos(math.radians(latitude)), 1e-12)
+    lng_delta = math.degrees(math.asin(ratio)) * (1 + BOX_MARGIN) if ratio < 1 else 180.0
+    return (
+        max(latitude - lat_delta, -90.0),
+        min(latitude + lat_delta, 90.0),
+        max(longitude - lng_delta, -180.0),
+        min(longitude + lng_delta, 180.0),
+    )
+
+
+def covering_cells(box):
+    """Return the finest set of geohash prefixes (at most MAX_COVERING_CELLS) that covers the box."""
+    lat_min, lat_max, lng_min, lng_max = box
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        lat_step, lng_step = cell_size(precision)
+        rows = range(int((lat_min + 90) // lat_step), int(min(lat_max + 90, 180 - 1e-9) // lat_step) + 1)
+        columns = range(int((lng_min + 180) // lng_step), int(min(lng_max + 180, 360 - 1e-9) // lng_step) + 1)
+        if len(rows) * len(columns) <= MAX_COVERING_CELLS:
+            return sorted({
+                encode_geohash(
+                    (row + 0.5) * lat_step - 90,
+                    (column + 0.5) * lng_step - 180,
+                    precision,
+                )
+                for row in rows
+                for column in columns
+            })
+    return ['']
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (float(lat1), float(lng1), float(lat2), float(lng2)))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
@@ -0,0 +1,152 @@
+import hashlib
+import io
+import os
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from PIL import Image, ImageOps
+
+from .pages import invalidate_restaurant_pages
+
+# Bounding boxes, largest first: every variant is resized from the previous one.
+PHOTO_VARIANTS = {
+    'full': (1280, 960),
+    'card': (480, 360),
+    'thumbnail': (160, 160),
+}
+PHOTO_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+VARIANT_DIR = 'photo-variants'
+
+
+def content_hash(chunks):
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(chunk)
+    return digest.hexdigest()[:32]
+
+
+def content_hashed_path(file, folder, filename):
+    """Name an upload after its content, so identical uploads get identical names."""
+    ext = os.path.splitext(filename)[1].lower()
+    name = content_hash(file.chunks())
+    file.seek(0)
+    return f"{folder}/{name}{ext}"
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Photo storage: a file saved under a name that exists already is that file again, so it is not stored twice."""
+
+    def save(self, name, content, max_length=None):
+        # Names come from content_hashed_path; an existing file already holds exactly these bytes.
+        if name is not None and self.exists(name):
+            return name
+        return super().save(name, content, max_length)
+
+
+def _encode(image, pil_format, options):
+    if pil_format == 'JPEG' and image.mode != 'RGB':
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A') if 'A' in image.getbands() else None)
+        image = background
+    buffer = io.BytesIO()
+    # Only the color profile is kept; EXIF (camera, GPS) and other metadata are dropped.
+    image.save(buffer, pil_format, icc_profile=image.info.get('icc_profile'), **options)
+    return buffer.getvalue()
+
+
+def strip_photo_metadata(instance):
+    """Before a save: re-encode a new upload that carries EXIF, which can hold the camera and GPS position."""
+    photo = instance.photo
+    if not photo or photo._committed:
+        return
+    with Image.open(photo) as source:
+        if not source.getexif():
+            photo.seek(0)
+            return
+        pil_format = source.format
+        # The orientation tag goes with the rest, so it is applied to the pixels first.
+        image = ImageOps.exif_transpose(source)
+        buffer = io.BytesIO()
+        options = {'quality': 95} if pil_format == 'JPEG' else {}
+        image.save(buffer, pil_format, icc_profile=source.info.get('icc_profile'), **options)
+    instance.photo = ContentFile(buffer.getvalue(), name=os.path.basename(photo.name))
+
+
+def render_variants(data):
+    """Resized WebP and JPEG encodings of an image: {variant: {extension: bytes}}."""
+    largest = max(max(size) for size in PHOTO_VARIANTS.values())
+    with Image.open(io.BytesIO(data)) as source:
+        # Lets the JPEG decoder scale down while decoding; a square box survives an EXIF rotation.
+        source.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(source)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info or 'A' in image.getbands() else 'RGB')
+        rendered = {}
+        for variant, size in PHOTO_VARIANTS.items():
+            image = image.copy()
+            image.thumbnail(size, Image.Resampling.LANCZOS)
+            rendered[variant] = {
+                extension: _encode(image, pil_format, options)
+                for extension, (pil_format, options) in PHOTO_FORMATS.items()
+            }
+    return rendered
+
+
+def _store(storage, variant, extension, content):
+    name = f"{VARIANT_DIR}/{variant}/{content_hash([content])}.{extension}"
+    # Content-addressed: an existing file already holds exactly these bytes.
+    if not storage.exists(name):
+        storage.save(name, ContentFile(content))
+    return name
+
+
+def generate_photo_variants(instance):
+    """Render and store the variants of instance.photo and record them in photo_variants."""
+    photo = instance.photo
+    with photo.open('rb') as file:
+        rendered = render_variants(file.read())
+    variants = {'source': photo.name}
+    for variant, encodings in rendered.items():
+        variants[variant] = {
+            extension: _store(photo.storage, variant, extension, content)
+            for extension, content in encodings.items()
+        }
+    # update() skips the save signals; the photo filter drops the result if the photo changed meanwhile.
+    type(instance).objects.filter(pk=instance.pk, photo=photo.name).update(photo_variants=variants)
+    instance.photo_variants = variants
+    # Items belong to a restaurant; a restaurant's pages are its own.
+    invalidate_restaurant_pages(getattr(instance, 'restaurant_id', instance.pk))
+    return variants
+
+
+def photo_variants_stale(instance):
+    return instance.photo_variants.get('source') != (instance.photo.name or None)
+
+
+def generate_photo_variants_by_pk(model, pk, force=False):
+    """Job and command entry point; returns whether variants were generated."""
+    instance = model.objects.filter(pk=pk).only('pk', 'photo', 'photo_variants').first()
+    if instance is None or not instance.photo or not (force or photo_variants_stale(instance)):
+        return False
+    generate_photo_variants(instance)
+    return True
+
+
+def sync_photo_variants(instance, update_fields=None):
+    """Called after a save: queue new variants for a changed photo, forget them for a removed one."""
+    from .tasks import generate_photo_variants as generate_photo_variants_task
+
+    if update_fields is not None and 'photo' not in update_fields:
+        return
+    if not photo_variants_stale(instance):
+        return
+    model, pk = type(instance), instance.pk
+    if instance.photo:
+        # A job commits with the new photo and survives a crash that an in-process thread would not.
+        generate_photo_variants_task.enqueue(model=model._meta.label_lower, pk=pk)
+    else:
+        model.objects.filter(pk=pk).update(photo_variants={})
+        instance.photo_variants = {}
@@ -0,0 +1,92 @@
+import json
+import math
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from mazzeh.benchmarks import measure, scratch_data
+from restaurant.delivery import invalidate_delivery_quotes, quote_deliveries, restaurant_snapshot
+from restaurant.geo import haversine_km
+from restaurant.models import RestaurantProfile
+from user.models import User
+
+ORIGIN = (35.6892, 51.3890)
+
+
+def loop_quotes(latitude, longitude, restaurants):
+    """The per-restaurant Python baseline."""
+    pricing = settings.DELIVERY_QUOTES
+    quotes = {}
+    for restaurant in restaurants:
+        road_km = haversine_km(latitude, longitude, restaurant.latitude, restaurant.longitude) * pricing['road_factor']
+        if road_km > pricing['max_km']:
+            continue
+        prep = pricing['default_prep_minutes'] if restaurant.prep_minutes is None else restaurant.prep_minutes
+        quotes[restaurant.pk] = {
+            'fee': round(float(restaurant.delivery_price) + max(road_km - pricing['included_km'], 0) * pricing['fee_per_km'], 2),
+            'eta_minutes': math.ceil(prep + pricing['handoff_minutes'] + road_km / pricing['speed_kmh'] * 60),
+        }
+    return quotes
+
+
+class Command(BaseCommand):
+    help = "Compare vectorized delivery quoting with a per-restaurant Python loop."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--restaurants', type=int, default=20000)
+        parser.add_argument('--page', type=int, nargs='+', default=[20, 200, 2000], help="Restaurants quoted per call.")
+
+    def handle(self, *args, **options):
+        results = []
+        with scratch_data():
+            self.populate(options['restaurants'])
+            invalidate_delivery_quotes()
+            start = time.perf_counter()
+            restaurant_snapshot()
+            snapshot_ms = (time.perf_counter() - start) * 1000
+            restaurants = list(RestaurantProfile.objects.only('latitude', 'longitude', 'delivery_price', 'prep_minutes'))
+            rng = random.Random(0)
+            for size in options['page']:
+                page = rng.sample(restaurants, min(size, len(restaurants)))
+                ids = [restaurant.pk for restaurant in page]
+                vectorized = quote_deliveries(*ORIGIN, ids)
+                baseline = loop_quotes(*ORIGIN, page)
+                assert vectorized.keys() == baseline.keys()
+                assert all(vectorized[pk]['eta_minutes'] == baseline[pk]['eta_minutes'] for pk in ids if pk in baseline)
+                results.append({
+                    'page': len(ids),
+                    'deliverable': len(vectorized),
+                    'vectorized': measure(lambda: quote_deliveries(*ORIGIN, ids), repeat=20),
+                    'python_loop': measure(lambda: loop_quotes(*ORIGIN, page), repeat=20),
+                })
+            results.append({
+                'all_restaurants': len(restaurants),
+                'snapshot_build_ms': round(snapshot_ms, 3),
+                'vectorized': measure(lambda: quote_deliveries(*ORIGIN), repeat=20),
+            })
+        invalidate_delivery_quotes()
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def populate(self, count):
+        rng = random.Random(count)
+        managers = User.objects.bulk_create(
+            User(phone_number=f"quote{i}", role="restaurant_manager") for i in range(count)
+        )
+        RestaurantProfile.objects.bulk_create(
+            (
+                RestaurantProfile(
+                    manager=manager,
+                    name=f"Restaurant {i}",
+                    city_name="Tehran",
+                    state="approved",
+                    delivery_price=rng.choice([0, 10, 20, 30]),
+                    prep_minutes=rng.choice([None, 15, 25, 40]),
+                    latitude=round(ORIGIN[0] + rng.uniform(-0.1, 0.1), 6),
+                    longitude=round(ORIGIN[1] + rng.uniform(-0.1, 0.1), 6),
+                )
+                for i, manager in enumerate(managers)
+            ),
+            batch_size=2000,
+        )
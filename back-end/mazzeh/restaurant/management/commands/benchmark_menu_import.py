@@ -0,0 +1,31 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from mazzeh.benchmarks import measure, scratch_data
+from restaurant.menu_import import IMPORT_CHUNK_SIZE, import_menu
+from restaurant.models import RestaurantProfile
+from user.models import User
+
+
+class Command(BaseCommand):
+    help = "Measure time and queries for importing and then re-importing a large menu."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=5000)
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        count, chunk_size = options['items'], options['chunk_size']
+        rows = [
+            {'name': f"Item {i}", 'price': str(100 + i % 50), 'discount': str(i % 20), 'description': "Benchmark item"}
+            for i in range(count)
+        ]
+        results = {'items': count, 'chunk_size': chunk_size}
+        with scratch_data():
+            manager = User.objects.create(phone_number="menu-bench", role="restaurant_manager")
+            restaurant = RestaurantProfile.objects.create(manager=manager, name="Bench", city_name="Tehran")
+            for phase in ('create', 'update'):
+                results[phase] = measure(lambda: import_menu(restaurant, iter(rows), chunk_size), repeat=1)
+                results[phase]['queries_per_chunk'] = round(results[phase]['queries'] / -(-count // chunk_size), 2)
+        self.stdout.write(json.dumps(results, indent=2))
@@ -0,0 +1,67 @@
+import json
+import random
+
+from django.core.management.base import BaseCommand
+
+from mazzeh.benchmarks import measure, scratch_data
+from restaurant.geo import haversine_km
+from restaurant.models import RestaurantProfile
+from user.models import User
+
+ORIGIN = (35.6892, 51.3890)
+
+
+def brute_force_nearby(latitude, longitude, radius_km):
+    results = []
+    for restaurant in RestaurantProfile.objects.filter(state='approved'):
+        if restaurant.latitude is None or restaurant.longitude is None:
+            continue
+        restaurant.distance = haversine_km(latitude, longitude, restaurant.latitude, restaurant.longitude)
+        if restaurant.distance <= radius_km:
+            results.append(restaurant)
+    results.sort(key=lambda restaurant: restaurant.distance)
+    return results
+
+
+class Command(BaseCommand):
+    help = "Compare the geohash nearby search with a full-scan haversine baseline."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--restaurants', type=int, default=20000)
+        parser.add_argument('--radius', type=float, nargs='+', default=[1, 3, 10])
+
+    def handle(self, *args, **options):
+        results = []
+        with scratch_data():
+            self.populate(options['restaurants'])
+            indexed_query = RestaurantProfile.objects.filter(state='approved')
+            for radius in options['radius']:
+                indexed = indexed_query.nearby(*ORIGIN, radius)
+                baseline = brute_force_nearby(*ORIGIN, radius)
+                assert [r.pk for r in indexed] == [r.pk for r in baseline]
+                results.append({
+                    'radius_km': radius,
+                    'matches': len(indexed),
+                    'indexed': measure(lambda: indexed_query.nearby(*ORIGIN, radius)),
+                    'brute_force': measure(lambda: brute_force_nearby(*ORIGIN, radius)),
+                })
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def populate(self, count):
+        rng = random.Random(count)
+        managers = User.objects.bulk_create(
+            User(phone_number=f"geo{i}", role="restaurant_manager") for i in range(count)
+        )
+        restaurants = []
+        for i, manager in enumerate(managers):
+            restaurant = RestaurantProfile(
+                manager=manager,
+                name=f"Restaurant {i}",
+                city_name="Tehran",
+                state="approved",
+                latitude=round(ORIGIN[0] + rng.uniform(-1, 1), 6),
+                longitude=round(ORIGIN[1] + rng.uniform(-1, 1), 6),
+            )
+            restaurant.update_geohash()
+            restaurants.append(restaurant)
+        RestaurantProfile.objects.bulk_create(restaurants, batch_size=2000)
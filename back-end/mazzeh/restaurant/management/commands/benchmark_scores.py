@@ -0,0 +1,73 @@
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from mazzeh.benchmarks import measure, scratch_data
+from order.models import Order, OrderItem, Review
+from restaurant.models import Item, RestaurantProfile, rebuild_scores
+from user.models import User
+
+
+class Command(BaseCommand):
+    help = "Show that listing restaurants and menus with scores costs the same at any review volume."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--restaurants', type=int, default=50)
+        parser.add_argument('--items', type=int, default=20, help="Menu items per restaurant.")
+        parser.add_argument('--reviews', type=int, nargs='+', default=[100, 1000, 10000])
+
+    def handle(self, *args, **options):
+        results = []
+        for review_volume in options['reviews']:
+            with scratch_data():
+                restaurant = self.populate(options['restaurants'], options['items'], review_volume)
+                start = time.perf_counter()
+                rebuild_scores()
+                rebuild_ms = (time.perf_counter() - start) * 1000
+
+                results.append({
+                    'reviews': review_volume,
+                    'restaurant_listing': measure(
+                        lambda: [r.score for r in RestaurantProfile.objects.all()]
+                    ),
+                    'menu_listing': measure(
+                        lambda: [i.score for i in Item.objects.filter(restaurant=restaurant)]
+                    ),
+                    'rebuild_ms': round(rebuild_ms, 3),
+                })
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def populate(self, restaurant_count, item_count, review_count):
+        rng = random.Random(review_count)
+        managers = User.objects.bulk_create(
+            User(phone_number=f"b{review_count}m{i}", role="restaurant_manager")
+            for i in range(restaurant_count)
+        )
+        customer = User.objects.create(phone_number=f"b{review_count}c", role="customer")
+        restaurants = RestaurantProfile.objects.bulk_create(
+            RestaurantProfile(manager=manager, name=f"Restaurant {i}", city_name="Tehran", state="approved")
+            for i, manager in enumerate(managers)
+        )
+        items = Item.objects.bulk_create(
+            Item(restaurant=restaurant, name=f"Item {i}", price=100)
+            for restaurant in restaurants
+            for i in range(item_count)
+        )
+        orders = Order.objects.bulk_create(
+            Order(user=customer, restaurant=rng.choice(restaurants), total_price=100)
+            for _ in range(review_count)
+        )
+        menus = {}
+        for item in items:
+            menus.setdefault(item.restaurant_id, []).append(item)
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, item=rng.choice(menus[order.restaurant_id]), count=1, price=100)
+            for order in orders
+        )
+        Review.objects.bulk_create(
+            Review(user=customer, order=order, score=rng.randint(1, 5))
+            for order in orders
+        )
+        return restaurants[0]
@@ -0,0 +1,71 @@
+import json
+import random
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from mazzeh.benchmarks import measure, scratch_data
+from restaurant.models import Item, RestaurantProfile
+from restaurant.search import rebuild_search_index, search_item_ids
+from user.models import User
+
+DISHES = ["pizza", "kebab", "burger", "pasta", "salad", "sushi", "falafel", "shawarma", "soup", "steak"]
+WORDS = ["spicy", "grilled", "classic", "special", "cheese", "chicken", "beef", "vegan", "family", "mini"]
+CITIES = ["Tehran", "Shiraz", "Isfahan", "Tabriz", "Mashhad"]
+
+
+def icontains_item_ids(query, city_name, limit=20):
+    items = Item.objects.filter(state='available', restaurant__state='approved', restaurant__city_name=city_name)
+    for token in query.split():
+        items = items.filter(Q(name__icontains=token) | Q(description__icontains=token))
+    return list(items.values_list('item_id', flat=True)[:limit])
+
+
+class Command(BaseCommand):
+    help = "Measure full-text search latency over a large synthetic menu against an icontains scan."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=100000)
+        parser.add_argument('--items-per-restaurant', type=int, default=100)
+
+    def handle(self, *args, **options):
+        results = {'items': options['items']}
+        with scratch_data():
+            self.populate(options['items'], options['items_per_restaurant'])
+            results['reindex'] = measure(rebuild_search_index, repeat=1)
+            # Common words match thousands of items; the numbered query is selective, which is
+            # the worst case for an unranked scan that cannot stop early.
+            for query in ("pizza", "spicy kebab", "sha", "vegan bur", "kebab 4242"):
+                results[query] = {
+                    'fts': measure(lambda: search_item_ids(query, city_name="Tehran")),
+                    'icontains': measure(lambda: icontains_item_ids(query, "Tehran")),
+                }
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def populate(self, item_count, per_restaurant):
+        rng = random.Random(item_count)
+        restaurant_count = max(item_count // per_restaurant, 1)
+        managers = User.objects.bulk_create(
+            (User(phone_number=f"search{i}", role="restaurant_manager") for i in range(restaurant_count)),
+            batch_size=2000,
+        )
+        restaurants = RestaurantProfile.objects.bulk_create(
+            (
+                RestaurantProfile(manager=manager, name=f"{rng.choice(DISHES).title()} House {i}",
+                                  city_name=rng.choice(CITIES), state="approved")
+                for i, manager in enumerate(managers)
+            ),
+            batch_size=2000,
+        )
+        Item.objects.bulk_create(
+            (
+                Item(
+                    restaurant=restaurants[i % restaurant_count],
+                    name=f"{rng.choice(WORDS)} {rng.choice(DISHES)} {i}",
+                    description=f"{rng.choice(WORDS)} {rng.choice(WORDS)} with {rng.choice(DISHES)}",
+                    price=rng.randint(50, 500),
+                )
+                for i in range(item_count)
+            ),
+            batch_size=2000,
+        )
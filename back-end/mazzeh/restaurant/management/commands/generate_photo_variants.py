@@ -0,0 +1,43 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from restaurant.images import generate_photo_variants_by_pk
+from restaurant.models import Item, RestaurantProfile
+
+
+def generate(model, pk, force):
+    try:
+        return generate_photo_variants_by_pk(model, pk, force)
+    finally:
+        # Worker threads would otherwise each keep a connection open.
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = "Generate the resized variants of restaurant and item photos that lack current ones."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Regenerate every variant, e.g. after changing sizes.")
+        parser.add_argument('--workers', type=int, default=settings.PHOTO_VARIANT_WORKERS)
+
+    def handle(self, *args, **options):
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            for model in (RestaurantProfile, Item):
+                pks = model.objects.exclude(photo='').exclude(photo__isnull=True).values_list('pk', flat=True)
+                futures = {
+                    executor.submit(generate, model, pk, options['force']): pk
+                    for pk in pks.iterator()
+                }
+                generated = failed = 0
+                for future in as_completed(futures):
+                    if future.exception() is not None:
+                        failed += 1
+                        self.stderr.write(f"{model.__name__} {futures[future]}: {future.exception()}")
+                    elif future.result():
+                        generated += 1
+                self.stdout.write(self.style.SUCCESS(
+                    f"{model.__name__}: generated variants for {generated} of {len(futures)} photos, {failed} failed."
+                ))
@@ -0,0 +1,32 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from restaurant.menu_import import import_menu, read_csv_rows, read_json_rows
+from restaurant.models import RestaurantProfile
+
+
+class Command(BaseCommand):
+    help = "Create or update a restaurant's menu items from a CSV or JSON file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('restaurant_id', type=int)
+        parser.add_argument('path')
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        try:
+            restaurant = RestaurantProfile.objects.get(pk=options['restaurant_id'])
+        except RestaurantProfile.DoesNotExist:
+            raise CommandError(f"Restaurant {options['restaurant_id']} does not exist.")
+
+        reader = read_csv_rows if options['path'].endswith('.csv') else read_json_rows
+        with open(options['path'], 'rb') as stream:
+            report = import_menu(restaurant, reader(stream), chunk_size=options['chunk_size'])
+
+        for error in report['errors']:
+            self.stderr.write(f"Row {error['row']}: {json.dumps(error['errors'])}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {report['created']} and updated {report['updated']} items, "
+            f"{len(report['errors'])} rows rejected."
+        ))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from restaurant.models import RestaurantProfile
+
+
+class Command(BaseCommand):
+    help = "Recompute the geohash search column of every restaurant from its coordinates."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        chunk = []
+        updated = 0
+        restaurants = RestaurantProfile.objects.only('id', 'latitude', 'longitude', 'geohash')
+        for restaurant in restaurants.iterator(chunk_size=options['chunk_size']):
+            restaurant.update_geohash()
+            chunk.append(restaurant)
+            if len(chunk) == options['chunk_size']:
+                updated += RestaurantProfile.objects.bulk_update(chunk, ['geohash'])
+                chunk = []
+        if chunk:
+            updated += RestaurantProfile.objects.bulk_update(chunk, ['geohash'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt geohashes for {updated} restaurants."))
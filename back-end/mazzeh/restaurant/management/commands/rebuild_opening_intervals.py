@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from restaurant.models import OpeningInterval, RestaurantProfile
+from restaurant.schedule import invalidate_open_now, opening_intervals
+
+
+class Command(BaseCommand):
+    help = "Rebuild the open-now schedule index from every restaurant's hours and state."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        restaurants = RestaurantProfile.objects.filter(
+            state='approved', open_hour__isnull=False, close_hour__isnull=False,
+        ).values_list('id', 'city_name', 'open_hour', 'close_hour')
+
+        with transaction.atomic():
+            cities = set(OpeningInterval.objects.values_list('city_name', flat=True).distinct())
+            OpeningInterval.objects.all().delete()
+            intervals = (
+                OpeningInterval(restaurant_id=pk, city_name=city_name, start_minute=start, end_minute=end)
+                for pk, city_name, open_hour, close_hour in restaurants.iterator()
+                for start, end in opening_intervals(open_hour, close_hour)
+            )
+            OpeningInterval.objects.bulk_create(intervals, batch_size=options['chunk_size'])
+            cities.update(restaurants.values_list('city_name', flat=True).distinct())
+
+        for city_name in cities:
+            invalidate_open_now(city_name)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {OpeningInterval.objects.count()} opening intervals."))
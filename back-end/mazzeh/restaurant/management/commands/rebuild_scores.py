@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from restaurant.models import Item, RestaurantProfile, rebuild_scores
+
+
+class Command(BaseCommand):
+    help = "Recompute the stored score, review_count and score_sum of every restaurant and item."
+
+    def handle(self, *args, **options):
+        rebuild_scores()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt scores for {RestaurantProfile.objects.count()} restaurants "
+            f"and {Item.objects.count()} items."
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from restaurant.search import create_search_index, rebuild_search_index, search_enabled
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index of menu items and restaurants."
+
+    def handle(self, *args, **options):
+        if not search_enabled():
+            # The GIN indexes follow the rows by themselves; only make sure they exist.
+            create_search_index()
+            self.stdout.write("PostgreSQL keeps its search indexes current, nothing to rebuild.")
+            return
+        rebuild_search_index()
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from restaurant.delivery import refresh_prep_minutes
+
+
+class Command(BaseCommand):
+    help = "Recompute every restaurant's prep time estimate from its recent order history."
+
+    def handle(self, *args, **options):
+        updated = refresh_prep_minutes()
+        self.stdout.write(self.style.SUCCESS(f"Updated the prep time of {updated} restaurants."))
@@ -0,0 +1,112 @@
+import codecs
+import csv
+import json
+from itertools import islice
+
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
+
+from .models import Item
+from .pages import invalidate_restaurant_pages
+from .search import index_items
+from .serializers import MenuItemImportSerializer
+
+IMPORT_CHUNK_SIZE = 500
+UPSERT_FIELDS = ['price', 'discount', 'description', 'state']
+
+
+def read_csv_rows(stream):
+    yield from csv.DictReader(codecs.getreader('utf-8-sig')(stream))
+
+
+class MalformedRow:
+    """Stands in for a line of newline-delimited JSON that does not parse; it is reported like an invalid row."""
+
+    def __init__(self, message):
+        self.message = message
+
+
+def read_json_rows(stream):
+    """Accept either a JSON array or newline-delimited JSON objects; the latter is parsed line by line.
+
+    An array that does not parse raises ValueError before any row is read; a bad line only fails its row.
+    """
+    text = codecs.getreader('utf-8-sig')(stream)
+    first_line = text.readline()
+    if first_line.lstrip().startswith('['):
+        yield from json.loads(first_line + text.read())
+        return
+    for line in (first_line, *text):
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as exc:
+            yield MalformedRow(f"Malformed JSON: {exc}.")
+
+
+def _clean_row(row):
+    if not isinstance(row, dict):
+        return row
+    return {
+        key: value
+        for key, value in row.items()
+        if key in MenuItemImportSerializer.Meta.fields and value not in ('', None)
+    }
+
+
+def import_menu(restaurant, rows, chunk_size=IMPORT_CHUNK_SIZE):
+    """Upsert menu items by (restaurant, name), one transaction per chunk, collecting per-row errors.
+
+    Existing rows are read first so that fields missing from a row keep their current value.
+    """
+    report = {'created': 0, 'updated': 0, 'errors': []}
+    # One serializer instance is reused for every row so its fields are only built once.
+    serializer = MenuItemImportSerializer()
+    numbered_rows = enumerate(rows, start=1)
+    while chunk := list(islice(numbered_rows, chunk_size)):
+        _import_chunk(restaurant, serializer, chunk, report)
+    return report
+
+
+def _import_chunk(restaurant, serializer, chunk, report):
+    valid = {}
+    for row_number, row in chunk:
+        if isinstance(row, MalformedRow):
+            report['errors'].append({'row': row_number, 'errors': {api_settings.NON_FIELD_ERRORS_KEY: [row.message]}})
+            continue
+        try:
+            data = serializer.run_validation(_clean_row(row))
+        except ValidationError as exc:
+            report['errors'].append({'row': row_number, 'errors': exc.detail})
+        else:
+            valid[data['name']] = data
+
+    if not valid:
+        return
+
+    with transaction.atomic():
+        existing = {
+            item.name: item
+            for item in Item.objects.filter(restaurant=restaurant, name__in=list(valid))
+        }
+        items = []
+        for name, data in valid.items():
+            current = existing.get(name)
+            values = {field: getattr(current, field) for field in UPSERT_FIELDS} if current else {}
+            values.update(data)
+            items.append(Item(restaurant=restaurant, **values))
+
+        Item.objects.bulk_create(
+            items,
+            update_conflicts=True,
+            unique_fields=['restaurant', 'name'],
+            update_fields=UPSERT_FIELDS,
+        )
+        # bulk_create skips the save signals that keep the search index and cached pages current.
+        index_items(Item.objects.filter(restaurant=restaurant, name__in=list(valid)))
+        transaction.on_commit(lambda: invalidate_restaurant_pages(restaurant.pk))
+
+    report['created'] += len(valid) - len(existing)
+    report['updated'] += len(existing)
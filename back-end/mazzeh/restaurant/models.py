@@ -1,10 +1,18 @@
-import os
-import uuid
 from django.core.validators import FileExtensionValidator
 from django.core.exceptions import ValidationError
-from django.db import models
-from django.db.models import Avg
+from django.db import models, transaction
+from django.db.models import Case, Count, F, FloatField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, Round
+from django.db.models.lookups import GreaterThan
+from django.db.models.signals import post_delete, pre_delete, pre_save, post_save
+from django.dispatch import receiver
 from user.models import User
+from user.tokens import revoke_tokens
+from .geo import GEOHASH_PRECISION, bounding_box, covering_cells, encode_geohash, haversine_km
+from .images import ContentAddressedStorage, content_hashed_path, strip_photo_metadata, sync_photo_variants
+from .pages import invalidate_restaurant_pages
+from .schedule import invalidate_open_now, opening_intervals
+from .search import index_items, index_restaurants, unindex_item, unindex_restaurant
 from order.models import Order, OrderItem, Review
 
 
@@ -12,12 +20,42 @@ def validate_photo_size(value):
     max_size_mb = 2
     if value.size > max_size_mb * 1024 * 1024:
         raise ValidationError(f"Photo size must not exceed {max_size_mb}MB.")
-        
+
+
+class RestaurantProfileQuerySet(models.QuerySet):
+    def nearby(self, latitude, longitude, radius_km):
+        """Return the restaurants within radius_km, nearest first, each with a ``distance`` attribute."""
+        box = bounding_box(latitude, longitude, radius_km)
+        cells = models.Q()
+        for prefix in covering_cells(box):
+            # An all-'z' suffix is the largest geohash in the cell under byte and locale collations alike.
+            cells |= models.Q(geohash__gte=prefix, geohash__lte=prefix.ljust(GEOHASH_PRECISION, 'z'))
+
+        candidates = self.filter(
+            cells,
+            latitude__range=(box[0], box[1]),
+            longitude__range=(box[2], box[3]),
+        )
+        results = []
+        for restaurant in candidates:
+            restaurant.distance = haversine_km(latitude, longitude, restaurant.latitude, restaurant.longitude)
+            if restaurant.distance <= radius_km:
+                results.append(restaurant)
+        results.sort(key=lambda restaurant: restaurant.distance)
+        return results
+
+    def open_at(self, city_name, minute):
+        """Approved restaurants in city_name that are open at the given minute of the day."""
+        return self.filter(
+            opening_intervals__city_name=city_name,
+            opening_intervals__start_minute__lte=minute,
+            opening_intervals__end_minute__gt=minute,
+        )
+
+
 class RestaurantProfile(models.Model):
     def unique_image_path(instance, filename):
-        ext = filename.split('.')[-1]
-        filename = f"{uuid.uuid4()}.{ext}"
-        return os.path.join('restaurant-ptofile-images/', filename)
+        return content_hashed_path(instance.photo, 'restaurant-ptofile-images', filename)
 
     STATE_CHOICES = [
         ("pending", "PENDING"),
@@ -33,6 +71,12 @@ class RestaurantProfile(models.Model):
         ("ice_cream", "Ice Cream"),
     ]
 
+    SCHEDULE_FIELDS = ('open_hour', 'close_hour', 'state', 'city_name')
+    # The restaurant fields copied into the search index entries of its items.
+    ITEM_INDEX_FIELDS = ('state', 'city_name', 'business_type')
+    # The restaurant fields the delivery quote snapshot is built from.
+    DELIVERY_FIELDS = ('state', 'latitude', 'longitude', 'delivery_price', 'prep_minutes')
+
     manager = models.OneToOneField(
         User, 
         on_delete=models.CASCADE, 
@@ -42,7 +86,13 @@ class RestaurantProfile(models.Model):
     business_type = models.CharField(max_length=255, choices=BUSINESS_TYPES, default='restaurant')  
     city_name = models.CharField(max_length=255)  
     score = models.DecimalField(max_digits=5, decimal_places=2, default=0.0)
+    review_count = models.PositiveIntegerField(default=0)
+    score_sum = models.PositiveIntegerField(default=0)
+    # Kept by customer.services.update_favorites with F() updates, like the rating aggregates.
+    favorite_count = models.PositiveIntegerField(default=0, editable=False)
     delivery_price = models.DecimalField(max_digits=10, decimal_places=2, default=0.0)
+    # Median minutes from order to ready_for_pickup, see restaurant.delivery.refresh_prep_minutes.
+    prep_minutes = models.PositiveSmallIntegerField(null=True, blank=True, editable=False)
     address = models.TextField(blank=True, null=True) 
     description = models.TextField(blank=True, null=True)
     state = models.CharField(max_length=30, choices=STATE_CHOICES, default='pending')
@@ -50,33 +100,107 @@ class RestaurantProfile(models.Model):
     close_hour = models.TimeField(blank=True, default="23:00")
     latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    geohash = models.CharField(max_length=12, null=True, blank=True, editable=False)
     
     photo = models.ImageField(
         upload_to=unique_image_path,
+        storage=ContentAddressedStorage(),
         blank=True,
         null=True,
         validators=[
             FileExtensionValidator(allowed_extensions=['jpg', 'jpeg', 'png']),
             validate_photo_size]
     )
+    # Resized copies of photo, see restaurant.images.
+    photo_variants = models.JSONField(default=dict, blank=True, editable=False)
 
-    def calculate_score(self):
-        reviews = Review.objects.filter(order__restaurant=self)
-        avg_score = reviews.aggregate(average=Avg('score'))['average']
-        return round(avg_score, 2) if avg_score else 0.0
-    
-    @property
-    def score(self):
-        return self.calculate_score()
+    objects = RestaurantProfileQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['geohash']),
+            models.Index(fields=['city_name', '-favorite_count']),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'state' in field_names:
+            instance._loaded_state = values[field_names.index('state')]
+        if set(cls.ITEM_INDEX_FIELDS) <= set(field_names):
+            instance._loaded_item_index = tuple(values[field_names.index(field)] for field in cls.ITEM_INDEX_FIELDS)
+        if set(cls.DELIVERY_FIELDS) <= set(field_names):
+            instance._loaded_delivery = tuple(values[field_names.index(field)] for field in cls.DELIVERY_FIELDS)
+        if set(cls.SCHEDULE_FIELDS) <= set(field_names):
+            instance._loaded_schedule = instance.schedule_values()
+        return instance
+
+    def item_index_values(self):
+        return tuple(getattr(self, field) for field in self.ITEM_INDEX_FIELDS)
+
+    def delivery_values(self):
+        return tuple(getattr(self, field) for field in self.DELIVERY_FIELDS)
+
+    def schedule_values(self):
+        """What the opening intervals are built from, with the hours as minute intervals ("22:00" equals time(22))."""
+        hours = None
+        if self.open_hour is not None and self.close_hour is not None:
+            hours = tuple(opening_intervals(self.open_hour, self.close_hour))
+        return hours, self.state, self.city_name
+
+    def update_geohash(self):
+        if self.latitude is None or self.longitude is None:
+            self.geohash = None
+        else:
+            self.geohash = encode_geohash(self.latitude, self.longitude)
+
+    def sync_opening_intervals(self):
+        previous_cities = set(self.opening_intervals.values_list('city_name', flat=True))
+        self.opening_intervals.all().delete()
+        if self.state == 'approved' and self.open_hour is not None and self.close_hour is not None:
+            OpeningInterval.objects.bulk_create(
+                OpeningInterval(restaurant=self, city_name=self.city_name, start_minute=start, end_minute=end)
+                for start, end in opening_intervals(self.open_hour, self.close_hour)
+            )
+        for city_name in previous_cities | {self.city_name}:
+            transaction.on_commit(lambda city_name=city_name: invalidate_open_now(city_name))
+
+    def save(self, *args, **kwargs):
+        self.update_geohash()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'geohash'}
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if update_fields is None or set(self.SCHEDULE_FIELDS) & set(update_fields):
+                # Other edits would rebuild the intervals and drop the city's open-now listings for nothing.
+                schedule = self.schedule_values()
+                if getattr(self, '_loaded_schedule', None) != schedule:
+                    self.sync_opening_intervals()
+                    self._loaded_schedule = schedule
 
     def __str__(self):
         return f"Restaurant: {self.name} ({self.manager.phone_number})"
+
+
+class OpeningInterval(models.Model):
+    restaurant = models.ForeignKey(RestaurantProfile, on_delete=models.CASCADE, related_name='opening_intervals')
+    city_name = models.CharField(max_length=255)
+    start_minute = models.PositiveSmallIntegerField()
+    end_minute = models.PositiveSmallIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['city_name', 'start_minute', 'end_minute']),
+        ]
+
+    def __str__(self):
+        return f"{self.restaurant_id}: {self.start_minute}-{self.end_minute}"
+
     
 class Item(models.Model):
     def unique_item_image_path(instance, filename):
-        ext = filename.split('.')[-1]
-        filename = f"{uuid.uuid4()}.{ext}"
-        return os.path.join('item_images/', filename)
+        return content_hashed_path(instance.photo, 'item_images', filename)
 
     STATE_CHOICES = [
         ('available', 'Available'),
@@ -89,27 +213,190 @@ class Item(models.Model):
     discount = models.PositiveIntegerField(default=0, help_text="Discount percentage (0 to 100)")
     name = models.CharField(max_length=100)
     score = models.FloatField(default=0.0)
+    review_count = models.PositiveIntegerField(default=0)
+    score_sum = models.PositiveIntegerField(default=0)
     description = models.TextField(null=True, blank=True)
     state = models.CharField(max_length=50, choices=STATE_CHOICES, default='available')
     photo = models.ImageField(
         upload_to=unique_item_image_path,
+        storage=ContentAddressedStorage(),
         blank=True,
         null=True,
         validators=[
         FileExtensionValidator(allowed_extensions=['jpg', 'jpeg', 'png']),
         validate_photo_size]
     )
+    photo_variants = models.JSONField(default=dict, blank=True, editable=False)
 
-    def calculate_score(self):
-        order_items = OrderItem.objects.filter(item=self)
-        orders = Order.objects.filter(order_id__in=order_items.values_list('order_id', flat=True))
-        avg_score = Review.objects.filter(order__in=orders).aggregate(average=Avg('score'))['average']
-        return round(avg_score, 2) if avg_score else 0.0
-
-    @property
-    def score(self):
-        return self.calculate_score()
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['restaurant', 'name'], name='unique_item_name_per_restaurant'),
+        ]
 
     def __str__(self):
         return self.name
 
+
+def _score_expression(model, review_count, score_sum):
+    return Case(
+        When(
+            GreaterThan(review_count, 0),
+            then=Cast(
+                Round(Cast(score_sum, FloatField()) / Cast(review_count, FloatField()), 2),
+                model._meta.get_field('score'),
+            ),
+        ),
+        default=Value(0),
+        output_field=model._meta.get_field('score'),
+    )
+
+
+def apply_review_delta(order_id, count_delta, sum_delta):
+    """Shift the rating aggregates of the order's restaurant and items in place."""
+    order_items = OrderItem.objects.filter(order_id=order_id).values('item_id')
+    restaurants = RestaurantProfile.objects.filter(
+        pk__in=Order.objects.filter(order_id=order_id).values('restaurant_id')
+    )
+    items = Item.objects.filter(item_id__in=order_items)
+
+    for queryset in (restaurants, items):
+        review_count = F('review_count') + count_delta
+        score_sum = F('score_sum') + sum_delta
+        queryset.update(
+            review_count=review_count,
+            score_sum=score_sum,
+            score=_score_expression(queryset.model, review_count, score_sum),
+        )
+
+
+def _review_totals(group):
+    """Review count and score sum subqueries per outer row, reviews grouped by the given path to it."""
+    reviews = Review.objects.filter(**{group: OuterRef('pk')}).order_by().values(group)
+    return {
+        'review_count': Coalesce(Subquery(reviews.annotate(total=Count('pk')).values('total')), 0),
+        'score_sum': Coalesce(Subquery(reviews.annotate(total=Sum('score')).values('total')), 0),
+    }
+
+
+def rebuild_scores():
+    """Recompute every restaurant and item rating aggregate from the reviews table."""
+    with transaction.atomic():
+        # Checkout puts each item on one line of its order, so joining the lines counts every review once.
+        for model, group in ((RestaurantProfile, 'order__restaurant'), (Item, 'order__order_items__item')):
+            model.objects.update(**_review_totals(group))
+            model.objects.update(score=_score_expression(model, F('review_count'), F('score_sum')))
+
+
+# Not jobs: a delta is two single-row UPDATEs, and applying it in the review's transaction keeps
+# the aggregates exact, where a queued delta could be lost or applied to a later state.
+@receiver(pre_save, sender=Review)
+def review_pre_save(sender, instance, raw, **kwargs):
+    if raw or instance._state.adding:
+        return
+    previous = sender.objects.filter(pk=instance.pk).values_list('score', flat=True).first()
+    if previous is not None and previous != instance.score:
+        apply_review_delta(instance.order_id, 0, instance.score - previous)
+
+
+@receiver(post_save, sender=Review)
+def review_post_save(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        apply_review_delta(instance.order_id, 1, instance.score)
+
+
+@receiver(pre_delete, sender=Review)
+def review_pre_delete(sender, instance, **kwargs):
+    apply_review_delta(instance.order_id, -1, -instance.score)
+
+
+@receiver(post_delete, sender=RestaurantProfile)
+def restaurant_post_delete(sender, instance, **kwargs):
+    transaction.on_commit(lambda: invalidate_open_now(instance.city_name))
+
+
+@receiver(pre_save, sender=RestaurantProfile)
+@receiver(pre_save, sender=Item)
+def photo_pre_save(sender, instance, raw, **kwargs):
+    if not raw:
+        strip_photo_metadata(instance)
+
+
+@receiver(post_save, sender=RestaurantProfile)
+def restaurant_post_save(sender, instance, raw, update_fields, **kwargs):
+    if raw:
+        return
+    index_restaurants([instance])
+    sync_photo_variants(instance, update_fields)
+    # Inline, so that a rejected restaurant's items leave the search results with the rejection.
+    # Other edits, e.g. of the address, would rewrite every item's index entry for nothing.
+    index_values = instance.item_index_values()
+    if getattr(instance, '_loaded_item_index', None) != index_values:
+        index_items(instance.items.all())
+        instance._loaded_item_index = index_values
+    if hasattr(instance, '_loaded_state') and instance.state != instance._loaded_state:
+        # The manager's tokens carry the old state as a claim. Revoked in the transaction, not by a
+        # job: a rejected manager must not keep acting on the approved claim until a worker gets to it.
+        instance._loaded_state = instance.state
+        revoke_tokens(instance.manager_id)
+
+
+@receiver(post_delete, sender=RestaurantProfile)
+def restaurant_unindex(sender, instance, **kwargs):
+    unindex_restaurant(instance.pk)
+
+
+@receiver(post_save, sender=Item)
+def item_post_save(sender, instance, raw, update_fields, **kwargs):
+    if not raw:
+        index_items(Item.objects.filter(pk=instance.pk))
+        sync_photo_variants(instance, update_fields)
+
+
+@receiver(post_delete, sender=Item)
+def item_post_delete(sender, instance, **kwargs):
+    unindex_item(instance.pk)
+
+
+@receiver(post_save, sender=RestaurantProfile)
+@receiver(post_delete, sender=RestaurantProfile)
+def restaurant_invalidate_pages(sender, instance, raw=False, **kwargs):
+    if not raw:
+        restaurant_id = instance.pk
+        transaction.on_commit(lambda: invalidate_restaurant_pages(restaurant_id))
+
+
+@receiver(post_save, sender=RestaurantProfile)
+def restaurant_refresh_delivery_quotes(sender, instance, raw, **kwargs):
+    if raw:
+        return
+    # Other edits, e.g. of the name, would rebuild every process's snapshot for nothing.
+    values = instance.delivery_values()
+    if getattr(instance, '_loaded_delivery', None) != values:
+        from .delivery import schedule_restaurant_snapshot
+
+        schedule_restaurant_snapshot()
+        instance._loaded_delivery = values
+
+
+@receiver(post_delete, sender=RestaurantProfile)
+def restaurant_delete_delivery_quotes(sender, instance, **kwargs):
+    from .delivery import schedule_restaurant_snapshot
+
+    schedule_restaurant_snapshot()
+
+
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
+def item_invalidate_pages(sender, instance, raw=False, **kwargs):
+    if not raw:
+        restaurant_id = instance.restaurant_id
+        transaction.on_commit(lambda: invalidate_restaurant_pages(restaurant_id))
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def review_invalidate_pages(sender, instance, raw=False, **kwargs):
+    # Reviews move the scores shown on the restaurant's profile and menu.
+    if not raw:
+        restaurant_id = Order.objects.filter(order_id=instance.order_id).values_list('restaurant_id', flat=True).first()
+        transaction.on_commit(lambda: invalidate_restaurant_pages(restaurant_id))
@@ -0,0 +1,143 @@
+"""
+Cached public restaurant pages: the profile and the menu of one restaurant.
+
+Page keys contain a per-restaurant version. The save and delete signals of RestaurantProfile,
+Item and Review replace it once their transaction commits, which makes every cached page of the
+restaurant unreachable at once; writes that skip the signals must call invalidate_restaurant_pages.
+Each entry carries an ETag and a Last-Modified time, so clients revalidate with 304 Not Modified.
+Pages are rendered from the primary: a lagging replica would cache stale pages until they expire.
+
+A popular page that expires is refreshed by one request while the others keep serving it for up to
+PAGE_STALE_GRACE seconds. A page that is missing altogether, e.g. just after a write, is rendered by
+one request while the others wait up to PAGE_LOCK_WAIT seconds for it before rendering it themselves.
+acached_page does the same for async views; its waits sleep on the event loop instead of a thread.
+"""
+import asyncio
+import hashlib
+import json
+import time
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+PAGE_CACHE_TIMEOUT = 300
+PAGE_STALE_GRACE = 60
+PAGE_LOCK_TIMEOUT = 10
+PAGE_LOCK_WAIT = 2.0
+PAGE_LOCK_POLL = 0.05
+
+
+def _version_key(restaurant_id):
+    return f"restaurant-pages-version:{restaurant_id}"
+
+
+def _page_key(restaurant_id, version, page):
+    return f"restaurant-pages:{restaurant_id}:{version}:{page}"
+
+
+def page_cache_key(restaurant_id, page):
+    return _page_key(restaurant_id, cache.get_or_set(_version_key(restaurant_id), time.time_ns, None), page)
+
+
+async def apage_cache_key(restaurant_id, page):
+    return _page_key(restaurant_id, await cache.aget_or_set(_version_key(restaurant_id), time.time_ns, None), page)
+
+
+def invalidate_restaurant_pages(restaurant_id):
+    cache.set(_version_key(restaurant_id), time.time_ns(), None)
+
+
+def _entry(data, previous):
+    etag = quote_etag(hashlib.md5(
+        json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True).encode(), usedforsecurity=False,
+    ).hexdigest())
+    # A refresh that changes nothing keeps the old time, so If-Modified-Since still matches.
+    last_modified = previous['last_modified'] if previous and previous['etag'] == etag else int(time.time())
+    return {'data': data, 'etag': etag, 'last_modified': last_modified, 'expires': time.time() + PAGE_CACHE_TIMEOUT}
+
+
+def _wait_for(key):
+    deadline = time.monotonic() + PAGE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(PAGE_LOCK_POLL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+    return None
+
+
+def cached_page(restaurant_id, page, render):
+    """The cache entry of a page, calling render() for its data when it is missing or expired.
+
+    render() returns None for a restaurant that is not public; that is cached like any other page.
+    """
+    key = page_cache_key(restaurant_id, page)
+    entry = cache.get(key)
+    if entry is not None and entry['expires'] > time.time():
+        return entry
+    lock_key = f"{key}:lock"
+    # add() only succeeds for one caller, even across processes with a shared backend.
+    locked = cache.add(lock_key, True, PAGE_LOCK_TIMEOUT)
+    if not locked:
+        if entry is not None:
+            return entry
+        entry = _wait_for(key)
+        if entry is not None:
+            return entry
+    try:
+        entry = _entry(render(), entry)
+        cache.set(key, entry, PAGE_CACHE_TIMEOUT + PAGE_STALE_GRACE)
+    finally:
+        if locked:
+            cache.delete(lock_key)
+    return entry
+
+
+async def _await_for(key):
+    deadline = time.monotonic() + PAGE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(PAGE_LOCK_POLL)
+        entry = await cache.aget(key)
+        if entry is not None:
+            return entry
+    return None
+
+
+async def acached_page(restaurant_id, page, render):
+    """cached_page for async views; render is a coroutine function."""
+    key = await apage_cache_key(restaurant_id, page)
+    entry = await cache.aget(key)
+    if entry is not None and entry['expires'] > time.time():
+        return entry
+    lock_key = f"{key}:lock"
+    locked = await cache.aadd(lock_key, True, PAGE_LOCK_TIMEOUT)
+    if not locked:
+        if entry is not None:
+            return entry
+        entry = await _await_for(key)
+        if entry is not None:
+            return entry
+    try:
+        entry = _entry(await render(), entry)
+        await cache.aset(key, entry, PAGE_CACHE_TIMEOUT + PAGE_STALE_GRACE)
+    finally:
+        if locked:
+            await cache.adelete(lock_key)
+    return entry
+
+
+def page_response(request, entry, response_class=Response):
+    """A 200 response for the entry, or 304 Not Modified when the client's copy is current.
+
+    Views that are not DRF views pass a response_class such as JsonResponse.
+    """
+    conditional = get_conditional_response(request, etag=entry['etag'], last_modified=entry['last_modified'])
+    response = conditional or response_class(entry['data'])
+    response['ETag'] = entry['etag']
+    response['Last-Modified'] = http_date(entry['last_modified'])
+    # Clients and proxies may keep the page but must revalidate it before every use.
+    response['Cache-Control'] = 'public, no-cache'
+    return response
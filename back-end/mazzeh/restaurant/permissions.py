@@ -0,0 +1,20 @@
+from rest_framework.permissions import BasePermission
+from .models import RestaurantProfile
+
+
+class IsRestaurantManager(BasePermission):
+    message = "Only restaurant managers can perform this action."
+
+    def has_permission(self, request, view):
+        return bool(
+            request.user
+            and request.user.is_authenticated
+            and request.user.role == "restaurant_manager"
+        )
+
+
+def managed_restaurant_id(user):
+    """The manager's restaurant id, read from the token claims when the request user carries them."""
+    if hasattr(user, 'restaurant_id'):
+        return user.restaurant_id
+    return RestaurantProfile.objects.filter(manager_id=user.pk).values_list('id', flat=True).first()
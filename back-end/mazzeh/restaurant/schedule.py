@@ -0,0 +1,49 @@
+import time
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.dateparse import parse_time
+
+MINUTES_PER_DAY = 24 * 60
+OPEN_NOW_CACHE_TIMEOUT = 60
+
+
+def minute_of_day(value):
+    if isinstance(value, str):
+        value = parse_time(value)
+    return value.hour * 60 + value.minute
+
+
+def current_minute():
+    """The minute of the day on the restaurants' wall clock, in settings.RESTAURANT_TIME_ZONE."""
+    return minute_of_day(timezone.localtime(timezone=ZoneInfo(settings.RESTAURANT_TIME_ZONE)))
+
+
+def opening_intervals(open_hour, close_hour):
+    """Split daily opening hours into [start, end) minute intervals that never cross midnight."""
+    start, end = minute_of_day(open_hour), minute_of_day(close_hour)
+    if start == end:
+        return [(0, MINUTES_PER_DAY)]
+    if start < end:
+        return [(start, end)]
+    return [(start, MINUTES_PER_DAY), (0, end)]
+
+
+def _version_key(city_name):
+    return f"open-now-version:{city_name}"
+
+
+def open_now_cache_key(city_name, minute):
+    version = cache.get_or_set(_version_key(city_name), time.time_ns, None)
+    return f"open-now:{city_name}:{version}:{minute}"
+
+
+async def aopen_now_cache_key(city_name, minute):
+    version = await cache.aget_or_set(_version_key(city_name), time.time_ns, None)
+    return f"open-now:{city_name}:{version}:{minute}"
+
+
+def invalidate_open_now(city_name):
+    cache.set(_version_key(city_name), time.time_ns(), None)
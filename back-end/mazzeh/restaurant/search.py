@@ -0,0 +1,176 @@
+import hashlib
+import re
+
+from django.db import connection, connections, router
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+
+ITEM_INDEX = 'restaurant_item_fts'
+RESTAURANT_INDEX = 'restaurant_restaurantprofile_fts'
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Filters are stored as opaque tokens in a third "tags" column so that MATCH narrows the
+# candidates by city, business type and availability before anything is ranked or joined.
+LIVE_TAG = 'live'
+RANK_WEIGHTS = '10.0, 1.0, 0.0'
+
+# PostgreSQL searches this expression through a GIN index on it, which stays current by itself.
+# ts_rank weighs A ten times D by default, as RANK_WEIGHTS does for FTS5.
+SEARCH_DOCUMENT = (
+    "setweight(to_tsvector('simple', coalesce({table}name, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce({table}description, '')), 'D')"
+)
+SEARCH_TABLES = {ITEM_INDEX: 'restaurant_item', RESTAURANT_INDEX: 'restaurant_restaurantprofile'}
+
+
+def search_enabled():
+    """Whether the FTS5 tables are kept; PostgreSQL searches the GIN indexes instead."""
+    return connection.vendor == 'sqlite'
+
+
+def _tag(kind, value):
+    return kind + hashlib.md5(value.encode()).hexdigest()[:12]
+
+
+def _tags(live, city_name, business_type):
+    tags = [_tag('c', city_name or ''), _tag('t', business_type or '')]
+    if live:
+        tags.append(LIVE_TAG)
+    return ' '.join(tags)
+
+
+def create_search_index(**kwargs):
+    """Create the FTS5 tables or GIN indexes; connected to post_migrate since the project has no committed migrations."""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            for index, table in SEARCH_TABLES.items():
+                cursor.execute(
+                    f"CREATE INDEX IF NOT EXISTS {index} ON {table} USING gin (({SEARCH_DOCUMENT.format(table='')}))"
+                )
+    if not search_enabled():
+        return
+    with connection.cursor() as cursor:
+        for table in (ITEM_INDEX, RESTAURANT_INDEX):
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5("
+                "name, description, tags, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            )
+
+
+def match_expression(query, city_name=None, business_type=None):
+    """
+    Build an FTS5 query where every word must appear in the name or description, the last
+    one as a prefix so that partially typed words match, restricted to live entries.
+    """
+    tokens = TOKEN_RE.findall(query)
+    if not tokens:
+        return None
+    words = ' '.join(f'"{token}"' for token in tokens) + '*'
+    tags = [LIVE_TAG]
+    if city_name:
+        tags.append(_tag('c', city_name))
+    if business_type:
+        tags.append(_tag('t', business_type))
+    return f"{{name description}} : ({words}) AND tags : ({' '.join(tags)})"
+
+
+def _replace(table, rows):
+    if not rows or not search_enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {table} WHERE rowid = %s", [(row[0],) for row in rows])
+        cursor.executemany(f"INSERT INTO {table} (rowid, name, description, tags) VALUES (%s, %s, %s, %s)", rows)
+
+
+def _remove(table, pk):
+    if search_enabled():
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {table} WHERE rowid = %s", [pk])
+
+
+def index_items(queryset):
+    rows = queryset.values_list(
+        'item_id', 'name', 'description', 'state',
+        'restaurant__state', 'restaurant__city_name', 'restaurant__business_type',
+    )
+    _replace(ITEM_INDEX, [
+        (pk, name, description or '', _tags(state == 'available' and restaurant_state == 'approved', city_name, business_type))
+        for pk, name, description, state, restaurant_state, city_name, business_type in rows
+    ])
+
+
+def index_restaurants(restaurants):
+    _replace(RESTAURANT_INDEX, [
+        (r.pk, r.name, r.description or '', _tags(r.state == 'approved', r.city_name, r.business_type))
+        for r in restaurants
+    ])
+
+
+def unindex_item(pk):
+    _remove(ITEM_INDEX, pk)
+
+
+def unindex_restaurant(pk):
+    _remove(RESTAURANT_INDEX, pk)
+
+
+def rebuild_search_index(chunk_size=5000):
+    from .models import Item, RestaurantProfile
+
+    if not search_enabled():
+        return
+    create_search_index()
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {ITEM_INDEX}")
+        cursor.execute(f"DELETE FROM {RESTAURANT_INDEX}")
+    last_pk = 0
+    while ids := list(Item.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:chunk_size]):
+        index_items(Item.objects.filter(pk__in=ids))
+        last_pk = ids[-1]
+    index_restaurants(RestaurantProfile.objects.only('id', 'name', 'description', 'state', 'city_name', 'business_type'))
+
+
+def _postgres_ids(queryset, restaurant_prefix, query, city_name, business_type, limit):
+    tokens = TOKEN_RE.findall(query)
+    if not tokens:
+        return []
+    # Every word must appear, the last one as a prefix, like match_expression.
+    ts_query = ' & '.join(tokens) + ':*'
+    document = SEARCH_DOCUMENT.format(table=f'"{queryset.model._meta.db_table}".')
+    filters = {f'{restaurant_prefix}state': 'approved'}
+    if city_name:
+        filters[f'{restaurant_prefix}city_name'] = city_name
+    if business_type:
+        filters[f'{restaurant_prefix}business_type'] = business_type
+    matches = RawSQL(f"({document}) @@ to_tsquery('simple', %s)", [ts_query], output_field=BooleanField())
+    rank = RawSQL(f"ts_rank({document}, to_tsquery('simple', %s))", [ts_query], output_field=FloatField())
+    queryset = queryset.filter(matches, **filters).annotate(rank=rank).order_by('-rank', 'pk')
+    return list(queryset.values_list('pk', flat=True)[:limit])
+
+
+def _search(model, table, query, city_name, business_type, limit):
+    expression = match_expression(query, city_name, business_type)
+    if expression is None:
+        return []
+    with connections[router.db_for_read(model)].cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {table} WHERE {table} MATCH %s ORDER BY bm25({table}, {RANK_WEIGHTS}) LIMIT %s",
+            [expression, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_item_ids(query, city_name=None, business_type=None, limit=20):
+    """Ranked ids of available items of approved restaurants matching the query."""
+    from .models import Item
+    if not search_enabled():
+        return _postgres_ids(Item.objects.filter(state='available'), 'restaurant__', query, city_name, business_type, limit)
+    return _search(Item, ITEM_INDEX, query, city_name, business_type, limit)
+
+
+def search_restaurant_ids(query, city_name=None, business_type=None, limit=20):
+    """Ranked ids of approved restaurants matching the query."""
+    from .models import RestaurantProfile
+    if not search_enabled():
+        return _postgres_ids(RestaurantProfile.objects.all(), '', query, city_name, business_type, limit)
+    return _search(RestaurantProfile, RESTAURANT_INDEX, query, city_name, business_type, limit)
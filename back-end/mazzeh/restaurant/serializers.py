@@ -0,0 +1,92 @@
+from django.core.files.storage import default_storage
+from rest_framework import serializers
+from .models import Item, RestaurantProfile
+
+
+class PhotoVariantsField(serializers.ReadOnlyField):
+    """URLs of the resized photos: {"thumbnail": {"webp": url, "jpg": url}, "card": ..., "full": ...}."""
+
+    def to_representation(self, variants):
+        request = self.context.get('request')
+        urls = {}
+        for variant, names in variants.items():
+            if variant == 'source':
+                continue
+            urls[variant] = {
+                extension: request.build_absolute_uri(default_storage.url(name)) if request else default_storage.url(name)
+                for extension, name in names.items()
+            }
+        return urls
+
+
+class ThumbnailField(PhotoVariantsField):
+    """URLs of the thumbnail variant only: {"webp": url, "jpg": url}, or null without a photo."""
+
+    def to_representation(self, variants):
+        return super().to_representation(variants).get('thumbnail')
+
+
+class RestaurantProfileSerializer(serializers.ModelSerializer):
+    photos = PhotoVariantsField(source='photo_variants')
+
+    class Meta:
+        model = RestaurantProfile
+        fields = [
+            'id', 'name', 'business_type', 'city_name', 'score', 'review_count', 'delivery_price',
+            'address', 'description', 'open_hour', 'close_hour', 'latitude', 'longitude', 'photo', 'photos',
+        ]
+
+
+class LovedRestaurantSerializer(RestaurantProfileSerializer):
+    class Meta(RestaurantProfileSerializer.Meta):
+        fields = RestaurantProfileSerializer.Meta.fields + ['favorite_count']
+
+
+class NearbyRestaurantSerializer(RestaurantProfileSerializer):
+    distance = serializers.FloatField(read_only=True)
+    # Null when the restaurant does not deliver to the customer.
+    delivery_fee = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True, allow_null=True)
+    delivery_eta_minutes = serializers.IntegerField(read_only=True, allow_null=True)
+
+    class Meta(RestaurantProfileSerializer.Meta):
+        fields = RestaurantProfileSerializer.Meta.fields + ['distance', 'delivery_fee', 'delivery_eta_minutes']
+
+
+class DeliveryQuoteSerializer(serializers.Serializer):
+    restaurant_id = serializers.IntegerField()
+    fee = serializers.DecimalField(max_digits=10, decimal_places=2)
+    eta_minutes = serializers.IntegerField()
+    distance_km = serializers.FloatField()
+
+
+class ItemSerializer(serializers.ModelSerializer):
+    photos = PhotoVariantsField(source='photo_variants')
+
+    class Meta:
+        model = Item
+        fields = ['item_id', 'restaurant', 'name', 'description', 'price', 'discount', 'score', 'review_count', 'state', 'photo', 'photos']
+
+
+class SearchResultItemSerializer(ItemSerializer):
+    restaurant_name = serializers.CharField(source='restaurant.name', read_only=True)
+
+    class Meta(ItemSerializer.Meta):
+        fields = ItemSerializer.Meta.fields + ['restaurant_name']
+
+
+class SearchQuerySerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=100)
+    city_name = serializers.CharField(required=False)
+    business_type = serializers.ChoiceField(choices=RestaurantProfile.BUSINESS_TYPES, required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=20)
+
+
+class MenuItemImportSerializer(serializers.ModelSerializer):
+    discount = serializers.IntegerField(min_value=0, max_value=100, required=False)
+
+    class Meta:
+        model = Item
+        fields = ['name', 'price', 'discount', 'description', 'state']
+        extra_kwargs = {
+            'price': {'min_value': 0},
+        }
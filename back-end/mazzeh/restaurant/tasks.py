@@ -0,0 +1,19 @@
+from django.apps import apps
+
+from jobs.queue import task
+from . import delivery, images
+
+
+@task(name='restaurant.refresh_prep_minutes')
+def refresh_prep_minutes(restaurant_id):
+    delivery.refresh_prep_minutes([restaurant_id])
+
+
+@task(name='restaurant.build_restaurant_snapshot')
+def build_restaurant_snapshot():
+    delivery.publish_restaurant_snapshot()
+
+
+@task(name='restaurant.generate_photo_variants')
+def generate_photo_variants(model, pk):
+    images.generate_photo_variants_by_pk(apps.get_model(model), pk)
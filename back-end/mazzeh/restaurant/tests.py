@@ -1,3 +1,520 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import tempfile
 
-# Create your tests here.
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from customer.models import CustomerProfile
+from jobs.models import Job
+from jobs.queue import work
+from order.models import Order, OrderEvent, OrderItem, Review
+from user.models import User
+from .delivery import quote_deliveries, refresh_prep_minutes
+from .geo import EARTH_RADIUS_KM, MAX_COVERING_CELLS, bounding_box, covering_cells, encode_geohash, haversine_km
+from .images import content_hash, generate_photo_variants, photo_variants_stale
+from .menu_import import import_menu
+from .models import Item, RestaurantProfile, rebuild_scores
+from .pages import cached_page, page_cache_key
+from .schedule import current_minute, opening_intervals
+from .search import search_item_ids, search_restaurant_ids
+from .serializers import ItemSerializer
+
+
+def jpeg_with_exif(size=(2000, 1500)):
+    image = Image.new('RGB', size, 'orange')
+    exif = Image.Exif()
+    exif[0x0112] = 6  # Orientation: rotate 90 degrees clockwise.
+    exif[0x010F] = "Camera maker"
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', exif=exif)
+    return buffer.getvalue()
+
+
+class PhotoVariantTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        manager = User.objects.create_user("09120000001", "pass", role="restaurant_manager")
+        self.restaurant = RestaurantProfile.objects.create(manager=manager, name="Mazzeh", city_name="Tehran")
+
+    def make_item(self, name, content):
+        return Item.objects.create(
+            restaurant=self.restaurant, name=name, price=100,
+            photo=SimpleUploadedFile("dish.jpg", content, content_type="image/jpeg"),
+        )
+
+    def test_variants_are_resized_stripped_and_content_addressed(self):
+        content = jpeg_with_exif()
+        item = self.make_item("Kabab", content)
+        self.assertTrue(photo_variants_stale(item))
+
+        variants = generate_photo_variants(item)
+
+        storage = item.photo.storage
+        for variant, box in (('full', (1280, 960)), ('card', (480, 360)), ('thumbnail', (160, 160))):
+            for extension, pil_format in (('webp', 'WEBP'), ('jpg', 'JPEG')):
+                with storage.open(variants[variant][extension]) as file, Image.open(file) as image:
+                    self.assertEqual(image.format, pil_format)
+                    # Portrait after applying the EXIF rotation, within the box.
+                    self.assertLess(image.width, image.height)
+                    self.assertLessEqual(image.height, max(box))
+                    self.assertFalse(image.getexif())
+
+        item.refresh_from_db()
+        self.assertFalse(photo_variants_stale(item))
+        with item.photo.open('rb') as file:
+            stored = file.read()
+        self.assertEqual(item.photo.name, f"item_images/{content_hash([stored])}.jpg")
+        # The original is stored without its EXIF, already rotated.
+        with Image.open(io.BytesIO(stored)) as image:
+            self.assertFalse(image.getexif())
+            self.assertEqual(image.size, (1500, 2000))
+
+    def test_saving_a_photo_queues_its_variants(self):
+        item = self.make_item("Kabab", jpeg_with_exif((800, 600)))
+        self.assertTrue(photo_variants_stale(item))
+        self.assertEqual(work(burst=True)['failed'], 0)
+        item.refresh_from_db()
+        self.assertFalse(photo_variants_stale(item))
+        self.assertEqual(set(item.photo_variants), {'source', 'full', 'card', 'thumbnail'})
+
+    def test_same_photo_reuses_variant_files(self):
+        content = jpeg_with_exif((800, 600))
+        first = generate_photo_variants(self.make_item("Kabab", content))
+        second = generate_photo_variants(self.make_item("Kabab 2", content))
+        self.assertEqual(first, second)
+        self.assertEqual(first['source'], Item.objects.get(name="Kabab").photo.name)
+        self.assertEqual(len(os.listdir(os.path.join(self.media_root, 'item_images'))), 1)
+
+        item = Item.objects.get(name="Kabab")
+        photos = ItemSerializer(item).data['photos']
+        self.assertEqual(set(photos), {'full', 'card', 'thumbnail'})
+        self.assertTrue(photos['card']['webp'].startswith('/media/photo-variants/card/'))
+
+
+class RestaurantPageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        manager = User.objects.create_user("09120000001", "pass", role="restaurant_manager")
+        self.customer = User.objects.create_user("09120000002", "pass")
+        self.restaurant = RestaurantProfile.objects.create(
+            manager=manager, name="Mazzeh", city_name="Tehran", state="approved",
+        )
+        self.item = Item.objects.create(restaurant=self.restaurant, name="Kabab", price=100)
+        self.client = APIClient()
+        self.url = f'/api/restaurant/{self.restaurant.pk}/menu'
+
+    def test_menu_is_cached_and_revalidated_with_etags(self):
+        first = self.client.get(self.url)
+        self.assertEqual([item['name'] for item in first.data], ["Kabab"])
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(self.url)
+            not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(cached.data, first.data)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], first['ETag'])
+        self.assertEqual(
+            self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified']).status_code, 304,
+        )
+
+    def test_item_and_review_changes_invalidate_the_pages(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.price = 120
+            self.item.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['price'], '120.00')
+
+        profile_url = f'/api/restaurant/{self.restaurant.pk}'
+        self.assertEqual(self.client.get(profile_url).data['review_count'], 0)
+        order = Order.objects.create(user=self.customer, restaurant=self.restaurant, total_price=100)
+        with self.captureOnCommitCallbacks(execute=True):
+            Review.objects.create(user=self.customer, order=order, score=4)
+        self.assertEqual(self.client.get(profile_url).data['review_count'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            RestaurantProfile.objects.get(pk=self.restaurant.pk).delete()
+        self.assertEqual(self.client.get(profile_url).status_code, 404)
+
+    def test_async_views_serve_the_same_pages(self):
+        first = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(f'/api/restaurant/async/{self.restaurant.pk}/menu')
+        self.assertEqual(response.json(), first.json())
+        self.assertEqual(response['ETag'], first['ETag'])
+        not_modified = self.client.get(f'/api/restaurant/async/{self.restaurant.pk}/menu', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(self.client.get('/api/restaurant/async/0/menu').status_code, 404)
+
+        self.restaurant.open_hour, self.restaurant.close_hour = "00:00", "00:00"
+        self.restaurant.save()
+        open_now = self.client.get('/api/restaurant/async/open-now', {'city_name': "Tehran"})
+        self.assertEqual([restaurant['id'] for restaurant in open_now.json()], [self.restaurant.pk])
+        self.assertEqual(open_now.json(), self.client.get('/api/restaurant/open-now', {'city_name': "Tehran"}).json())
+        self.assertEqual(self.client.get('/api/restaurant/async/open-now').status_code, 400)
+
+    def test_expired_page_is_refreshed_by_one_caller(self):
+        render = mock.Mock(return_value={'name': "Mazzeh"})
+        cached_page(self.restaurant.pk, 'profile', render)
+        key = page_cache_key(self.restaurant.pk, 'profile')
+        cache.set(key, {**cache.get(key), 'expires': 0})
+
+        # While another caller holds the refresh lock, the expired page is served as is.
+        cache.add(f"{key}:lock", True)
+        self.assertEqual(cached_page(self.restaurant.pk, 'profile', render)['data'], {'name': "Mazzeh"})
+        self.assertEqual(render.call_count, 1)
+
+        cache.delete(f"{key}:lock")
+        cached_page(self.restaurant.pk, 'profile', render)
+        self.assertEqual(render.call_count, 2)
+
+
+class ReviewScoreTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        manager = User.objects.create_user("09120000001", "pass", role="restaurant_manager")
+        self.restaurant = RestaurantProfile.objects.create(manager=manager, name="Mazzeh", city_name="Tehran")
+        self.kabab = Item.objects.create(restaurant=self.restaurant, name="Kabab", price=100)
+        self.rice = Item.objects.create(restaurant=self.restaurant, name="Rice", price=50)
+        self.orders = []
+        for number, items in enumerate([(self.kabab, self.rice), (self.kabab,)]):
+            customer = User.objects.create_user(f"0912000001{number}", "pass")
+            order = Order.objects.create(user=customer, restaurant=self.restaurant, total_price=100)
+            OrderItem.objects.bulk_create([OrderItem(order=order, item=item, count=1, price=item.price) for item in items])
+            self.orders.append(order)
+
+    def review(self, order, score):
+        return Review.objects.create(user=order.user, order=order, score=score)
+
+    def aggregates(self):
+        restaurant = RestaurantProfile.objects.values_list('review_count', 'score_sum', 'score').get(pk=self.restaurant.pk)
+        items = Item.objects.order_by('name').values_list('review_count', 'score_sum', 'score')
+        return [(count, total, float(score)) for count, total, score in [restaurant, *items]]
+
+    def test_reviews_shift_the_aggregates(self):
+        first = self.review(self.orders[0], 5)
+        second = self.review(self.orders[1], 2)
+        # Restaurant, then Kabab and Rice.
+        self.assertEqual(self.aggregates(), [(2, 7, 3.5), (2, 7, 3.5), (1, 5, 5.0)])
+
+        second.score = 4
+        second.save()
+        self.assertEqual(self.aggregates(), [(2, 9, 4.5), (2, 9, 4.5), (1, 5, 5.0)])
+        second.description = "Still good"
+        second.save()
+        self.assertEqual(self.aggregates(), [(2, 9, 4.5), (2, 9, 4.5), (1, 5, 5.0)])
+
+        first.delete()
+        self.assertEqual(self.aggregates(), [(1, 4, 4.0), (1, 4, 4.0), (0, 0, 0.0)])
+
+    def test_rebuild_scores_agrees_with_the_signals(self):
+        self.review(self.orders[0], 3)
+        second = self.review(self.orders[1], 4)
+        second.score = 1
+        second.save()
+        expected = self.aggregates()
+        self.assertEqual(expected, [(2, 4, 2.0), (2, 4, 2.0), (1, 3, 3.0)])
+
+        RestaurantProfile.objects.update(review_count=0, score_sum=0, score=0)
+        Item.objects.update(review_count=7, score_sum=30, score=4.3)
+        rebuild_scores()
+        self.assertEqual(self.aggregates(), expected)
+
+
+class OpeningHoursTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        manager = User.objects.create_user("09120000001", "pass", role="restaurant_manager")
+        self.restaurant = RestaurantProfile.objects.create(
+            manager=manager, name="Night Owl", city_name="Tehran", state="approved", open_hour="22:00", close_hour="02:00",
+        )
+        self.client = APIClient()
+
+    def open_now(self, hour, minute=0):
+        with mock.patch('restaurant.views.current_minute', return_value=hour * 60 + minute):
+            response = self.client.get('/api/restaurant/open-now', {'city_name': "Tehran"})
+        return [restaurant['name'] for restaurant in response.data]
+
+    def test_intervals_split_at_midnight(self):
+        self.assertEqual(opening_intervals("09:00", "23:00"), [(540, 1380)])
+        self.assertEqual(opening_intervals("22:00", "02:00"), [(1320, 1440), (0, 120)])
+        self.assertEqual(opening_intervals("00:00", "00:00"), [(0, 1440)])
+
+    def test_overnight_and_all_day_hours(self):
+        self.assertEqual(
+            list(self.restaurant.opening_intervals.order_by('start_minute').values_list('start_minute', 'end_minute')),
+            [(0, 120), (1320, 1440)],
+        )
+        for hour, minute in ((22, 0), (23, 59), (0, 0), (1, 59)):
+            self.assertEqual(self.open_now(hour, minute), ["Night Owl"])
+        for hour, minute in ((2, 0), (12, 0), (21, 59)):
+            self.assertEqual(self.open_now(hour, minute), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.restaurant.open_hour = self.restaurant.close_hour = "00:00"
+            self.restaurant.save(update_fields=['open_hour', 'close_hour'])
+        for hour in (0, 12, 23):
+            self.assertEqual(self.open_now(hour), ["Night Owl"])
+
+    def test_open_now_cache_follows_hour_and_state_changes(self):
+        self.assertEqual(self.open_now(23), ["Night Owl"])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.open_now(23), ["Night Owl"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.restaurant.close_hour = "22:30"
+            self.restaurant.save(update_fields=['close_hour'])
+        self.assertEqual(self.open_now(23), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.restaurant.close_hour = "03:00"
+            self.restaurant.save(update_fields=['close_hour'])
+        self.assertEqual(self.open_now(23), ["Night Owl"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.restaurant.state = "rejected"
+            self.restaurant.save(update_fields=['state'])
+        self.assertEqual(self.open_now(23), [])
+        self.assertFalse(self.restaurant.opening_intervals.exists())
+
+    def test_other_edits_keep_the_intervals_and_the_cache(self):
+        restaurant = RestaurantProfile.objects.get(pk=self.restaurant.pk)
+        intervals = set(restaurant.opening_intervals.values_list('pk', flat=True))
+        self.assertEqual(self.open_now(23), ["Night Owl"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            restaurant.description = "Open late"
+            restaurant.open_hour = "22:00"
+            restaurant.save()
+        self.assertEqual(set(restaurant.opening_intervals.values_list('pk', flat=True)), intervals)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.open_now(23), ["Night Owl"])
+
+    @override_settings(RESTAURANT_TIME_ZONE='Asia/Tehran')
+    def test_now_is_read_on_the_restaurants_wall_clock(self):
+        # 20:00 UTC is 23:30 in Tehran.
+        with mock.patch('django.utils.timezone.now', return_value=datetime(2026, 3, 1, 20, 0, tzinfo=dt_timezone.utc)):
+            self.assertEqual(current_minute(), 23 * 60 + 30)
+
+
+class MenuImportTests(TestCase):
+    url = '/api/restaurant/menu/import'
+
+    def setUp(self):
+        cache.clear()
+        self.manager = User.objects.create_user("09120000001", "pass", role="restaurant_manager")
+        self.restaurant = RestaurantProfile.objects.create(manager=self.manager, name="Mazzeh", city_name="Tehran")
+        Item.objects.create(restaurant=self.restaurant, name="Kabab", price=100, description="Grilled")
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+
+    def menu(self):
+        return {item.name: (item.price, item.discount, item.description) for item in Item.objects.filter(restaurant=self.restaurant)}
+
+    def test_csv_import_upserts_by_name_and_reports_bad_rows(self):
+        body = "name,price,discount\nKabab,120,10\nSoup,50,\nSalad,-1,\n"
+        response = self.client.post(self.url, body, content_type='text/csv')
+        self.assertEqual((response.data['created'], response.data['updated']), (1, 1))
+        self.assertEqual([error['row'] for error in response.data['errors']], [3])
+        # Fields missing from a row keep their current values.
+        self.assertEqual(self.menu(), {"Kabab": (120, 10, "Grilled"), "Soup": (50, 0, None)})
+
+    def test_json_array_import(self):
+        body = '[{"name": "Soup", "price": 50}, {"name": "Tea", "price": 20, "state": "unavailable"}]'
+        response = self.client.post(self.url, body, content_type='application/json')
+        self.assertEqual((response.data['created'], response.data['errors']), (2, []))
+        self.assertEqual(Item.objects.get(restaurant=self.restaurant, name="Tea").state, 'unavailable')
+
+        self.assertEqual(self.client.post(self.url, '[{"name": "Soup"', content_type='application/json').status_code, 400)
+
+    def test_bad_ndjson_line_is_reported_without_stopping_the_import(self):
+        body = '{"name": "Soup", "price": 50}\n{"name": "Tea", price: 20}\n\n{"name": "Bread", "price": 10}\n'
+        with mock.patch('restaurant.views.import_menu', wraps=lambda restaurant, rows: import_menu(restaurant, rows, chunk_size=1)):
+            response = self.client.post(self.url, body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([error['row'] for error in response.data['errors']], [2])
+        self.assertIn("Malformed JSON", str(response.data['errors'][0]['errors']))
+        self.assertEqual(set(self.menu()), {"Kabab", "Soup", "Bread"})
+
+
+class SearchTests(TestCase):
+    """Runs on the FTS5 tables with SQLite and on the GIN indexes with MAZZEH_DB_ENGINE=postgresql."""
+
+    def setUp(self):
+        manager = User.objects.create_user("09120000001", "pass", role="restaurant_manager")
+        self.restaurant = RestaurantProfile.objects.create(
+            manager=manager, name="Kabab House", city_name="Tehran", state="approved", description="Grill and stew",
+        )
+        self.kabab = Item.objects.create(restaurant=self.restaurant, name="Kabab Koobideh", price=100)
+        self.stew = Item.objects.create(restaurant=self.restaurant, name="Stew", description="Served with kabab", price=90)
+
+    def test_name_matches_rank_first_and_the_last_word_is_a_prefix(self):
+        self.assertEqual(search_item_ids("kabab"), [self.kabab.pk, self.stew.pk])
+        self.assertEqual(search_item_ids("koob"), [self.kabab.pk])
+        self.assertEqual(search_item_ids("kabab koo"), [self.kabab.pk])
+        self.assertEqual(search_item_ids("kabab", city_name="Shiraz"), [])
+        self.assertEqual(search_restaurant_ids("gril"), [self.restaurant.pk])
+
+    def test_item_changes_and_deletes_update_the_index(self):
+        self.kabab.name = "Joojeh"
+        self.kabab.save()
+        self.assertEqual(search_item_ids("koobideh"), [])
+        self.assertEqual(search_item_ids("joojeh"), [self.kabab.pk])
+
+        self.kabab.state = 'unavailable'
+        self.kabab.save()
+        self.assertEqual(search_item_ids("joojeh"), [])
+        self.stew.delete()
+        self.assertEqual(search_item_ids("stew"), [])
+
+    def test_items_are_reindexed_only_when_their_restaurant_fields_change(self):
+        restaurant = RestaurantProfile.objects.get(pk=self.restaurant.pk)
+        with mock.patch('restaurant.models.index_items') as index_items:
+            restaurant.address = "Valiasr St."
+            restaurant.save()
+        index_items.assert_not_called()
+
+        restaurant.state = 'rejected'
+        restaurant.save()
+        self.assertEqual(search_item_ids("kabab"), [])
+        self.assertEqual(search_restaurant_ids("kabab"), [])
+
+
+def offset(latitude, longitude, north_km=0.0, east_km=0.0):
+    """A point the given distances away along the meridian and the parallel, to six decimals like the model."""
+    return (
+        round(latitude + math.degrees(north_km / EARTH_RADIUS_KM), 6),
+        round(longitude + math.degrees(east_km / (EARTH_RADIUS_KM * math.cos(math.radians(latitude)))), 6),
+    )
+
+
+class NearbyTests(TestCase):
+    origin = (35.7, 51.4)
+
+    def restaurant(self, name, latitude, longitude, state='approved'):
+        manager = User.objects.create_user(f"0913{RestaurantProfile.objects.count():07d}", "pass", role="restaurant_manager")
+        return RestaurantProfile.objects.create(
+            manager=manager, name=name, city_name="Tehran", state=state, latitude=latitude, longitude=longitude,
+        )
+
+    def test_restaurants_on_the_radius_boundary_are_found(self):
+        inside_north = self.restaurant("North", *offset(*self.origin, north_km=9.995))
+        inside_south = self.restaurant("South", *offset(*self.origin, north_km=-9.995))
+        outside = self.restaurant("Far north", *offset(*self.origin, north_km=10.01))
+        for latitude in (35.7, 70.0):
+            origin = (latitude, 51.4)
+            east = self.restaurant(f"East {latitude}", *offset(*origin, east_km=9.99))
+            self.assertIn(east, RestaurantProfile.objects.nearby(*origin, 10))
+
+        found = RestaurantProfile.objects.nearby(*self.origin, 10)
+        self.assertEqual({inside_north, inside_south} & set(found), {inside_north, inside_south})
+        self.assertNotIn(outside, found)
+        self.assertTrue(all(restaurant.distance <= 10 for restaurant in found))
+
+    def test_covering_cells_cover_the_whole_box(self):
+        for latitude, radius_km in ((35.7, 0.2), (35.7, 10), (70.0, 50), (-33.9, 3)):
+            box = bounding_box(latitude, 51.4, radius_km)
+            cells = covering_cells(box)
+            self.assertLessEqual(len(cells), MAX_COVERING_CELLS)
+            for i in range(11):
+                for j in range(11):
+                    point = (box[0] + (box[1] - box[0]) * i / 10, box[2] + (box[3] - box[2]) * j / 10)
+                    self.assertTrue(encode_geohash(*point).startswith(tuple(cells)), (latitude, radius_km, point))
+
+    def test_nearby_view_lists_approved_restaurants_nearest_first(self):
+        far = self.restaurant("Far", *offset(*self.origin, east_km=4))
+        near = self.restaurant("Near", *offset(*self.origin, north_km=1))
+        self.restaurant("Pending", *offset(*self.origin, north_km=0.5), state='pending')
+        self.restaurant("Too far", *offset(*self.origin, north_km=6))
+        customer = User.objects.create_user("09120000001", "pass")
+        client = APIClient()
+        client.force_authenticate(customer)
+
+        self.assertEqual(client.get('/api/restaurant/nearby').status_code, 400)
+        CustomerProfile.objects.create(user=customer, latitude=self.origin[0], longitude=self.origin[1])
+        response = client.get('/api/restaurant/nearby', {'radius': 5})
+        self.assertEqual([row['id'] for row in response.data], [near.pk, far.pk])
+        self.assertAlmostEqual(response.data[0]['distance'], 1, places=2)
+        self.assertEqual(len(client.get('/api/restaurant/nearby', {'radius': 5, 'limit': 1}).data), 1)
+        self.assertEqual(client.get('/api/restaurant/nearby', {'radius': 51}).status_code, 400)
+
+
+class DeliveryQuoteTests(TestCase):
+    origin = (35.7, 51.4)
+
+    def setUp(self):
+        cache.clear()
+        self.restaurants = [
+            RestaurantProfile.objects.create(
+                manager=User.objects.create_user(f"0913000000{i}", "pass", role="restaurant_manager"),
+                name=f"Restaurant {i}", city_name="Tehran", state="approved", delivery_price=30,
+                latitude=self.origin[0] + offset, longitude=self.origin[1],
+            )
+            for i, offset in enumerate((0.005, 0.05, 1.0))
+        ]
+
+    def test_fees_and_etas_grow_with_distance_and_prep_time(self):
+        near, middle, far = self.restaurants
+        customer = User.objects.create_user("09120000001", "pass")
+        for _ in range(5):
+            order = Order.objects.create(user=customer, restaurant=middle, total_price=100)
+            event = OrderEvent.objects.create(order=order, restaurant=middle, from_state='preparing', to_state='ready_for_pickup')
+            OrderEvent.objects.filter(pk=event.pk).update(created_at=order.order_date + timedelta(minutes=32))
+        self.assertEqual(refresh_prep_minutes(), 1)
+
+        quotes = quote_deliveries(*self.origin, [far.pk, middle.pk, near.pk, 0])
+
+        self.assertEqual(set(quotes), {near.pk, middle.pk})
+        self.assertEqual(quotes[near.pk]['fee'], 30)
+        self.assertEqual(quotes[near.pk]['eta_minutes'], 20 + 5 + 2)
+        road_km = haversine_km(*self.origin, middle.latitude, middle.longitude) * 1.3
+        self.assertEqual(quotes[middle.pk]['fee'], round(30 + (road_km - 2) * 5, 2))
+        self.assertEqual(quotes[middle.pk]['eta_minutes'], math.ceil(32 + 5 + road_km / 25 * 60))
+
+    def test_quotes_follow_restaurant_changes(self):
+        near = self.restaurants[0]
+        self.assertIn(near.pk, quote_deliveries(*self.origin))
+        queued = Job.objects.count()
+        near = RestaurantProfile.objects.get(pk=near.pk)
+        near.name = "Renamed"
+        near.save()
+        self.assertEqual(Job.objects.count(), queued)
+
+        near.state = 'rejected'
+        near.save()
+        # The current snapshot is served until the queued job publishes the next one.
+        with self.assertNumQueries(0):
+            self.assertIn(near.pk, quote_deliveries(*self.origin))
+        work(burst=True)
+        with self.assertNumQueries(0):
+            self.assertNotIn(near.pk, quote_deliveries(*self.origin))
+
+    def test_listing_quotes_use_the_customer_location(self):
+        customer = User.objects.create_user("09120000001", "pass")
+        CustomerProfile.objects.create(user=customer, latitude=self.origin[0], longitude=self.origin[1])
+        client = APIClient()
+        client.force_authenticate(customer)
+
+        ids = ','.join(str(restaurant.pk) for restaurant in reversed(self.restaurants))
+        response = client.get(f'/api/restaurant/delivery-quotes?restaurant_ids={ids}')
+        self.assertEqual([row['restaurant_id'] for row in response.data], [r.pk for r in reversed(self.restaurants[:2])])
+        self.assertEqual(response.data[1]['fee'], '30.00')
+
+        response = client.get('/api/restaurant/nearby?radius=10')
+        self.assertEqual([(row['delivery_fee'], row['delivery_eta_minutes']) for row in response.data][:1], [('30.00', 27)])
@@ -0,0 +1,19 @@
+from django.urls import path
+from .views import (
+    AsyncOpenNowRestaurantsView, AsyncRestaurantMenuView, DeliveryQuotesView, MenuImportView, MostLovedRestaurantsView,
+    NearbyRestaurantsView, OpenNowRestaurantsView, RestaurantDetailView, RestaurantMenuView, SearchView,
+)
+
+urlpatterns = [
+    path('nearby', NearbyRestaurantsView.as_view(), name='restaurant_nearby'),
+    path('open-now', OpenNowRestaurantsView.as_view(), name='restaurant_open_now'),
+    path('delivery-quotes', DeliveryQuotesView.as_view(), name='restaurant_delivery_quotes'),
+    path('most-loved', MostLovedRestaurantsView.as_view(), name='restaurant_most_loved'),
+    path('menu/import', MenuImportView.as_view(), name='restaurant_menu_import'),
+    path('search', SearchView.as_view(), name='restaurant_search'),
+    path('<int:restaurant_id>', RestaurantDetailView.as_view(), name='restaurant_detail'),
+    path('<int:restaurant_id>/menu', RestaurantMenuView.as_view(), name='restaurant_menu'),
+    # Async variants of the busiest reads, for clients served through mazzeh.asgi.
+    path('async/open-now', AsyncOpenNowRestaurantsView.as_view(), name='restaurant_open_now_async'),
+    path('async/<int:restaurant_id>/menu', AsyncRestaurantMenuView.as_view(), name='restaurant_menu_async'),
+]
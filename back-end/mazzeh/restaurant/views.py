@@ -1,3 +1,333 @@
-from django.shortcuts import render
+import asyncio
 
-# Create your views here.
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from drf_yasg.utils import swagger_auto_schema
+from drf_yasg import openapi
+from customer.models import CustomerProfile
+from mazzeh.asynchronous import alist, json_response, serialize
+from mazzeh.routers import ReplicaReadMixin
+from .menu_import import read_csv_rows, read_json_rows, import_menu
+from .delivery import quote_deliveries
+from .models import Item, RestaurantProfile
+from .pages import acached_page, cached_page, page_response
+from .permissions import IsRestaurantManager, managed_restaurant_id
+from .schedule import OPEN_NOW_CACHE_TIMEOUT, aopen_now_cache_key, current_minute, open_now_cache_key
+from .search import search_item_ids, search_restaurant_ids
+from .serializers import (
+    DeliveryQuoteSerializer, ItemSerializer, LovedRestaurantSerializer, NearbyRestaurantSerializer, RestaurantProfileSerializer,
+    SearchQuerySerializer, SearchResultItemSerializer,
+)
+
+MAX_NEARBY_RADIUS_KM = 50
+MAX_NEARBY_RESULTS = 200
+MAX_MOST_LOVED_RESULTS = 100
+
+
+class NearbyRestaurantsView(ReplicaReadMixin, APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary="Nearby restaurants",
+        operation_description="Lists approved restaurants around the customer's saved location, nearest first.",
+        manual_parameters=[
+            openapi.Parameter('radius', openapi.IN_QUERY, type=openapi.TYPE_NUMBER, description="Search radius in kilometers (default 5, max 50)."),
+            openapi.Parameter('business_type', openapi.IN_QUERY, type=openapi.TYPE_STRING, description="Only return this business type."),
+            openapi.Parameter('city_name', openapi.IN_QUERY, type=openapi.TYPE_STRING, description="Only return restaurants in this city."),
+            openapi.Parameter('limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description="Maximum number of results (default 50, max 200)."),
+        ],
+        responses={
+            200: NearbyRestaurantSerializer(many=True),
+            400: openapi.Response("Invalid input or missing location", examples={"application/json": {"error": "Customer location is not set."}}),
+        }
+    )
+
+    def get(self, request):
+        try:
+            radius = float(request.query_params.get('radius', 5))
+            limit = int(request.query_params.get('limit', 50))
+        except ValueError:
+            return Response({"error": "radius and limit must be numbers."}, status=status.HTTP_400_BAD_REQUEST)
+        if not 0 < radius <= MAX_NEARBY_RADIUS_KM or not 0 < limit <= MAX_NEARBY_RESULTS:
+            return Response({"error": "radius or limit is out of range."}, status=status.HTTP_400_BAD_REQUEST)
+
+        profile = CustomerProfile.objects.filter(user_id=request.user.id).only('latitude', 'longitude').first()
+        if profile is None or profile.latitude is None or profile.longitude is None:
+            return Response({"error": "Customer location is not set."}, status=status.HTTP_400_BAD_REQUEST)
+
+        restaurants = RestaurantProfile.objects.filter(state='approved')
+        if 'business_type' in request.query_params:
+            restaurants = restaurants.filter(business_type=request.query_params['business_type'])
+        if 'city_name' in request.query_params:
+            restaurants = restaurants.filter(city_name=request.query_params['city_name'])
+
+        nearby = restaurants.nearby(profile.latitude, profile.longitude, radius)[:limit]
+        quotes = quote_deliveries(profile.latitude, profile.longitude, [restaurant.pk for restaurant in nearby])
+        for restaurant in nearby:
+            quote = quotes.get(restaurant.pk, {})
+            restaurant.delivery_fee, restaurant.delivery_eta_minutes = quote.get('fee'), quote.get('eta_minutes')
+        return Response(NearbyRestaurantSerializer(nearby, many=True).data)
+
+
+class DeliveryQuotesView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary="Delivery quotes",
+        operation_description=(
+            "Distance-based delivery fees and ETAs from restaurants to the customer's saved location. "
+            "Quotes the given restaurants, or the fastest ones when restaurant_ids is omitted. "
+            "Restaurants that do not deliver to the customer are left out."
+        ),
+        manual_parameters=[
+            openapi.Parameter('restaurant_ids', openapi.IN_QUERY, type=openapi.TYPE_STRING, description="Comma-separated restaurant ids, at most 200."),
+            openapi.Parameter('limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description="Maximum number of results without restaurant_ids (default 50, max 200)."),
+        ],
+        responses={
+            200: DeliveryQuoteSerializer(many=True),
+            400: openapi.Response("Invalid input or missing location", examples={"application/json": {"error": "Customer location is not set."}}),
+        }
+    )
+
+    def get(self, request):
+        try:
+            restaurant_ids = [int(pk) for pk in request.query_params.get('restaurant_ids', '').split(',') if pk.strip()]
+            limit = int(request.query_params.get('limit', 50))
+        except ValueError:
+            return Response({"error": "restaurant_ids and limit must be numbers."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(restaurant_ids) > MAX_NEARBY_RESULTS or not 0 < limit <= MAX_NEARBY_RESULTS:
+            return Response({"error": "Too many restaurants requested."}, status=status.HTTP_400_BAD_REQUEST)
+
+        profile = CustomerProfile.objects.filter(user_id=request.user.id).only('latitude', 'longitude').first()
+        if profile is None or profile.latitude is None or profile.longitude is None:
+            return Response({"error": "Customer location is not set."}, status=status.HTTP_400_BAD_REQUEST)
+
+        quotes = quote_deliveries(profile.latitude, profile.longitude, restaurant_ids or None)
+        if restaurant_ids:
+            rows = [{'restaurant_id': pk, **quotes[pk]} for pk in dict.fromkeys(restaurant_ids) if pk in quotes]
+        else:
+            rows = sorted(
+                ({'restaurant_id': pk, **quote} for pk, quote in quotes.items()),
+                key=lambda row: (row['eta_minutes'], row['restaurant_id']),
+            )[:limit]
+        return Response(DeliveryQuoteSerializer(rows, many=True).data)
+
+
+class OpenNowRestaurantsView(ReplicaReadMixin, APIView):
+
+    @swagger_auto_schema(
+        operation_summary="Open restaurants",
+        operation_description="Lists approved restaurants in a city that are open right now.",
+        manual_parameters=[
+            openapi.Parameter('city_name', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=True, description="City to list restaurants for."),
+        ],
+        responses={
+            200: RestaurantProfileSerializer(many=True),
+            400: openapi.Response("Missing city", examples={"application/json": {"error": "city_name is required."}}),
+        }
+    )
+
+    def get(self, request):
+        city_name = request.query_params.get('city_name')
+        if not city_name:
+            return Response({"error": "city_name is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        minute = current_minute()
+        cache_key = open_now_cache_key(city_name, minute)
+        data = cache.get(cache_key)
+        if data is None:
+            restaurants = RestaurantProfile.objects.open_at(city_name, minute).order_by('-score', 'id')
+            data = RestaurantProfileSerializer(restaurants, many=True).data
+            cache.set(cache_key, data, OPEN_NOW_CACHE_TIMEOUT)
+        return Response(data)
+
+
+class MostLovedRestaurantsView(ReplicaReadMixin, APIView):
+
+    @swagger_auto_schema(
+        operation_summary="Most loved restaurants",
+        operation_description="Approved restaurants in a city ranked by how many customers saved them as a favorite.",
+        manual_parameters=[
+            openapi.Parameter('city_name', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=True, description="City to rank restaurants in."),
+            openapi.Parameter('limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description="Maximum number of results (default 20, max 100)."),
+        ],
+        responses={
+            200: LovedRestaurantSerializer(many=True),
+            400: openapi.Response("Invalid input", examples={"application/json": {"error": "city_name is required."}}),
+        }
+    )
+
+    def get(self, request):
+        city_name = request.query_params.get('city_name')
+        if not city_name:
+            return Response({"error": "city_name is required."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(request.query_params.get('limit', 20))
+        except ValueError:
+            return Response({"error": "limit must be a number."}, status=status.HTTP_400_BAD_REQUEST)
+        if not 0 < limit <= MAX_MOST_LOVED_RESULTS:
+            return Response({"error": "limit is out of range."}, status=status.HTTP_400_BAD_REQUEST)
+
+        restaurants = (
+            RestaurantProfile.objects.filter(city_name=city_name, state='approved')
+            .order_by('-favorite_count', '-score', 'id')[:limit]
+        )
+        return Response(LovedRestaurantSerializer(restaurants, many=True).data)
+
+
+CONDITIONAL_GET_PARAMETERS = [
+    openapi.Parameter('If-None-Match', openapi.IN_HEADER, type=openapi.TYPE_STRING, description="ETag of the copy the client has."),
+    openapi.Parameter('If-Modified-Since', openapi.IN_HEADER, type=openapi.TYPE_STRING, description="Last-Modified of the copy the client has."),
+]
+
+
+class RestaurantDetailView(APIView):
+
+    @swagger_auto_schema(
+        operation_summary="Restaurant profile",
+        operation_description="An approved restaurant's public profile, served from the cache with an ETag and Last-Modified.",
+        manual_parameters=CONDITIONAL_GET_PARAMETERS,
+        responses={
+            200: RestaurantProfileSerializer,
+            304: openapi.Response("The client's copy is current"),
+            404: openapi.Response("Not found", examples={"application/json": {"error": "Restaurant not found."}}),
+        }
+    )
+
+    def get(self, request, restaurant_id):
+        def render():
+            restaurant = RestaurantProfile.objects.filter(pk=restaurant_id, state='approved').first()
+            return RestaurantProfileSerializer(restaurant).data if restaurant else None
+
+        entry = cached_page(restaurant_id, 'profile', render)
+        if entry['data'] is None:
+            return Response({"error": "Restaurant not found."}, status=status.HTTP_404_NOT_FOUND)
+        return page_response(request, entry)
+
+
+class RestaurantMenuView(APIView):
+
+    @swagger_auto_schema(
+        operation_summary="Restaurant menu",
+        operation_description="Every item on an approved restaurant's menu, served from the cache with an ETag and Last-Modified.",
+        manual_parameters=CONDITIONAL_GET_PARAMETERS,
+        responses={
+            200: ItemSerializer(many=True),
+            304: openapi.Response("The client's copy is current"),
+            404: openapi.Response("Not found", examples={"application/json": {"error": "Restaurant not found."}}),
+        }
+    )
+
+    def get(self, request, restaurant_id):
+        def render():
+            if not RestaurantProfile.objects.filter(pk=restaurant_id, state='approved').exists():
+                return None
+            return ItemSerializer(Item.objects.filter(restaurant_id=restaurant_id).order_by('item_id'), many=True).data
+
+        entry = cached_page(restaurant_id, 'menu', render)
+        if entry['data'] is None:
+            return Response({"error": "Restaurant not found."}, status=status.HTTP_404_NOT_FOUND)
+        return page_response(request, entry)
+
+
+class AsyncOpenNowRestaurantsView(ReplicaReadMixin, View):
+    """OpenNowRestaurantsView as an async view, for clients served through mazzeh.asgi; shares its cache."""
+
+    async def get(self, request):
+        city_name = request.GET.get('city_name')
+        if not city_name:
+            return JsonResponse({"error": "city_name is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        minute = current_minute()
+        cache_key = await aopen_now_cache_key(city_name, minute)
+        data = await cache.aget(cache_key)
+        if data is None:
+            restaurants = await alist(RestaurantProfile.objects.open_at(city_name, minute).order_by('-score', 'id'))
+            data = await serialize(RestaurantProfileSerializer, restaurants, many=True)
+            await cache.aset(cache_key, data, OPEN_NOW_CACHE_TIMEOUT)
+        return json_response(data)
+
+
+class AsyncRestaurantMenuView(View):
+    """RestaurantMenuView as an async view, for clients served through mazzeh.asgi; shares its cache."""
+
+    async def get(self, request, restaurant_id):
+        async def render():
+            approved, items = await asyncio.gather(
+                RestaurantProfile.objects.filter(pk=restaurant_id, state='approved').aexists(),
+                alist(Item.objects.filter(restaurant_id=restaurant_id).order_by('item_id')),
+            )
+            return await serialize(ItemSerializer, items, many=True) if approved else None
+
+        entry = await acached_page(restaurant_id, 'menu', render)
+        if entry['data'] is None:
+            return JsonResponse({"error": "Restaurant not found."}, status=status.HTTP_404_NOT_FOUND)
+        return page_response(request, entry, json_response)
+
+
+class MenuImportView(APIView):
+    permission_classes = [IsRestaurantManager]
+
+    @swagger_auto_schema(
+        operation_summary="Bulk import menu items",
+        operation_description=(
+            "Creates or updates the manager's menu items by name from a CSV body (Content-Type: text/csv) "
+            "or a JSON array / newline-delimited JSON body. Columns: name, price, discount, description, state. "
+            "Invalid rows are reported and skipped without aborting the import."
+        ),
+        request_body=openapi.Schema(type=openapi.TYPE_STRING, description="CSV or JSON menu rows."),
+        responses={
+            200: openapi.Response("Import report", examples={"application/json": {"created": 2, "updated": 1, "errors": [{"row": 3, "errors": {"price": ["A valid number is required."]}}]}}),
+            400: openapi.Response("Malformed payload", examples={"application/json": {"error": "Malformed payload."}}),
+        }
+    )
+
+    def post(self, request):
+        restaurant = RestaurantProfile.objects.filter(pk=managed_restaurant_id(request.user)).first()
+        if restaurant is None:
+            return Response({"error": "Restaurant profile not found."}, status=status.HTTP_404_NOT_FOUND)
+        if request.stream is None:
+            return Response({"error": "Empty payload."}, status=status.HTTP_400_BAD_REQUEST)
+
+        reader = read_csv_rows if request.content_type.startswith('text/csv') else read_json_rows
+        try:
+            report = import_menu(restaurant, reader(request.stream))
+        except (ValueError, UnicodeDecodeError):
+            return Response({"error": "Malformed payload."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_200_OK)
+
+
+class SearchView(ReplicaReadMixin, APIView):
+
+    @swagger_auto_schema(
+        operation_summary="Search dishes and restaurants",
+        operation_description="Ranked prefix search over available menu items and approved restaurants.",
+        query_serializer=SearchQuerySerializer,
+        responses={
+            200: openapi.Response("Search results", examples={"application/json": {"items": [], "restaurants": []}}),
+            400: openapi.Response("Invalid input"),
+        }
+    )
+
+    def get(self, request):
+        serializer = SearchQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        filters = dict(serializer.validated_data)
+        query = filters.pop('q')
+        item_ids = search_item_ids(query, **filters)
+        restaurant_ids = search_restaurant_ids(query, **filters)
+        items = Item.objects.select_related('restaurant').in_bulk(item_ids)
+        restaurants = RestaurantProfile.objects.in_bulk(restaurant_ids)
+        return Response({
+            "items": SearchResultItemSerializer([items[pk] for pk in item_ids if pk in items], many=True).data,
+            "restaurants": RestaurantProfileSerializer(
+                [restaurants[pk] for pk in restaurant_ids if pk in restaurants], many=True,
+            ).data,
+        })
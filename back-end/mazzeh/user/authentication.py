@@ -0,0 +1,68 @@
+from asgiref.sync import sync_to_async
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication, JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from .tokens import TOKEN_VERSION_CLAIM, current_token_version
+
+
+class ClaimsUser(TokenUser):
+    """Request user built from the signed token claims instead of the users table."""
+
+    @cached_property
+    def role(self):
+        return self.token.get('role')
+
+    @cached_property
+    def restaurant_id(self):
+        return self.token.get('restaurant_id')
+
+    @cached_property
+    def restaurant_state(self):
+        return self.token.get('state')
+
+
+def token_revoked():
+    return AuthenticationFailed("Token has been revoked.", code="token_revoked")
+
+
+class ClaimsJWTAuthentication(JWTStatelessUserAuthentication):
+    """
+    Authenticates from the token alone. The only lookup is the user's token
+    version, which is served from the cache and bumped on password and
+    restaurant state changes.
+    """
+
+    def get_user(self, validated_token):
+        super().get_user(validated_token)
+        user = ClaimsUser(validated_token)
+        version = current_token_version(user.id)
+        if version is None or validated_token.get(TOKEN_VERSION_CLAIM) != version:
+            raise token_revoked()
+        return user
+
+
+class RevocableJWTAuthentication(JWTAuthentication):
+    """Loads the full user row, for views that need it (e.g. to check a password)."""
+
+    def get_user(self, validated_token):
+        user = super().get_user(validated_token)
+        if validated_token.get(TOKEN_VERSION_CLAIM) != user.token_version:
+            raise token_revoked()
+        return user
+
+
+async def aauthenticate_request(request, query_token=False):
+    """The ClaimsUser of a plain async Django view's request, or None when it is not authenticated.
+
+    With query_token, the access token may also come as ?token=, for clients that cannot set headers.
+    """
+    authentication = ClaimsJWTAuthentication()
+    try:
+        if query_token and 'token' in request.GET:
+            validated_token = authentication.get_validated_token(request.GET['token'])
+            return await sync_to_async(authentication.get_user)(validated_token)
+        result = await sync_to_async(authentication.authenticate)(request)
+    except (AuthenticationFailed, InvalidToken):
+        return None
+    return result[0] if result else None
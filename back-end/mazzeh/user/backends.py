@@ -0,0 +1,23 @@
+from django.contrib.auth import backends, get_user_model
+from .hashers import amake_password
+
+UserModel = get_user_model()
+
+
+class ModelBackend(backends.ModelBackend):
+    """Django's ModelBackend with the password hashing of async logins kept off the event loop."""
+
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = await UserModel._default_manager.aget_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Hash anyway so unknown phone numbers take as long as wrong passwords.
+            await amake_password(password)
+            return None
+        if await user.acheck_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
@@ -0,0 +1,46 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class TunedHasherMixin:
+    """Takes the cost parameters from settings.PASSWORD_HASHER_PARAMS[algorithm]."""
+
+    def __init__(self):
+        super().__init__()
+        for name, value in settings.PASSWORD_HASHER_PARAMS.get(self.algorithm, {}).items():
+            setattr(self, name, value)
+
+
+class Argon2PasswordHasher(TunedHasherMixin, hashers.Argon2PasswordHasher):
+    pass
+
+
+class ScryptPasswordHasher(TunedHasherMixin, hashers.ScryptPasswordHasher):
+    pass
+
+
+class PBKDF2PasswordHasher(TunedHasherMixin, hashers.PBKDF2PasswordHasher):
+    pass
+
+
+@lru_cache(maxsize=None)
+def hashing_executor():
+    # hashlib and argon2-cffi release the GIL, so threads hash in parallel.
+    return ThreadPoolExecutor(max_workers=settings.PASSWORD_HASHING_WORKERS, thread_name_prefix='password-hashing')
+
+
+async def run_hashing(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(hashing_executor(), func, *args)
+
+
+async def amake_password(password):
+    return await run_hashing(hashers.make_password, password)
+
+
+async def averify_password(password, encoded):
+    """verify_password() off the event loop: (is_correct, must_update)."""
+    return await run_hashing(hashers.verify_password, password, encoded)
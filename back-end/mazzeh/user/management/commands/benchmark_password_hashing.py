@@ -0,0 +1,74 @@
+import asyncio
+import importlib.util
+import itertools
+import json
+import time
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth import aauthenticate
+from django.contrib.auth.hashers import get_hasher, make_password
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory
+
+from mazzeh.benchmarks import measure, scratch_data
+from user.models import User
+from user.views import CustomTokenObtainPairView, CustomerSignUpView
+
+PASSWORD = "bench-Passw0rd!"
+
+
+class Command(BaseCommand):
+    help = "Measure signup and token throughput per core for each configured password hasher."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--concurrency', type=int, default=settings.PASSWORD_HASHING_WORKERS,
+                            help="Concurrent async logins, to check hashing scales off the event loop.")
+
+    def handle(self, *args, **options):
+        self.phone_numbers = (f"bench{i}" for i in itertools.count())
+        results = {'cpu_count': settings.PASSWORD_HASHING_WORKERS}
+        for hasher in settings.PASSWORD_HASHERS:
+            with override_settings(PASSWORD_HASHERS=[hasher]):
+                algorithm = get_hasher().algorithm
+                if algorithm == 'argon2' and importlib.util.find_spec('argon2') is None:
+                    results[algorithm] = "skipped: argon2-cffi is not installed"
+                    continue
+                with scratch_data():
+                    results[algorithm] = self.run(options['repeat'], options['concurrency'])
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def run(self, repeat, concurrency):
+        factory = APIRequestFactory()
+        signup_view = CustomerSignUpView.as_view()
+        token_view = CustomTokenObtainPairView.as_view()
+
+        def signup():
+            data = {'phone_number': next(self.phone_numbers), 'first_name': "Bench", 'last_name': "User", 'password': PASSWORD}
+            assert signup_view(factory.post('/', data)).status_code == 201
+
+        phone_number = next(self.phone_numbers)
+        User.objects.create_user(phone_number, PASSWORD)
+
+        def token():
+            assert token_view(factory.post('/', {'phone_number': phone_number, 'password': PASSWORD})).status_code == 200
+
+        result = {
+            'hash': measure(lambda: make_password(PASSWORD), repeat=repeat),
+            'signup': measure(signup, repeat=repeat),
+            'token': measure(token, repeat=repeat),
+            'async_logins_per_second': async_to_sync(self.concurrent_logins)(phone_number, concurrency),
+        }
+        for name in ('signup', 'token'):
+            result[name]['per_core_per_second'] = round(1000 / result[name]['median_ms'], 1)
+        return result
+
+    async def concurrent_logins(self, phone_number, concurrency):
+        start = time.perf_counter()
+        users = await asyncio.gather(*(
+            aauthenticate(phone_number=phone_number, password=PASSWORD) for _ in range(concurrency)
+        ))
+        assert all(users)
+        return round(concurrency / (time.perf_counter() - start), 1)
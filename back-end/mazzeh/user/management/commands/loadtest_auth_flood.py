@@ -0,0 +1,133 @@
+import itertools
+import json
+import logging
+import statistics
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+
+from mazzeh.benchmarks import percentile
+from mazzeh.metrics import registry
+from mazzeh.throttling import get_store
+from order.models import Order
+from restaurant.models import RestaurantProfile
+from user.models import User
+
+PASSWORD = "load-Passw0rd!"
+PREFIX = "loadtest"
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure order history latency while other threads flood the token endpoint with wrong passwords, "
+        "with and without throttling. Creates its own users and deletes them at the end."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=5.0, help="Order latency is measured for this long per phase.")
+        parser.add_argument('--warmup', type=float, default=10.0, help="Flood time before measuring, to use up the bursts.")
+        parser.add_argument('--order-clients', type=int, default=4)
+        parser.add_argument('--flood-clients', type=int, default=(settings.PASSWORD_HASHING_WORKERS or 1) * 4)
+        parser.add_argument('--flood-rate', type=float, default=200, help="Login attempts per second the flood sends.")
+        parser.add_argument('--flood-ips', type=int, default=4, help="Addresses the flood is spread over.")
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite' and connection.settings_dict['NAME'] == ':memory:':
+            self.stderr.write("Needs a database shared between threads.")
+            return
+        # Every failed login would be logged as a warning.
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        # The test client's requests are addressed to 'testserver'.
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            try:
+                access = self.populate()
+                results = {}
+                for name, flood, rates in (
+                    ('baseline', False, {}),
+                    ('flood_unthrottled', True, {}),
+                    ('flood_throttled', True, settings.THROTTLE_RATES),
+                ):
+                    get_store().clear()
+                    registry.clear()
+                    with override_settings(THROTTLE_RATES=rates):
+                        results[name] = self.phase(access, options, flood)
+                    results[name]['throttled'] = {
+                        f"{scope}:{limit}": count for (scope, limit), count in registry.throttled.items()
+                    }
+            finally:
+                User.objects.filter(phone_number__startswith=PREFIX).delete()
+                get_store().clear()
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def populate(self):
+        User.objects.filter(phone_number__startswith=PREFIX).delete()
+        manager = User.objects.create_user(f"{PREFIX}-m", PASSWORD, role="restaurant_manager")
+        customer = User.objects.create_user(f"{PREFIX}-c", PASSWORD)
+        restaurant = RestaurantProfile.objects.create(manager=manager, name="Load", city_name="Tehran", state="approved")
+        Order.objects.bulk_create(Order(user=customer, restaurant=restaurant, total_price=100) for _ in range(20))
+        response = Client().post('/api/auth/token', {'phone_number': customer.phone_number, 'password': PASSWORD})
+        return response.json()['access']
+
+    def phase(self, access, options, flood):
+        """Order latency of one phase; the flood sends at a fixed rate, as an attacker would, not as fast as it is answered."""
+        stop, measuring = threading.Event(), threading.Event()
+        latencies, statuses = [], {}
+        lock = threading.Lock()
+        attempts = itertools.count()
+        interval = options['flood_clients'] / options['flood_rate']
+
+        def order_client():
+            client = Client(HTTP_AUTHORIZATION=f"Bearer {access}")
+            while not stop.is_set():
+                start = time.perf_counter()
+                response = client.get('/api/order/history')
+                elapsed = (time.perf_counter() - start) * 1000
+                assert response.status_code == 200, response.status_code
+                if measuring.is_set():
+                    with lock:
+                        latencies.append(elapsed)
+            connection.close()
+
+        def flood_client():
+            client = Client()
+            next_send = time.monotonic()
+            while not stop.is_set():
+                attempt = next(attempts)
+                response = client.post(
+                    '/api/auth/token', {'phone_number': f"0912{attempt % 10 ** 7:07d}", 'password': "guess"},
+                    REMOTE_ADDR=f"10.0.0.{attempt % options['flood_ips'] + 1}",
+                )
+                if measuring.is_set():
+                    with lock:
+                        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                next_send += interval
+                stop.wait(max(next_send - time.monotonic(), 0))
+            connection.close()
+
+        threads = [threading.Thread(target=order_client) for _ in range(options['order_clients'])]
+        if flood:
+            threads += [threading.Thread(target=flood_client) for _ in range(options['flood_clients'])]
+        for thread in threads:
+            thread.start()
+        if flood:
+            time.sleep(options['warmup'])
+        measuring.set()
+        time.sleep(options['seconds'])
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        latencies.sort()
+        return {
+            'order_requests_per_second': round(len(latencies) / options['seconds'], 1),
+            'order_p50_ms': percentile(latencies, 0.5),
+            'order_p95_ms': percentile(latencies, 0.95),
+            'order_p99_ms': percentile(latencies, 0.99),
+            'order_mean_ms': round(statistics.fmean(latencies), 2),
+            'flood_responses': {str(code): count for code, count in sorted(statuses.items())},
+        }
@@ -1,6 +1,10 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin
 from django.contrib.auth.base_user import BaseUserManager
+from django.contrib.auth.hashers import check_password, make_password
+from .hashers import amake_password, averify_password
 
 class UserManager(BaseUserManager):
     def create_user(self, phone_number, password=None, first_name=None, last_name=None, role="customer", **extra_fields):
@@ -28,6 +32,13 @@ class UserManager(BaseUserManager):
 
         return self.create_user(phone_number, password, role="admin", **extra_fields)
 
+    def get_by_natural_key(self, username):
+        # Login also needs the managed restaurant for the token claims; join it into the same query.
+        return self.select_related('restaurant_profile').get(**{self.model.USERNAME_FIELD: username})
+
+    async def aget_by_natural_key(self, username):
+        return await self.select_related('restaurant_profile').aget(**{self.model.USERNAME_FIELD: username})
+
 class User(AbstractBaseUser, PermissionsMixin):
     ROLE_CHOICES = [
         ("customer", "Customer"),
@@ -41,11 +52,40 @@ class User(AbstractBaseUser, PermissionsMixin):
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, default="customer")
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    token_version = models.PositiveIntegerField(default=0, editable=False)
 
     objects = UserManager()
 
     USERNAME_FIELD = 'phone_number'
     REQUIRED_FIELDS = ['first_name']
 
+    def set_password(self, raw_password):
+        super().set_password(raw_password)
+        self.token_version += 1
+
+    # Upgrading a hash to the current PASSWORD_HASHERS settings on login is not a
+    # password change: it must neither bump token_version nor save other fields.
+    def check_password(self, raw_password):
+        def setter(raw_password):
+            self.password = make_password(raw_password)
+            self.save(update_fields=['password'])
+
+        return check_password(raw_password, self.password, setter)
+
+    async def acheck_password(self, raw_password):
+        is_correct, must_update = await averify_password(raw_password, self.password)
+        if is_correct and must_update:
+            self.password = await amake_password(raw_password)
+            await self.asave(update_fields=['password'])
+        return is_correct
+
     def __str__(self):
         return self.phone_number
+
+
+@receiver(post_save, sender=User)
+def user_post_save(sender, instance, raw, **kwargs):
+    if not raw:
+        from .tokens import forget_token_version
+        user_id = instance.pk
+        transaction.on_commit(lambda: forget_token_version(user_id))
@@ -0,0 +1,103 @@
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.tokens import default_token_generator
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from customer.models import CustomerProfile
+from .models import User
+from .serializers import CustomerImportSerializer
+
+PROVISION_CHUNK_SIZE = 2000
+IMPORT_FIELDS = {'phone_number', 'first_name', 'last_name', 'password', 'state'}
+
+
+def _clean_row(row):
+    if not isinstance(row, dict):
+        return row
+    return {
+        key: value.strip() if isinstance(value, str) else value
+        for key, value in row.items()
+        if key in IMPORT_FIELDS and value not in ('', None)
+    }
+
+
+def hash_passwords(passwords, pool=None):
+    """Hash the given passwords, in the process pool when there is one.
+
+    Missing passwords get an unusable hash; those users finish signing up through the set-password flow.
+    """
+    hashed = [None if password else make_password(None) for password in passwords]
+    todo = [index for index, password in enumerate(passwords) if password]
+    if todo:
+        raw = [passwords[index] for index in todo]
+        if pool is None:
+            results = map(make_password, raw)
+        else:
+            results = pool.map(make_password, raw, chunksize=max(len(raw) // 64, 1))
+        for index, encoded in zip(todo, results):
+            hashed[index] = encoded
+    return hashed
+
+
+def set_password_token(user):
+    return default_token_generator.make_token(user)
+
+
+def provision_customers(rows, chunk_size=PROVISION_CHUNK_SIZE, start_row=0, pool=None, on_chunk=None):
+    """Create customers and their profiles from rows of phone_number, first_name, last_name, password, state.
+
+    Phone numbers that are already registered, or repeated in the file, are skipped. Each chunk is
+    committed on its own and report['last_row'] is the last row fully handled, so an interrupted run
+    can resume with start_row=report['last_row']. on_chunk(report, users) is called after each commit.
+    """
+    report = {'created': 0, 'skipped': 0, 'errors': [], 'last_row': start_row}
+    # One serializer instance is reused for every row so its fields are only built once.
+    serializer = CustomerImportSerializer()
+    numbered_rows = islice(enumerate(rows, start=1), start_row, None)
+    while chunk := list(islice(numbered_rows, chunk_size)):
+        users = _provision_chunk(serializer, chunk, report, pool)
+        report['last_row'] = chunk[-1][0]
+        if on_chunk is not None:
+            on_chunk(report, users)
+    return report
+
+
+def _provision_chunk(serializer, chunk, report, pool):
+    valid = {}
+    valid_rows = 0
+    for row_number, row in chunk:
+        try:
+            data = serializer.run_validation(_clean_row(row))
+        except ValidationError as exc:
+            report['errors'].append({'row': row_number, 'errors': exc.detail})
+        else:
+            valid_rows += 1
+            valid.setdefault(data['phone_number'], data)
+
+    existing = set(User.objects.filter(phone_number__in=list(valid)).values_list('phone_number', flat=True))
+    new = [data for phone_number, data in valid.items() if phone_number not in existing]
+    report['skipped'] += valid_rows - len(new)
+    if not new:
+        return []
+
+    # Hashing is the slow part, so it happens before the transaction takes any write lock.
+    passwords = hash_passwords([data.get('password') for data in new], pool)
+    with transaction.atomic():
+        users = User.objects.bulk_create(
+            User(
+                phone_number=data['phone_number'],
+                first_name=data.get('first_name'),
+                last_name=data.get('last_name'),
+                role='customer',
+                password=password,
+            )
+            for data, password in zip(new, passwords)
+        )
+        CustomerProfile.objects.bulk_create(
+            CustomerProfile(user=user, state=data.get('state', 'approved'))
+            for user, data in zip(users, new)
+        )
+    report['created'] += len(users)
+    return users
@@ -1,19 +1,40 @@
 from rest_framework import serializers
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
 from .models import User
+from .tokens import TOKEN_VERSION_CLAIM, add_user_claims, current_token_version
 from customer.models import CustomerProfile
 from restaurant.models import RestaurantProfile
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
-    def validate(self, attrs):
-        data = super().validate(attrs)
+    @classmethod
+    def get_token(cls, user):
+        return add_user_claims(super().get_token(user), user)
 
-        if self.user.role == "restaurant_manager":
-            restaurant = RestaurantProfile.objects.get(manager_id=self.user.id)
-            data['restaurant_id'] = restaurant.id
-            data['state'] = restaurant.state
+    @staticmethod
+    def user_data(user):
+        if user.role != "restaurant_manager":
+            return {}
+        # Loaded together with the user by UserManager.get_by_natural_key.
+        restaurant = getattr(user, 'restaurant_profile', None)
+        return {
+            'restaurant_id': restaurant.id if restaurant else None,
+            'state': restaurant.state if restaurant else None,
+        }
 
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        data.update(self.user_data(self.user))
         return data
+
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        version = current_token_version(refresh.get(api_settings.USER_ID_CLAIM))
+        if version is None or refresh.get(TOKEN_VERSION_CLAIM) != version:
+            raise InvalidToken("Token has been revoked.")
+        return super().validate(attrs)
     
 class CustomerSignUpSerializer(serializers.ModelSerializer):
     phone_number = serializers.CharField(max_length=30)
@@ -86,4 +107,16 @@ class RestaurantSignUpSerializer(serializers.ModelSerializer):
         
 class PasswordChangeSerializer(serializers.Serializer):
     old_password = serializers.CharField(required=True, write_only=True)
-    new_password = serializers.CharField(required=True, write_only=True)
\ No newline at end of file
+    new_password = serializers.CharField(required=True, write_only=True)
+
+class CustomerImportSerializer(serializers.Serializer):
+    phone_number = serializers.CharField(max_length=15)
+    first_name = serializers.CharField(max_length=30, required=False)
+    last_name = serializers.CharField(max_length=30, required=False)
+    password = serializers.CharField(required=False, write_only=True)
+    state = serializers.ChoiceField(choices=CustomerProfile.STATE_CHOICES, required=False)
+
+class SetPasswordSerializer(serializers.Serializer):
+    user_id = serializers.IntegerField()
+    token = serializers.CharField()
+    new_password = serializers.CharField(write_only=True)
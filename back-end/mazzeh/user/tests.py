@@ -1,3 +1,155 @@
-from django.test import TestCase
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from mazzeh.throttling import get_store
+from rest_framework.test import APIClient, APIRequestFactory
+from restaurant.models import RestaurantProfile
+from .authentication import ClaimsJWTAuthentication
+from .models import User
+from .provisioning import provision_customers
 
-# Create your tests here.
+
+class TokenClaimsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.manager = User.objects.create_user('09120000002', 'pass', role='restaurant_manager')
+        self.restaurant = RestaurantProfile.objects.create(
+            manager=self.manager, name='Kabab', city_name='Tehran', state='approved',
+        )
+
+    def login(self, password='pass'):
+        response = self.client.post('/api/auth/token', {'phone_number': '09120000002', 'password': password})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def authenticate(self, access):
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {access}')
+        return ClaimsJWTAuthentication().authenticate(request)[0]
+
+    def test_login_embeds_restaurant_claims_in_one_query(self):
+        with self.assertNumQueries(1):
+            data = self.login()
+        self.assertEqual(data['restaurant_id'], self.restaurant.id)
+
+        user = self.authenticate(data['access'])
+        self.assertEqual((user.id, user.role), (self.manager.id, 'restaurant_manager'))
+        self.assertEqual((user.restaurant_id, user.restaurant_state), (self.restaurant.id, 'approved'))
+
+    def test_authentication_does_not_query_the_database(self):
+        access = self.login()['access']
+        self.authenticate(access)
+        with self.assertNumQueries(0):
+            self.authenticate(access)
+
+    def test_password_change_revokes_tokens(self):
+        tokens = self.login()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put('/api/auth/password/change', {'old_password': 'pass', 'new_password': 'new-pass'})
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.client.get('/api/order/active').status_code, 401)
+        self.client.credentials()
+        self.assertEqual(self.client.post('/api/auth/token/refresh', {'refresh': tokens['refresh']}).status_code, 401)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.login('new-pass')['access']}")
+        self.assertEqual(self.client.get('/api/order/active').status_code, 200)
+
+    def test_restaurant_state_change_revokes_manager_tokens(self):
+        access = self.login()['access']
+        self.authenticate(access)
+        restaurant = RestaurantProfile.objects.get(pk=self.restaurant.pk)
+        restaurant.state = 'rejected'
+        with self.captureOnCommitCallbacks(execute=True):
+            restaurant.save()
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(self.client.get('/api/order/active').status_code, 401)
+        self.assertEqual(self.authenticate(self.login()['access']).restaurant_state, 'rejected')
+
+
+@override_settings(
+    PASSWORD_HASHERS=['user.hashers.ScryptPasswordHasher', 'django.contrib.auth.hashers.MD5PasswordHasher'],
+    PASSWORD_HASHER_PARAMS={'scrypt': {'work_factor': 2 ** 4}},
+)
+class PasswordRehashTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        get_store().clear()
+        self.addCleanup(get_store().clear)
+        self.user = User.objects.create_user('09120000003', 'pass')
+        User.objects.filter(pk=self.user.pk).update(password=make_password('pass', hasher='md5'))
+
+    def test_login_upgrades_hash_without_revoking_tokens(self):
+        client = APIClient()
+        response = client.post('/api/auth/token', {'phone_number': '09120000003', 'password': 'pass'})
+        self.assertEqual(response.status_code, 200)
+
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('scrypt$'))
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        self.assertEqual(client.get('/api/order/history').status_code, 200)
+
+    def test_async_login_upgrades_hash(self):
+        response = self.client.post(
+            '/api/auth/async/token', {'phone_number': '09120000003', 'password': 'pass'}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('scrypt$'))
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.json()['access']}")
+        self.assertEqual(client.get('/api/order/history').status_code, 200)
+        response = self.client.post(
+            '/api/auth/async/token', {'phone_number': '09120000003', 'password': 'wrong'}, content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(THROTTLE_RATES={'login': {'phone_number': '2/min'}})
+    def test_async_login_is_throttled(self):
+        for password in ('wrong', 'wrong', 'pass'):
+            response = self.client.post(
+                '/api/auth/async/token', {'phone_number': '09120000003', 'password': password}, content_type='application/json',
+            )
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response.headers)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('md5$'))
+
+
+class CustomerProvisioningTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user('09350000001', 'pass')
+
+    def test_import_skips_registered_numbers_with_constant_queries(self):
+        rows = [{'phone_number': f'0935{i:07d}', 'first_name': 'Ali'} for i in range(50)]
+        rows += [{'phone_number': '09350000002'}, {'first_name': 'No phone'}]
+        with self.assertNumQueries(5):
+            report = provision_customers(rows, chunk_size=500)
+        self.assertEqual((report['created'], report['skipped'], report['last_row']), (49, 2, 52))
+        self.assertEqual([error['row'] for error in report['errors']], [52])
+        self.assertEqual(User.objects.filter(customer_profile__state='approved').count(), 49)
+
+        report = provision_customers(rows + [{'phone_number': '09359999999'}], start_row=52)
+        self.assertEqual((report['created'], report['last_row']), (1, 53))
+
+    def test_imported_customer_sets_password_with_token(self):
+        admin = User.objects.create_superuser('09120000009', 'pass')
+        client = APIClient()
+        access = client.post('/api/auth/token', {'phone_number': admin.phone_number, 'password': 'pass'}).data['access']
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        response = client.generic(
+            'POST', '/api/auth/customers/import?include_tokens=1',
+            'phone_number,first_name\n09351111111,Sara\n09350000001,Taken\n', content_type='text/csv',
+        )
+        self.assertEqual((response.data['created'], response.data['skipped']), (1, 1))
+        issued = response.data['set_password_tokens'][0]
+
+        client.credentials()
+        data = {'user_id': issued['user_id'], 'token': issued['token'], 'new_password': 'first-pass'}
+        self.assertEqual(client.post('/api/auth/password/set', data).status_code, 200)
+        self.assertEqual(client.post('/api/auth/password/set', data).status_code, 400)
+        response = client.post('/api/auth/token', {'phone_number': '09351111111', 'password': 'first-pass'})
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,45 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from .models import User
+
+TOKEN_VERSION_CLAIM = 'ver'
+# Without a shared cache another process may honour a revoked token for up to this long.
+TOKEN_VERSION_CACHE_TIMEOUT = 60
+
+
+def token_version_cache_key(user_id):
+    return f'user:token-version:{user_id}'
+
+
+def add_user_claims(token, user):
+    """Sign everything the hot API paths need about the user into the token."""
+    token[TOKEN_VERSION_CLAIM] = user.token_version
+    token['role'] = user.role
+    if user.role == 'restaurant_manager':
+        restaurant = getattr(user, 'restaurant_profile', None)
+        token['restaurant_id'] = restaurant.id if restaurant else None
+        token['state'] = restaurant.state if restaurant else None
+    return token
+
+
+def current_token_version(user_id):
+    """The version tokens of an active user must carry, or None if the user is gone or inactive."""
+    key = token_version_cache_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        version = User.objects.filter(pk=user_id, is_active=True).values_list('token_version', flat=True).first()
+        # -1 remembers missing and inactive users, no token carries it.
+        cache.set(key, -1 if version is None else version, TOKEN_VERSION_CACHE_TIMEOUT)
+        return version
+    return None if version < 0 else version
+
+
+def forget_token_version(user_id):
+    cache.delete(token_version_cache_key(user_id))
+
+
+def revoke_tokens(user_id):
+    """Invalidate every token issued to the user so far."""
+    User.objects.filter(pk=user_id).update(token_version=F('token_version') + 1)
+    transaction.on_commit(lambda: forget_token_version(user_id))
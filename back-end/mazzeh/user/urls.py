@@ -1,10 +1,14 @@
 from django.urls import path
-from rest_framework_simplejwt.views import TokenRefreshView
-from .views import CustomTokenObtainPairView, CustomerSignUpView, TestAuthenticationView,RestaurantSignUpView, ChangePasswordView
+from .views import CustomTokenObtainPairView, CustomTokenRefreshView, CustomerSignUpView, TestAuthenticationView,RestaurantSignUpView, ChangePasswordView
+from .views import AsyncTokenObtainPairView, CustomerImportView, SetPasswordView
 
 urlpatterns = [
     path('signup/restaurant', RestaurantSignUpView.as_view(), name='restaurant_signup'),
     path('token', CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('token/refresh', TokenRefreshView.as_view(), name='token_refresh'),
+    path('async/token', AsyncTokenObtainPairView.as_view(), name='async_token_obtain_pair'),
+    path('token/refresh', CustomTokenRefreshView.as_view(), name='token_refresh'),
     path('signup/customer', CustomerSignUpView.as_view(), name='customer_signup'),
+    path('password/change', ChangePasswordView.as_view(), name='change_password'),
+    path('password/set', SetPasswordView.as_view(), name='set_password'),
+    path('customers/import', CustomerImportView.as_view(), name='customer_import'),
 ]
@@ -1,14 +1,32 @@
-from rest_framework_simplejwt.views import TokenObtainPairView
+import json
+import math
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import aauthenticate
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
-from .serializers import CustomTokenObtainPairSerializer, CustomerSignUpSerializer, RestaurantSignUpSerializer
-from .serializers import PasswordChangeSerializer
+from django.contrib.auth.tokens import default_token_generator
+from mazzeh.asynchronous import json_response
+from mazzeh.throttling import BucketThrottle, body_phone_number, client_ip, take
+from restaurant.menu_import import read_csv_rows
+from .authentication import RevocableJWTAuthentication
+from .models import User
+from .permissions import IsAdmin
+from .provisioning import provision_customers, set_password_token
+from .serializers import CustomTokenObtainPairSerializer, CustomTokenRefreshSerializer, CustomerSignUpSerializer, RestaurantSignUpSerializer
+from .serializers import PasswordChangeSerializer, SetPasswordSerializer
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
 class ChangePasswordView(APIView):
+    # Needs the real user row to check the old password.
+    authentication_classes = [RevocableJWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     @swagger_auto_schema(
@@ -40,6 +58,7 @@ class ChangePasswordView(APIView):
             if not user.check_password(old_password):
                 return Response({"error": "Old password is incorrect."}, status=status.HTTP_400_BAD_REQUEST)
             
+            # set_password bumps token_version, revoking every token issued so far.
             user.set_password(new_password)
             user.save()
             return Response({"message": "Password updated successfully."}, status=status.HTTP_200_OK)
@@ -48,6 +67,8 @@ class ChangePasswordView(APIView):
     
 
 class CustomerSignUpView(APIView):
+    throttle_classes = [BucketThrottle]
+    throttle_scope = 'signup'
 
     @swagger_auto_schema(
         operation_summary="Customer Sign Up",
@@ -65,6 +86,7 @@ class CustomerSignUpView(APIView):
         responses={
             201: openapi.Response("Customer created successfully", examples={"application/json": {"message": "Customer created successfully"}}),
             400: openapi.Response("Invalid input", examples={"application/json": {"phone_number": ["A user with this phone number already exists."], "password": ["This field is required."]}}),
+            429: openapi.Response("Too many attempts", examples={"application/json": {"detail": "Request was throttled. Expected available in 12 seconds."}}),
             500: openapi.Response("Internal server error"),
         }
     )
@@ -77,6 +99,8 @@ class CustomerSignUpView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 class RestaurantSignUpView(APIView):
+    throttle_classes = [BucketThrottle]
+    throttle_scope = 'signup'
 
     @swagger_auto_schema(
         operation_summary="Restaurant Manager Sign Up",
@@ -95,6 +119,7 @@ class RestaurantSignUpView(APIView):
         responses={
             201: openapi.Response("Restaurant Manager created successfully", examples={"application/json": {"message": "Restaurant Manager created successfully"}}),
             400: openapi.Response("Invalid input", examples={"application/json": {"phone_number": ["A user with this phone number already exists."], "password": ["This field is required."]}}),
+            429: openapi.Response("Too many attempts", examples={"application/json": {"detail": "Request was throttled. Expected available in 12 seconds."}}),
             500: openapi.Response("Internal server error"),
         }
     )
@@ -115,3 +140,127 @@ class TestAuthenticationView(APIView):
 
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
+    throttle_classes = [BucketThrottle]
+    throttle_scope = 'login'
+
+class CustomTokenRefreshView(TokenRefreshView):
+    serializer_class = CustomTokenRefreshSerializer
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncTokenObtainPairView(View):
+    """
+    CustomTokenObtainPairView as an async view, for clients served through mazzeh.asgi: the password
+    is checked in the hashing pool (user.hashers) while the event loop serves other connections.
+    """
+    throttle_scope = 'login'
+
+    async def post(self, request):
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return json_response({"error": "Invalid JSON."}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(data, dict):
+            data = {}
+
+        keys = {'ip': client_ip(request), 'phone_number': body_phone_number(data), 'endpoint': ''}
+        retry_after = await sync_to_async(take)(self.throttle_scope, keys.get)
+        if retry_after:
+            return json_response(
+                {"detail": f"Request was throttled. Expected available in {math.ceil(retry_after)} seconds."},
+                status=status.HTTP_429_TOO_MANY_REQUESTS, headers={'Retry-After': str(math.ceil(retry_after))},
+            )
+
+        password = data.get('password')
+        if not isinstance(data.get('phone_number'), str) or not isinstance(password, str):
+            return json_response({"error": "phone_number and password are required."}, status=status.HTTP_400_BAD_REQUEST)
+        user = await aauthenticate(request, phone_number=data['phone_number'], password=password)
+        if user is None:
+            return json_response(
+                {"detail": "No active account found with the given credentials"}, status=status.HTTP_401_UNAUTHORIZED,
+            )
+
+        refresh = CustomTokenObtainPairSerializer.get_token(user)
+        return json_response({
+            'refresh': str(refresh),
+            'access': str(refresh.access_token),
+            **CustomTokenObtainPairSerializer.user_data(user),
+        })
+
+
+class CustomerImportView(APIView):
+    permission_classes = [IsAdmin]
+
+    @swagger_auto_schema(
+        operation_summary="Bulk import customers",
+        operation_description=(
+            "Streams a CSV with phone_number and optional first_name, last_name, password and state columns. "
+            "Already registered phone numbers are skipped. Rows without a password get an unusable one; "
+            "pass include_tokens=1 to receive set-password tokens for them. An interrupted import can be "
+            "resumed by sending the same file with start_row set to the last reported last_row."
+        ),
+        manual_parameters=[
+            openapi.Parameter('start_row', openapi.IN_QUERY, type=openapi.TYPE_INTEGER),
+            openapi.Parameter('include_tokens', openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN),
+        ],
+        request_body=openapi.Schema(type=openapi.TYPE_STRING, description="CSV customer rows."),
+        responses={
+            200: openapi.Response("Import report", examples={"application/json": {"created": 2, "skipped": 1, "errors": [], "last_row": 3}}),
+            400: openapi.Response("Malformed payload", examples={"application/json": {"error": "Malformed payload."}}),
+        }
+    )
+
+    def post(self, request):
+        try:
+            start_row = int(request.query_params.get('start_row', 0))
+        except ValueError:
+            return Response({"error": "start_row must be a number."}, status=status.HTTP_400_BAD_REQUEST)
+        if request.stream is None:
+            return Response({"error": "Empty payload."}, status=status.HTTP_400_BAD_REQUEST)
+
+        tokens = []
+        on_chunk = None
+        if request.query_params.get('include_tokens') in ('1', 'true'):
+            def on_chunk(report, users):
+                tokens.extend(
+                    {"phone_number": user.phone_number, "user_id": user.pk, "token": set_password_token(user)}
+                    for user in users if not user.has_usable_password()
+                )
+
+        try:
+            report = provision_customers(read_csv_rows(request.stream), start_row=start_row, on_chunk=on_chunk)
+        except (ValueError, UnicodeDecodeError):
+            return Response({"error": "Malformed payload."}, status=status.HTTP_400_BAD_REQUEST)
+        if on_chunk is not None:
+            report['set_password_tokens'] = tokens
+        return Response(report, status=status.HTTP_200_OK)
+
+
+class SetPasswordView(APIView):
+    throttle_classes = [BucketThrottle]
+    throttle_scope = 'set_password'
+
+    @swagger_auto_schema(
+        operation_summary="Set password of an imported account",
+        operation_description="Sets the first password of a bulk imported customer using the token issued at import.",
+        request_body=SetPasswordSerializer,
+        responses={
+            200: openapi.Response("Password set", examples={"application/json": {"message": "Password set successfully."}}),
+            400: openapi.Response("Invalid or used token", examples={"application/json": {"error": "Invalid or expired token."}}),
+            429: openapi.Response("Too many attempts", examples={"application/json": {"detail": "Request was throttled. Expected available in 12 seconds."}}),
+        }
+    )
+
+    def post(self, request):
+        serializer = SetPasswordSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        user = User.objects.filter(pk=serializer.validated_data['user_id']).first()
+        # The token is bound to the current password hash, so it stops working once used.
+        if user is None or not default_token_generator.check_token(user, serializer.validated_data['token']):
+            return Response({"error": "Invalid or expired token."}, status=status.HTTP_400_BAD_REQUEST)
+
+        user.set_password(serializer.validated_data['new_password'])
+        user.save()
+        return Response({"message": "Password set successfully."}, status=status.HTTP_200_OK)